@@ -2,16 +2,26 @@
 FigureScout 后端服务
 提供文献检索和内容提取API
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import requests
+import functools
+import gzip
+import hashlib
+import json
+import os
 from datetime import datetime, timedelta
-import xml.etree.ElementTree as ET
-from typing import List, Dict, Optional
-import re
-from pmc_fetcher import PMCFetcher
+from typing import List, Dict, Optional, Union
 from europepmc_searcher import EuropePMCSearcher
+from fulltext_cache import get_default_cache
 from database import ProjectDatabase
+from fulltext_processor import FulltextProcessor
+from http_client import get_client
+from jobs import JobQueue
+from keyword_matcher import KeywordMatcher
+from parse_pool import get_parse_pool
+from search_cache import get_default_search_cache
+import processing_state
+import xml_parser
 
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求
@@ -19,6 +29,21 @@ CORS(app)  # 允许跨域请求
 # 初始化数据库
 db = ProjectDatabase()
 
+# 全文并发处理引擎（所有处理接口共享），其他项目已分析过的文章直接复用数据库中的结果
+fulltext_processor = FulltextProcessor(known_fulltext=db.find_processed_fulltext)
+
+# 后台任务队列（工作线程在首个请求时启动）
+job_queue = JobQueue(db, fulltext_processor)
+
+# Europe PMC 搜索结果总数上限（自动翻页，可在请求中用 max_results 覆盖）
+SEARCH_MAX_RESULTS = int(os.environ.get("FIGURESCOUT_SEARCH_MAX_RESULTS", "2000"))
+
+# 增量更新时从同步水位往前多检索的天数（覆盖水位当天稍晚才收录的文章，重复的按 PMID 去掉）
+SYNC_OVERLAP_DAYS = int(os.environ.get("FIGURESCOUT_SYNC_OVERLAP_DAYS", "1"))
+
+# 客户端支持 gzip 时压缩超过该大小的 JSON 响应（字节，0 表示全部压缩）
+GZIP_MIN_BYTES = int(os.environ.get("FIGURESCOUT_GZIP_MIN_BYTES", "1024"))
+
 # 配置高质量期刊列表
 HIGH_QUALITY_JOURNALS = [
     "Nature",
@@ -42,14 +67,17 @@ class PubMedSearcher:
     
     def __init__(self):
         self.email = "figurescout@example.com"  # 建议设置邮箱
+        self.session = get_client()  # 共享连接池，按 NCBI 限制限速
     
-    def search_articles(self, keyword: str, years: int = 3) -> List[str]:
+    def search_articles(self, keyword: str, years: int = 3,
+                        aliases: Optional[List[str]] = None) -> List[str]:
         """
         搜索包含关键词的文章
         
         Args:
             keyword: 搜索关键词（如 DepMap）
             years: 搜索近几年的文章
+            aliases: 关键词别名，任一命中即可
             
         Returns:
             文章ID列表
@@ -63,7 +91,8 @@ class PubMedSearcher:
         journal_query = " OR ".join([f'"{journal}"[Journal]' for journal in HIGH_QUALITY_JOURNALS])
         
         # 修复：日期范围不应该用引号括起来
-        query = f'({keyword}) AND ({journal_query}) AND {date_range}[PDAT]'
+        terms = [keyword] + [f'"{alias}"' for alias in (aliases or [])]
+        query = f'({" OR ".join(terms)}) AND ({journal_query}) AND {date_range}[PDAT]'
         
         # 执行搜索
         search_url = f"{self.BASE_URL}esearch.fcgi"
@@ -76,11 +105,11 @@ class PubMedSearcher:
         }
         
         try:
-            response = requests.get(search_url, params=params, timeout=10)
+            response = self.session.get(search_url, params=params, timeout=10)
             response.raise_for_status()
             
             # 解析XML响应
-            root = ET.fromstring(response.content)
+            root = xml_parser.fromstring(response.content)
             id_list = root.find(".//IdList")
             
             if id_list is not None:
@@ -111,11 +140,11 @@ class PubMedSearcher:
         }
         
         try:
-            response = requests.get(fetch_url, params=params, timeout=30)
+            response = self.session.get(fetch_url, params=params, timeout=30)
             response.raise_for_status()
             
             # 解析文章信息
-            root = ET.fromstring(response.content)
+            root = xml_parser.fromstring(response.content)
             articles = []
             
             for article in root.findall(".//PubmedArticle"):
@@ -198,11 +227,90 @@ def index():
         "frontend": "http://localhost:3000"
     })
 
+@app.before_request
+def ensure_job_workers():
+    """启动后台任务工作线程并恢复未完成的任务（只在实际处理请求的进程中执行）"""
+    job_queue.start()
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """客户端支持时用 gzip 压缩较大的 JSON 响应（NDJSON 等流式响应不压缩）"""
+    if (response.status_code != 200 or response.mimetype != 'application/json'
+            or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] <= 0:
+        return response
+    
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def conditional_get(current_version):
+    """
+    给只读接口加上 ETag 条件请求：数据版本未变化时直接返回 304，不再查询和序列化数据
+    
+    ETag 为弱标识，gzip 压缩前后的响应共用同一个版本。Cache-Control: no-cache
+    让浏览器每次使用缓存前都带上 If-None-Match 重新验证。
+    
+    Args:
+        current_version: 以视图的 URL 参数调用，返回当前数据版本字符串；
+                         返回 None（如项目不存在）时直接交给视图处理
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            version = current_version(**kwargs)
+            if version is None:
+                return view(**kwargs)
+            
+            if request.if_none_match.contains_weak(version):
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(version, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def project_version(project_id: str, **_) -> Optional[str]:
+    """项目内容版本（项目或其引用的文档每次写入后变化）"""
+    version = db.get_project_version(project_id)
+    return None if version is None else f"{project_id}-{version}"
+
+
+def project_list_version() -> str:
+    """项目列表当前页的版本：页内项目及其版本号的摘要"""
+    limit = request.args.get('limit', 50, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    versions = db.list_project_versions(limit, offset)
+    return hashlib.sha1(json.dumps(versions).encode('utf-8')).hexdigest()[:20]
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
     return jsonify({"status": "ok", "message": "FigureScout API is running"})
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """上游请求指标（按主机：请求数、重试数、限速等待、耗时分位数）、全文/搜索缓存统计和解析进程池配置"""
+    return jsonify({
+        "http": get_client().metrics(),
+        "fulltext_cache": get_default_cache().stats(),
+        "search_cache": get_default_search_cache().stats(),
+        "parse_pool": get_parse_pool().stats()
+    })
+
 @app.route('/api/search', methods=['POST'])
 def search_literature():
     """
@@ -211,16 +319,22 @@ def search_literature():
     Request JSON:
         {
             "keyword": "DepMap",
+            "aliases": ["Cancer Dependency Map", "Achilles"],  // 可选，关键词别名
             "years": 3,
-            "fetch_fulltext": true  // 可选，是否获取详细全文分析
+            "fetch_fulltext": true,  // 可选，是否获取详细全文分析
+            "max_results": 2000,  // 可选，最多获取的搜索结果数
+            "bypass_cache": false  // 可选，不使用缓存的搜索结果
         }
     """
     try:
         data = request.get_json()
         keyword = data.get('keyword', '')
+        aliases = data.get('aliases') or []
         years = data.get('years', 3)
         fetch_fulltext = data.get('fetch_fulltext', True)  # 默认获取详细全文分析
         max_fulltext = data.get('max_fulltext', 20)  # 渐进式加载：初次只处理20篇
+        max_results = int(data.get('max_results') or SEARCH_MAX_RESULTS)
+        bypass_cache = bool(data.get('bypass_cache', False))
         
         if not keyword:
             return jsonify({"error": "关键词不能为空"}), 400
@@ -232,36 +346,32 @@ def search_literature():
         print(f"使用 Europe PMC 全文搜索（包括方法、结果章节）")
         print(f"{'='*60}\n")
         
-        # 使用 Europe PMC 全文搜索
-        # 根据时间范围动态调整返回数量
-        # 时间越长，可能的文章越多
-        page_size = min(50 * years, 500)  # 每年50篇，最多500篇
-        
+        # 使用 Europe PMC 全文搜索（沿 cursorMark 翻页，直到取完或达到上限）
         europepmc_searcher = EuropePMCSearcher()
         articles = europepmc_searcher.search_fulltext(
             keyword=keyword,
             years=years,
             journals=HIGH_QUALITY_JOURNALS,
-            page_size=page_size
+            max_results=max_results,
+            aliases=aliases,
+            bypass_cache=bypass_cache
         )
+        hit_count = europepmc_searcher.hit_count
+        # 翻页中途出错时只返回已取到的部分结果，按截断处理并带上错误原因
+        search_error = europepmc_searcher.error
+        
+        # 关键词匹配器：整个请求只构建一次，所有文章复用
+        matcher = KeywordMatcher.from_query(keyword, aliases)
         
         if not articles:
-            print("⚠️ Europe PMC 未找到文章，尝试 PubMed 搜索...")
-            # 降级到 PubMed 搜索
-            searcher = PubMedSearcher()
-            pmid_list = searcher.search_articles(keyword, years)
-            if pmid_list:
-                articles = searcher.fetch_article_details(pmid_list)
-                for article in articles:
-                    article['relevance'] = analyze_relevance(article, keyword)
-                    article['keyword'] = keyword
-                    article['has_fulltext'] = False
+            articles = search_pubmed_fallback(keyword, years, matcher)
         
         if not articles:
             return jsonify({
                 "keyword": keyword,
                 "total": 0,
                 "fulltext_available": 0,
+                "error": search_error,
                 "results": []
             })
         
@@ -272,54 +382,11 @@ def search_literature():
         
         # 获取详细的全文分析（PMC XML 解析）
         if fetch_fulltext:
-            pmc_fetcher = PMCFetcher()
             max_process = min(len(articles), max_fulltext)
             print(f"开始获取详细全文分析（已排序），共 {max_process} 篇...\n")
             
-            processed_count = 0
-            for idx, article in enumerate(articles[:max_process], 1):
-                # 修改：不再直接跳过没有 pmc_id 的文章
-                # pmc_fetcher.get_fulltext_info 会尝试通过 PMID 获取 PMC ID
-                article['fulltext_processed'] = True  # 标记已尝试处理
-                
-                try:
-                    # 获取详细的章节分析、图表等
-                    # 注意：这个方法内部会先通过 PMID 获取 PMC ID
-                    fulltext_info = pmc_fetcher.get_fulltext_info(article['pmid'], keyword)
-                    
-                    if fulltext_info and fulltext_info.get('fulltext'):
-                        # 成功获取全文
-                        article['fulltext'] = fulltext_info['fulltext']
-                        article['has_fulltext'] = True  # 只有成功获取才设为True
-                        article['pmc_id'] = fulltext_info.get('pmc_id') or article.get('pmc_id')
-                        article['pmc_available'] = True
-                        
-                        mentions = fulltext_info['fulltext']['total_mentions']
-                        pmc_id = article.get('pmc_id', 'N/A')
-                        print(f"[{idx}/{max_process}] ✅ {pmc_id}: 找到 {mentions} 处提及")
-                        
-                        # 基于全文提及次数调整相关性分数
-                        if mentions > 0:
-                            article['relevance']['score'] += mentions * 5
-                        
-                        processed_count += 1
-                    else:
-                        # 无法获取全文（可能没有PMC ID或全文不可用）
-                        pmid = article.get('pmid', 'N/A')
-                        pmc_id = article.get('pmc_id', '')
-                        
-                        if not pmc_id:
-                            print(f"[{idx}/{max_process}] ⚠️ PMID {pmid}: 无PMC ID，无法获取全文")
-                        else:
-                            print(f"[{idx}/{max_process}] ⚠️ {pmc_id}: 全文不可用或解析失败")
-                        
-                        article['has_fulltext'] = False
-                        article['pmc_available'] = bool(pmc_id)
-                        
-                except Exception as e:
-                    print(f"[{idx}/{max_process}] ❌ PMID {article.get('pmid', 'N/A')}: 处理失败 - {e}")
-                    article['has_fulltext'] = False
-                    article['pmc_available'] = bool(article.get('pmc_id'))
+            outcomes = fulltext_processor.process(articles[:max_process], matcher)
+            processed_count = sum(1 for o in outcomes.values() if o['status'] == 'success')
             
             print(f"\n✅ 完成详细分析: {processed_count}/{max_process} 篇\n")
         
@@ -332,13 +399,14 @@ def search_literature():
         print(f"  总文章数: {len(articles)}")
         print(f"  已尝试处理: {attempted_count}") 
         print(f"  成功获取全文: {fulltext_count}")
-        if len(articles) >= page_size:
-            print(f"  ⚠️  结果可能被截断（达到{page_size}篇上限）")
+        # 检查是否达到上限（Europe PMC 还有未获取的结果）
+        is_truncated = europepmc_searcher.truncated or bool(search_error)
+        if search_error:
+            print(f"  ⚠️  搜索中断，只返回已获取的结果: {search_error}")
+        elif is_truncated:
+            print(f"  ⚠️  结果被截断（共命中{hit_count}篇，上限{max_results}篇）")
         print(f"{'='*60}\n")
         
-        # 检查是否达到上限
-        is_truncated = len(articles) >= page_size
-        
         return jsonify({
             "keyword": keyword,
             "total": len(articles),
@@ -346,7 +414,10 @@ def search_literature():
             "fulltext_available": fulltext_count,  # 成功获取全文的数量
             "search_method": "Europe PMC Full-Text Search",
             "is_truncated": is_truncated,
-            "page_size": page_size,
+            "hit_count": hit_count,
+            "max_results": max_results,
+            "cache": europepmc_searcher.cache_info,
+            "error": search_error,
             "results": articles
         })
         
@@ -360,15 +431,27 @@ def search_literature():
 @app.route('/api/retry-failed', methods=['POST'])
 def retry_failed():
     """
-    重新处理失败的文章
+    重新处理失败的文章（从每篇文章失败的阶段继续，不重复已完成的网络请求）
     
-    请求体: {articles: [失败的文章列表], keyword}
+    请求体: {articles: [失败的文章列表], keyword, aliases (可选), project_id (可选), force (可选)}
+            不传 articles 时从项目中读取已到重试时间的失败文章（force 为 true 时忽略重试时间和次数上限），
+            处理结果保存回项目
     返回: {processed, failed, results}
     """
     try:
         data = request.get_json()
         failed_articles = data.get('articles', [])
         keyword = data.get('keyword', '')
+        project_id = data.get('project_id')
+        
+        if not failed_articles and project_id:
+            project = db.get_project_stats(project_id)
+            if project is None:
+                return jsonify({"error": "项目未找到"}), 404
+            keyword = keyword or project['keyword']
+            due_at = None if data.get('force') else datetime.now().isoformat()
+            failed_articles = db.list_articles_by_state(project_id, (processing_state.FAILED,), due_at)
+        matcher = KeywordMatcher.from_query(keyword, data.get('aliases'))
         
         if not failed_articles:
             return jsonify({"processed": 0, "failed": 0, "results": []})
@@ -377,59 +460,14 @@ def retry_failed():
         print(f"重新处理失败的文章: 共 {len(failed_articles)} 篇")
         print(f"{'='*60}\n")
         
-        pmc_fetcher = PMCFetcher()
-        processed_articles = []
-        processed_count = 0
-        still_failed = 0
-        
-        for idx, article in enumerate(failed_articles, 1):
-            # 修改：不再直接跳过没有 pmc_id 的文章
-            # 尝试通过 PMID 获取
-            article['fulltext_processed'] = True
-            
-            try:
-                fulltext_info = pmc_fetcher.get_fulltext_info(article['pmid'], keyword)
-                
-                if fulltext_info and fulltext_info.get('fulltext'):
-                    # 成功获取全文
-                    article['fulltext'] = fulltext_info['fulltext']
-                    article['has_fulltext'] = True
-                    article['pmc_id'] = fulltext_info.get('pmc_id') or article.get('pmc_id')
-                    article['pmc_available'] = True
-                    article['fulltext_error'] = None
-                    
-                    mentions = fulltext_info['fulltext']['total_mentions']
-                    pmc_id = article.get('pmc_id', 'N/A')
-                    print(f"[{idx}/{len(failed_articles)}] ✅ {pmc_id}: 重试成功，找到 {mentions} 处提及")
-                    
-                    if mentions > 0:
-                        article['relevance']['score'] += mentions * 5
-                    
-                    processed_count += 1
-                else:
-                    # 重试失败
-                    pmid = article.get('pmid', 'N/A')
-                    pmc_id = article.get('pmc_id', '')
-                    
-                    if not pmc_id:
-                        print(f"[{idx}/{len(failed_articles)}] ⚠️ PMID {pmid}: 无PMC ID")
-                        article['fulltext_error'] = 'NO_PMC_ID'
-                    else:
-                        print(f"[{idx}/{len(failed_articles)}] ⚠️ {pmc_id}: 全文不可用")
-                        article['fulltext_error'] = 'FETCH_FAILED'
-                    
-                    article['has_fulltext'] = False
-                    article['pmc_available'] = bool(pmc_id)
-                    still_failed += 1
-                    
-            except Exception as e:
-                print(f"[{idx}/{len(failed_articles)}] ❌ PMID {article.get('pmid', 'N/A')}: 重试出错 - {e}")
-                article['fulltext_error'] = str(e)
-                article['has_fulltext'] = False
-                article['pmc_available'] = bool(article.get('pmc_id'))
-                still_failed += 1
-            
-            processed_articles.append(article)
+        outcomes = fulltext_processor.process(
+            failed_articles, matcher, record_errors=True, label="重试成功，"
+        )
+        processed_articles = failed_articles
+        processed_count = sum(1 for o in outcomes.values() if o['status'] == 'success')
+        still_failed = len(failed_articles) - processed_count
+        if project_id:
+            db.save_articles(project_id, processed_articles)
         
         print(f"\n✅ 重试完成: 成功 {processed_count} 篇，仍失败 {still_failed} 篇\n")
         
@@ -451,13 +489,14 @@ def continue_fulltext():
     """
     继续处理更多文章的详细全文（渐进式加载）
     
-    请求体: {articles: [待处理的文章列表], keyword}
+    请求体: {articles: [待处理的文章列表], keyword, aliases (可选)}
     返回: {processed, results}
     """
     try:
         data = request.get_json()
         articles_to_process = data.get('articles', [])
         keyword = data.get('keyword', '')
+        matcher = KeywordMatcher.from_query(keyword, data.get('aliases'))
         
         if not keyword:
             return jsonify({"error": "关键词不能为空"}), 400
@@ -476,53 +515,10 @@ def continue_fulltext():
         # 直接使用传入的文章列表，不再重新搜索！
         target_articles = articles_to_process
         
-        # 处理全文
-        pmc_fetcher = PMCFetcher()
-        processed_articles = []
-        processed_count = 0
-        
-        for idx, article in enumerate(target_articles, 1):
-            # 修改：不再直接跳过没有 pmc_id 的文章
-            article['fulltext_processed'] = True
-            
-            try:
-                fulltext_info = pmc_fetcher.get_fulltext_info(article['pmid'], keyword)
-                
-                if fulltext_info and fulltext_info.get('fulltext'):
-                    # 成功获取全文
-                    article['fulltext'] = fulltext_info['fulltext']
-                    article['has_fulltext'] = True
-                    article['pmc_id'] = fulltext_info.get('pmc_id') or article.get('pmc_id')
-                    article['pmc_available'] = True
-                    
-                    mentions = fulltext_info['fulltext']['total_mentions']
-                    pmc_id = article.get('pmc_id', 'N/A')
-                    print(f"[{idx}/{len(target_articles)}] ✅ {pmc_id}: 找到 {mentions} 处提及")
-                    
-                    if mentions > 0:
-                        article['relevance']['score'] += mentions * 5
-                    
-                    processed_count += 1
-                else:
-                    # 无法获取全文
-                    pmid = article.get('pmid', 'N/A')
-                    pmc_id = article.get('pmc_id', '')
-                    
-                    if not pmc_id:
-                        print(f"[{idx}/{len(target_articles)}] ⚠️ PMID {pmid}: 无PMC ID")
-                    else:
-                        print(f"[{idx}/{len(target_articles)}] ⚠️ {pmc_id}: 全文不可用")
-                    
-                    article['has_fulltext'] = False
-                    article['pmc_available'] = bool(pmc_id)
-                    
-            except Exception as e:
-                print(f"[{idx}/{len(target_articles)}] ❌ PMID {article.get('pmid', 'N/A')}: 处理失败 - {e}")
-                article['has_fulltext'] = False
-                article['pmc_available'] = bool(article.get('pmc_id'))
-            
-            # 无论成功还是失败，都返回文章
-            processed_articles.append(article)
+        # 处理全文（无论成功还是失败，都返回文章）
+        outcomes = fulltext_processor.process(target_articles, matcher)
+        processed_articles = target_articles
+        processed_count = sum(1 for o in outcomes.values() if o['status'] == 'success')
         
         print(f"\n✅ 完成增量处理: {processed_count}/{len(target_articles)} 篇\n")
         
@@ -538,10 +534,222 @@ def continue_fulltext():
         return jsonify({"error": str(e)}), 500
 
 
-def analyze_relevance(article: Dict, keyword: str) -> Dict:
+def search_pubmed_fallback(keyword: str, years: int, matcher: KeywordMatcher) -> List[Dict]:
+    """Europe PMC 没有结果时降级到 PubMed 搜索"""
+    print("⚠️ Europe PMC 未找到文章，尝试 PubMed 搜索...")
+    searcher = PubMedSearcher()
+    pmid_list = searcher.search_articles(keyword, years, matcher.keywords[1:])
+    if not pmid_list:
+        return []
+
+    articles = searcher.fetch_article_details(pmid_list)
+    for article in articles:
+        article['relevance'] = analyze_relevance(article, matcher)
+        article['keyword'] = keyword
+        article['has_fulltext'] = False
+    return articles
+
+
+def ndjson_event(event_type: str, **payload) -> str:
+    """流式接口的一行事件（NDJSON）"""
+    return json.dumps({"type": event_type, **payload}, ensure_ascii=False) + "\n"
+
+
+def stream_fulltext_outcomes(outcomes, total: int, project_id: Optional[str] = None,
+                             save_every: int = 20):
+    """
+    把全文处理结果逐篇转换为 article 事件，并按批写入项目
+
+    Args:
+        outcomes: fulltext_processor.iter_completed 产出的 (下标, 处理结果)
+        total: 本次处理的文章总数
+        project_id: 提供时，处理完的文章每 save_every 篇保存一次到项目
+    """
+    pending = []
+    processed_count = 0
+    fulltext_count = 0
+    try:
+        for index, outcome in outcomes:
+            processed_count += 1
+            if outcome['status'] == 'success':
+                fulltext_count += 1
+            pending.append(outcome['article'])
+            if project_id and len(pending) >= save_every:
+                db.save_articles(project_id, pending)
+                pending = []
+
+            yield ndjson_event(
+                "article",
+                index=index,
+                status=outcome['status'],
+                mentions=outcome['mentions'],
+                article=outcome['article'],
+                processed=processed_count,
+                total=total
+            )
+    finally:
+        # 客户端中途断开时也保存已完成的部分
+        if project_id and pending:
+            db.save_articles(project_id, pending)
+
+    yield ndjson_event("done", total=total, processed=processed_count,
+                       fulltext_available=fulltext_count)
+
+
+@app.route('/api/search/stream', methods=['POST'])
+def search_literature_stream():
+    """
+    流式文献搜索接口：搜索 → 解析PMC ID → 获取全文 → 解析，逐篇推送结果
+    
+    响应为 NDJSON（每行一个JSON事件）：
+        {"type": "search_progress", "found": 1000}
+        {"type": "results", "total", "hit_count", "is_truncated", "cache", "error", "results": [...]}
+        {"type": "article", "index", "status", "mentions", "article", "processed", "total"}
+        {"type": "done", "total", "processed", "fulltext_available"}
+        {"type": "error", "error": "..."}
+    
+    Request JSON:
+        {
+            "keyword": "DepMap",
+            "aliases": [...],  // 可选
+            "years": 3,
+            "max_results": 2000,  // 可选
+            "max_fulltext": 20,  // 可选，处理相关性最高的前N篇；为 null 时边搜索边处理全部文章
+            "project_id": "abc12345",  // 可选，结果直接保存到该项目
+            "bypass_cache": false  // 可选，不使用缓存的搜索结果
+        }
+    """
+    data = request.get_json() or {}
+    keyword = data.get('keyword', '')
+    aliases = data.get('aliases') or []
+    years = data.get('years', 3)
+    max_results = int(data.get('max_results') or SEARCH_MAX_RESULTS)
+    max_fulltext = data.get('max_fulltext', 20)
+    project_id = data.get('project_id')
+    bypass_cache = bool(data.get('bypass_cache', False))
+
+    if not keyword:
+        return jsonify({"error": "关键词不能为空"}), 400
+
+    def generate():
+        try:
+            matcher = KeywordMatcher.from_query(keyword, aliases)
+            europepmc_searcher = EuropePMCSearcher()
+            print(f"\n{'='*60}")
+            print(f"流式搜索: {keyword}（近{years}年）")
+            print(f"{'='*60}\n")
+
+            # 处理全部文章时不必等排序，搜索结果边到达边提交全文处理
+            pipeline = max_fulltext is None
+            articles = []
+            futures = []
+            for article in europepmc_searcher.iter_fulltext(
+                keyword=keyword,
+                years=years,
+                journals=HIGH_QUALITY_JOURNALS,
+                max_results=max_results,
+                aliases=aliases,
+                bypass_cache=bypass_cache
+            ):
+                articles.append(article)
+                if len(articles) % 100 == 0:
+                    if pipeline:
+                        futures += fulltext_processor.submit(articles[-100:], matcher)
+                    yield ndjson_event("search_progress", found=len(articles))
+
+            if not articles:
+                articles = search_pubmed_fallback(keyword, years, matcher)
+            if pipeline and len(articles) > len(futures):
+                futures += fulltext_processor.submit(articles[len(futures):], matcher)
+
+            if pipeline:
+                # 结果列表中的文章可能正被后台线程更新，发送浅拷贝
+                results = [dict(article) for article in articles]
+                to_process = articles
+            else:
+                articles.sort(key=lambda x: x.get('relevance', {}).get('score', 0), reverse=True)
+                results = articles
+                to_process = articles[:max_fulltext]
+
+            if project_id and results:
+                db.save_articles(project_id, results)
+
+            yield ndjson_event(
+                "results",
+                keyword=keyword,
+                total=len(articles),
+                hit_count=europepmc_searcher.hit_count,
+                # 翻页中途出错时结果不完整：按截断处理并带上错误原因
+                is_truncated=europepmc_searcher.truncated or bool(europepmc_searcher.error),
+                max_results=max_results,
+                cache=europepmc_searcher.cache_info,
+                error=europepmc_searcher.error,
+                results=results
+            )
+
+            if not pipeline:
+                futures = fulltext_processor.submit(to_process, matcher)
+            outcomes = fulltext_processor.iter_completed(futures)
+            yield from stream_fulltext_outcomes(outcomes, len(to_process), project_id)
+
+        except Exception as e:
+            print(f"流式搜索错误: {e}")
+            import traceback
+            traceback.print_exc()
+            yield ndjson_event("error", error=str(e))
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/projects/<project_id>/fulltext/stream', methods=['POST'])
+def process_project_fulltext_stream(project_id: str):
+    """
+    流式处理项目中尚未处理完的文章（含上次中断在中间阶段的），逐篇推送结果并保存到项目
+    
+    文章直接从数据库读取，客户端无需回传文章列表。
+    
+    请求体: {keyword (可选，默认项目关键词), aliases (可选)}
+    响应: NDJSON，事件格式同 /api/search/stream 的 article / done / error
+    """
+    data = request.get_json(silent=True) or {}
+    project = db.get_project_stats(project_id)
+    if project is None:
+        return jsonify({"error": "项目未找到"}), 404
+
+    keyword = data.get('keyword') or project['keyword']
+    matcher = KeywordMatcher.from_query(keyword, data.get('aliases'))
+    # 按相关性从高到低，与前端一致
+    unprocessed = db.list_articles_by_state(project_id, processing_state.UNFINISHED) or []
+
+    def generate():
+        try:
+            print(f"\n{'='*60}")
+            print(f"流式处理项目 {project_id}: 待处理 {len(unprocessed)} 篇")
+            print(f"{'='*60}\n")
+
+            futures = fulltext_processor.submit(unprocessed, matcher)
+            # 先保存解析到的PMC ID，中断后不必重新查询
+            db.save_articles(project_id, [dict(article) for article in unprocessed])
+            outcomes = fulltext_processor.iter_completed(futures)
+            yield from stream_fulltext_outcomes(outcomes, len(unprocessed), project_id)
+
+        except Exception as e:
+            print(f"流式处理错误: {e}")
+            import traceback
+            traceback.print_exc()
+            yield ndjson_event("error", error=str(e))
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def analyze_relevance(article: Dict, keyword: Union[str, KeywordMatcher]) -> Dict:
     """
     分析文章与关键词的相关性
     
+    Args:
+        article: 文章信息
+        keyword: 关键词，或包含别名的 KeywordMatcher
+    
     Returns:
         {
             "score": 相关性分数,
@@ -549,28 +757,30 @@ def analyze_relevance(article: Dict, keyword: str) -> Dict:
             "context": 关键词上下文片段
         }
     """
-    title = article.get('title', '').lower()
-    abstract = article.get('abstract', '').lower()
-    keyword_lower = keyword.lower()
+    matcher = KeywordMatcher.coerce(keyword)
+    title = article.get('title') or ''
+    abstract = article.get('abstract') or ''
     
     score = 0
     mentions = []
     contexts = []
     
     # 在标题中出现，分数更高
-    if keyword_lower in title:
+    if matcher.contains(title):
         score += 50
         mentions.append("title")
     
     # 在摘要中查找关键词
-    if keyword_lower in abstract:
+    abstract_matches = matcher.find_all(abstract)
+    if abstract_matches:
         score += 30
         mentions.append("abstract")
         
-        # 提取关键词周围的上下文
-        pattern = re.compile(f'.{{0,100}}{re.escape(keyword_lower)}.{{0,100}}', re.IGNORECASE)
-        matches = pattern.findall(article.get('abstract', ''))
-        contexts = [match.strip() for match in matches[:3]]  # 最多3个上下文
+        # 提取关键词周围的上下文（最多3个）
+        contexts = [
+            abstract[max(0, match.start - 100):match.end + 100].strip()
+            for match in abstract_matches[:3]
+        ]
     
     return {
         "score": score,
@@ -631,6 +841,7 @@ def create_project():
 
 
 @app.route('/api/projects', methods=['GET'])
+@conditional_get(project_list_version)
 def list_projects():
     """
     获取项目列表
@@ -655,6 +866,7 @@ def list_projects():
 
 
 @app.route('/api/projects/<project_id>', methods=['GET'])
+@conditional_get(project_version)
 def get_project(project_id: str):
     """
     获取项目详情和所有文章
@@ -676,6 +888,191 @@ def get_project(project_id: str):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/projects/<project_id>/articles', methods=['GET'])
+@conditional_get(project_version)
+def list_project_articles(project_id: str):
+    """
+    分页获取项目文章
+    
+    查询参数:
+        offset (默认0), limit (默认50，最大500)
+        sort: relevance（默认）/ date / journal / updated
+        order: asc / desc（默认按排序方式决定）
+        view: summary（默认，不含全文分析结果）/ full
+        fields: 逗号分隔的字段列表，指定后忽略 view
+    返回: {articles: [...], total, offset, limit}
+    """
+    try:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        sort = request.args.get('sort', 'relevance')
+        order = request.args.get('order')
+        view = request.args.get('view', 'summary')
+        
+        if request.args.get('fields'):
+            fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        elif view in db.ARTICLE_VIEWS:
+            fields = db.ARTICLE_VIEWS[view]
+        else:
+            return jsonify({"error": f"无效的视图: {view}"}), 400
+        
+        result = db.list_articles(project_id, offset, limit, sort, order, fields)
+        
+        if result is None:
+            return jsonify({"error": "项目未找到"}), 404
+        
+        return jsonify(result)
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"获取文章列表错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/projects/<project_id>/articles/<pmid>', methods=['GET'])
+@conditional_get(project_version)
+def get_project_article(project_id: str, pmid: str):
+    """
+    获取项目中单篇文章的完整信息（含全文分析结果）
+    
+    返回: {pmid, title, ..., fulltext}
+    """
+    try:
+        article = db.get_article(project_id, pmid)
+        
+        if article is None:
+            return jsonify({"error": "文章未找到"}), 404
+        
+        return jsonify(article)
+    
+    except Exception as e:
+        print(f"获取文章错误: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/projects/<project_id>/mentions', methods=['GET'])
+@conditional_get(project_version)
+def list_project_mentions(project_id: str):
+    """
+    分页查询项目中的关键词提及
+    
+    查询参数:
+        section: methods / results / discussion / other（可选）
+        keyword: 实际命中的别名（可选，不区分大小写）
+        offset (默认0), limit (默认50，最大500)
+    返回: {mentions: [{pmid, title, section, section_kind, section_path, keyword, context, ...}], total, offset, limit}
+    """
+    try:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        
+        result = db.list_mentions(
+            project_id,
+            section=request.args.get('section') or None,
+            keyword=request.args.get('keyword') or None,
+            offset=offset,
+            limit=limit
+        )
+        
+        if result is None:
+            return jsonify({"error": "项目未找到"}), 404
+        
+        return jsonify(result)
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"查询关键词提及错误: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/projects/<project_id>/mentions/stats', methods=['GET'])
+@conditional_get(project_version)
+def get_project_mention_stats(project_id: str):
+    """
+    项目的关键词提及和图表统计（按章节类型、别名汇总）
+    
+    返回: {sections: {...}, keywords: {...}, figures: {...}, unmigrated_articles}
+    """
+    try:
+        stats = db.get_mention_stats(project_id)
+        
+        if stats is None:
+            return jsonify({"error": "项目未找到"}), 404
+        
+        return jsonify(stats)
+    
+    except Exception as e:
+        print(f"获取提及统计错误: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/projects/<project_id>/figures', methods=['GET'])
+@conditional_get(project_version)
+def list_project_figures(project_id: str):
+    """
+    分页查询项目中的图表
+    
+    查询参数:
+        mentions_keyword: true 只返回图注提到关键词的图表，false 只返回未提到的（可选）
+        offset (默认0), limit (默认50，最大500)
+    返回: {figures: [{pmid, pmc_id, title, id, label, caption, mentions_keyword}], total, offset, limit}
+    """
+    try:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        mentions_keyword = request.args.get('mentions_keyword')
+        if mentions_keyword is not None:
+            mentions_keyword = mentions_keyword.lower() in ('1', 'true', 'yes')
+        
+        result = db.list_figures(project_id, mentions_keyword, offset, limit)
+        
+        if result is None:
+            return jsonify({"error": "项目未找到"}), 404
+        
+        return jsonify(result)
+    
+    except Exception as e:
+        print(f"查询图表错误: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/library/search', methods=['GET'])
+def search_library():
+    """
+    在已保存文章的标题、摘要、正文章节和图注中全文检索（不访问 Europe PMC）
+    
+    查询参数:
+        q: 检索式，支持 AND / OR / NOT、"短语"、前缀 crispr*、NEAR(a b, 10)、限定列 methods: depmap
+           （可用列: title, abstract, methods, results, discussion, captions）
+        project_id: 只在该项目中检索（可选，默认全部项目）
+        offset (默认0), limit (默认20，最大100)
+    返回: {results: [{pmid, project_id, project_name, title, journal, year, pmc_id, score, snippet}], total, offset, limit}
+          snippet 中命中的词用 <mark></mark> 标记，其余文本未转义
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "检索式不能为空"}), 400
+        
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        project_id = request.args.get('project_id') or None
+        
+        return jsonify(db.search_articles(query, project_id, offset, limit))
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"全文检索错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/projects/<project_id>', methods=['PUT'])
 def update_project(project_id: str):
     """
@@ -726,8 +1123,10 @@ def save_project_articles(project_id: str):
     """
     保存文章到项目（批量保存/更新）
     
+    只需提交有变化的文章；内容与数据库一致的文章会被跳过。
+    
     请求体: {articles: [...]}
-    返回: {saved_count, message}
+    返回: {saved_count, skipped_count, message, stats}
     """
     try:
         data = request.get_json()
@@ -743,6 +1142,7 @@ def save_project_articles(project_id: str):
         
         return jsonify({
             "saved_count": saved_count,
+            "skipped_count": len(articles) - saved_count,
             "message": f"成功保存 {saved_count} 篇文章",
             "stats": stats
         })
@@ -754,7 +1154,39 @@ def save_project_articles(project_id: str):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/projects/<project_id>/articles', methods=['PATCH'])
+def patch_project_articles(project_id: str):
+    """
+    只更新文章的指定字段
+    
+    请求体: {articles: [{pmid, 字段: 新值, ...}]}
+    可更新字段: pmc_id, title, abstract, journal, year, date, doi, keyword, authors,
+               relevance, has_fulltext, pmc_available, fulltext_processed, fulltext
+    返回: {updated_count, stats}
+    """
+    try:
+        data = request.get_json()
+        patches = data.get('articles', [])
+        
+        if not patches:
+            return jsonify({"error": "文章列表不能为空"}), 400
+        
+        updated_count = db.patch_articles(project_id, patches)
+        
+        return jsonify({
+            "updated_count": updated_count,
+            "stats": db.get_project_stats(project_id)
+        })
+    
+    except Exception as e:
+        print(f"更新文章错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/projects/<project_id>/stats', methods=['GET'])
+@conditional_get(project_version)
 def get_project_statistics(project_id: str):
     """
     获取项目统计信息
@@ -774,8 +1206,166 @@ def get_project_statistics(project_id: str):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/projects/<project_id>/refresh', methods=['POST'])
+def refresh_project(project_id: str):
+    """
+    增量更新项目：只检索同步水位之后首次发表或收录的文章，按 PMID 去掉项目中已有的，
+    新文章保存到项目并创建只处理这些文章的后台任务
+    
+    没有同步水位的项目（增量更新前创建的）以项目创建日期为水位。
+    搜索出错或结果被截断时不推进水位，下次更新重新检索同一时间段。
+    项目已有进行中的后台任务时返回该任务，新文章保持待处理状态，可之后再创建任务处理。
+    
+    请求体: {aliases (可选), max_results (可选), since (可选，YYYY-MM-DD，覆盖同步水位),
+            process (可选，默认 true，是否创建后台任务处理新文章)}
+    返回: {project_id, since, last_synced_at, found, new, hit_count, is_truncated, job}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        project = db.get_project_stats(project_id)
+        
+        if project is None:
+            return jsonify({"error": "项目未找到"}), 404
+        
+        if data.get('since'):
+            try:
+                since = datetime.strptime(data['since'], "%Y-%m-%d")
+            except (TypeError, ValueError):
+                return jsonify({"error": "since 应为 YYYY-MM-DD 格式的日期"}), 400
+        else:
+            watermark = project.get('last_synced_at') or project['created_at'][:10]
+            since = datetime.strptime(watermark, "%Y-%m-%d") - timedelta(days=SYNC_OVERLAP_DAYS)
+        since = since.strftime("%Y-%m-%d")
+        # 水位取检索开始的日期：检索期间新收录的文章下次还会被检索到
+        started = datetime.now().strftime("%Y-%m-%d")
+        
+        keyword = project['keyword']
+        aliases = data.get('aliases') or []
+        max_results = int(data.get('max_results') or SEARCH_MAX_RESULTS)
+        print(f"\n🔄 增量更新项目 {project_id}: {keyword}（{since} 之后）")
+        
+        europepmc_searcher = EuropePMCSearcher()
+        articles = europepmc_searcher.search_fulltext(
+            keyword=keyword,
+            years=project['years'],
+            journals=HIGH_QUALITY_JOURNALS,
+            max_results=max_results,
+            aliases=aliases,
+            bypass_cache=True,
+            since=since
+        )
+        if europepmc_searcher.error:
+            return jsonify({"error": f"Europe PMC 搜索失败: {europepmc_searcher.error}"}), 502
+        
+        existing = db.existing_pmids(project_id, [a['pmid'] for a in articles if a.get('pmid')])
+        new_articles = [a for a in articles if a.get('pmid') and a['pmid'] not in existing]
+        if new_articles:
+            db.save_articles(project_id, new_articles)
+        
+        is_truncated = europepmc_searcher.truncated
+        if is_truncated:
+            print(f"  ⚠️  结果被截断（共命中{europepmc_searcher.hit_count}篇，上限{max_results}篇），不推进同步水位")
+        else:
+            db.set_sync_watermark(project_id, started)
+        
+        job = None
+        if new_articles and data.get('process', True):
+            job = job_queue.create_job(project_id, keyword, aliases,
+                                       pmids=[a['pmid'] for a in new_articles])
+        
+        print(f"✅ 增量更新完成: 检索到 {len(articles)} 篇，新增 {len(new_articles)} 篇\n")
+        return jsonify({
+            "project_id": project_id,
+            "since": since,
+            "last_synced_at": project.get('last_synced_at') if is_truncated else started,
+            "found": len(articles),
+            "new": len(new_articles),
+            "hit_count": europepmc_searcher.hit_count,
+            "is_truncated": is_truncated,
+            "job": job
+        })
+    
+    except Exception as e:
+        print(f"增量更新错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/projects/<project_id>/jobs', methods=['POST'])
+def create_project_job(project_id: str):
+    """
+    创建后台任务，在服务器端处理项目中全部未处理的文章
+    
+    请求体: {keyword (可选，默认项目关键词), aliases (可选)}
+    返回: {job: {job_id, status, total, processed, fulltext, progress, ...}}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        job = job_queue.create_job(project_id, data.get('keyword'), data.get('aliases'))
+        
+        if job is None:
+            return jsonify({"error": "项目未找到"}), 404
+        
+        return jsonify({"job": job})
+    
+    except Exception as e:
+        print(f"创建后台任务错误: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/projects/<project_id>/jobs', methods=['GET'])
+def list_project_jobs(project_id: str):
+    """获取项目的后台任务列表"""
+    try:
+        return jsonify({"jobs": job_queue.list_jobs(project_id)})
+    
+    except Exception as e:
+        print(f"获取任务列表错误: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id: str):
+    """
+    获取后台任务状态和进度
+    
+    返回: {job: {status: queued|running|completed|cancelled|failed, total, processed, progress, ...}}
+    """
+    try:
+        job = job_queue.get_job(job_id)
+        
+        if job is None:
+            return jsonify({"error": "任务未找到"}), 404
+        
+        return jsonify({"job": job})
+    
+    except Exception as e:
+        print(f"获取任务状态错误: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id: str):
+    """取消后台任务（运行中的任务在当前文章处理完后停止，已处理的文章保留在项目中）"""
+    try:
+        job = job_queue.cancel_job(job_id)
+        
+        if job is None:
+            return jsonify({"error": "任务未找到"}), 404
+        
+        return jsonify({"job": job})
+    
+    except Exception as e:
+        print(f"取消任务错误: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 if __name__ == '__main__':
     print("Starting FigureScout API Server...")
     print("API available at: http://localhost:5000")
+    # debug 模式下 reloader 父进程不处理请求，只在实际服务的子进程中立即恢复后台任务
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        job_queue.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,523 @@
+"""
+异步全文获取模块
+PMCFetcher / EuropePMCSearcher 的 asyncio 版本：一个事件循环线程即可同时进行数百个请求，
+XML解析等CPU密集的步骤交给执行器，不阻塞事件循环。
+限速、重试和请求指标与同步的 http_client 共用同一组主机状态，两种方式同时运行时合计仍不超过上游限速。
+
+同步代码（Flask 请求线程、后台任务线程）通过 AsyncBridge 在后台事件循环中运行协程：
+    bridge = get_bridge()
+    info = bridge.run(AsyncPMCFetcher().get_fulltext_info(pmid, "DepMap"))
+
+需要安装可选依赖 httpx；未安装时 AVAILABLE 为 False，调用方应回退到同步版本。
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import AsyncIterator, Awaitable, Dict, Iterator, List, Optional, Union
+
+try:
+    import httpx
+except ImportError:  # httpx 为可选依赖
+    httpx = None
+
+from europepmc_searcher import EuropePMCSearcher
+from http_client import NCBI_HOST, RETRY_STATUSES, HttpClient, get_client
+from keyword_matcher import KeywordMatcher
+from pmc_fetcher import PMCFetcher
+from search_cache import SearchCache
+
+AVAILABLE = httpx is not None
+
+# 异步连接配置（可通过环境变量覆盖）；速率限制与同步客户端共用
+ASYNC_MAX_CONNECTIONS = int(os.environ.get("FIGURESCOUT_ASYNC_MAX_CONNECTIONS", "100"))
+ASYNC_PER_HOST_LIMIT = int(os.environ.get("FIGURESCOUT_ASYNC_PER_HOST_LIMIT", "100"))
+
+
+class AsyncHttpClient:
+    """基于 httpx.AsyncClient 的异步HTTP客户端：按主机限并发和限速，429/5xx 和连接错误时退避重试"""
+
+    def __init__(self, client: Optional[HttpClient] = None,
+                 per_host_limit: int = ASYNC_PER_HOST_LIMIT,
+                 max_connections: int = ASYNC_MAX_CONNECTIONS):
+        """
+        Args:
+            client: 同步客户端，共用其限速器、重试配置和请求指标，默认使用进程内共享的客户端
+            per_host_limit: 每个主机同时进行的请求数上限
+            max_connections: 连接池的总连接数上限
+        """
+        if httpx is None:
+            raise ImportError("异步获取需要安装 httpx：pip install httpx")
+        self.client = client or get_client()
+        self.per_host_limit = max(1, per_host_limit)
+        self.max_connections = max(1, max_connections)
+        self._loop = None
+        self._http = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _bind(self) -> "httpx.AsyncClient":
+        """连接池和信号量属于创建它们的事件循环，在新的事件循环中使用时重新创建"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                follow_redirects=True
+            )
+            self._semaphores = {}
+        return self._http
+
+    async def get(self, url: str, **kwargs) -> "httpx.Response":
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> "httpx.Response":
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+        """
+        发送请求，参数与 httpx.AsyncClient.request 相同
+
+        Returns:
+            最后一次的响应（重试用尽时可能仍是 429/5xx，由调用方 raise_for_status）
+
+        Raises:
+            httpx.TransportError: 重试用尽后仍无法连接或超时
+        """
+        return await self._send(method, url, False, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator["httpx.Response"]:
+        """
+        发送请求并流式读取响应体（限速和重试同 request，重试只在读取响应体之前进行）
+
+        用法：
+            async with http.stream("POST", url, data=...) as response:
+                async for chunk in response.aiter_bytes(): ...
+        """
+        response = await self._send(method, url, True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def _send(self, method: str, url: str, stream: bool, **kwargs) -> "httpx.Response":
+        http = self._bind()
+        host = httpx.URL(url).host
+        state = self.client.host_state(host)
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        if host == NCBI_HOST:
+            self.client.add_ncbi_params(method, kwargs)
+
+        attempt = 0
+        while True:
+            response, error = None, None
+            async with semaphore:
+                waited = state.bucket.reserve() if state.bucket else 0.0
+                if waited > 0:
+                    await asyncio.sleep(waited)
+                start = time.perf_counter()
+                try:
+                    response = await http.send(http.build_request(method, url, **kwargs), stream=stream)
+                except httpx.TransportError as e:
+                    error = e
+                state.record(response.status_code if response is not None else None,
+                             time.perf_counter() - start, waited)
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt >= self.client.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None and stream:
+                await response.aclose()
+            delay = self.client.backoff_delay(attempt, response)
+            if response is not None and response.status_code == 429 and state.bucket:
+                # 同一主机的其他请求（包括同步客户端的）也一起等待
+                state.bucket.pause(delay)
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            print(f"🔁 {host} 请求失败（{reason}），{delay:.1f}s 后第 {attempt + 1} 次重试")
+            state.record_retry()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class AsyncBodyReader(io.RawIOBase):
+    """
+    把 httpx 流式响应体包装成同步的文件对象，供线程中的流式XML解析读取
+
+    每次读取时才从事件循环拉取下一块数据，整个响应体不会常驻内存。
+    只能在事件循环以外的线程中读取。
+    """
+
+    def __init__(self, response: "httpx.Response", loop: asyncio.AbstractEventLoop):
+        self._chunks = response.aiter_bytes()
+        self._loop = loop
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    async def _next_chunk(self) -> bytes:
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+    def readinto(self, buffer) -> int:
+        if not self._buffer:
+            self._buffer = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+            if not self._buffer:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class AsyncPMCFetcher:
+    """
+    PMCFetcher 的异步版本
+
+    网络请求在事件循环中并发进行；缓存读写在线程中进行，XML解析和关键词分析交给 executor。
+    缓存、结构化文档和关键词分析逻辑直接复用同步的 PMCFetcher，两者结果完全一致。
+    """
+
+    def __init__(self, fetcher: Optional[PMCFetcher] = None, http: Optional[AsyncHttpClient] = None,
+                 executor: Optional[Executor] = None):
+        """
+        Args:
+            fetcher: 同步 fetcher，提供缓存和解析逻辑
+            http: 异步HTTP客户端
+            executor: 执行XML解析和关键词分析的执行器，默认使用事件循环的默认线程池
+        """
+        self.fetcher = fetcher or PMCFetcher()
+        self.cache = self.fetcher.cache
+        self.http = http or AsyncHttpClient()
+        self.executor = executor
+
+    async def _io(self, func, *args):
+        """在线程中执行缓存读写"""
+        return await asyncio.to_thread(func, *args)
+
+    async def _cpu(self, func, *args):
+        """在执行器中执行XML解析和关键词分析"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def get_pmc_id(self, pmid: str) -> Optional[str]:
+        """
+        根据PubMed ID获取PMC ID
+
+        Returns:
+            PMC ID (如 'PMC1234567') 或 None
+        """
+        if self.cache.offline:
+            return None
+
+        try:
+            params = {
+                "dbfrom": "pubmed",
+                "id": pmid,
+                "linkname": "pubmed_pmc",
+                "retmode": "xml"
+            }
+            response = await self.http.get(f"{self.fetcher.BASE_URL}elink.fcgi", params=params, timeout=10)
+            response.raise_for_status()
+            return self.fetcher.parse_pmc_id(response.content)
+        except Exception as e:
+            print(f"获取PMC ID错误 (PMID: {pmid}): {e}")
+            return None
+
+    async def resolve_pmc_ids(self, pmids: List[str],
+                              known: Optional[Dict[str, str]] = None) -> Dict[str, Optional[str]]:
+        """
+        批量将PubMed ID解析为PMC ID，各块 elink 请求同时进行
+
+        Returns:
+            与 PMCFetcher.resolve_pmc_ids 相同
+        """
+        resolved, pending = self.fetcher.split_known(pmids, known)
+        if self.cache.offline or not pending:
+            return resolved
+
+        size = PMCFetcher.ELINK_BATCH_SIZE
+        chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+        results = await asyncio.gather(*(self._elink_batch(chunk) for chunk in chunks),
+                                       return_exceptions=True)
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, BaseException):
+                print(f"批量获取PMC ID错误 ({len(chunk)} 个PMID): {result}")
+            else:
+                resolved.update(result)
+        return resolved
+
+    async def _elink_batch(self, pmids: List[str]) -> Dict[str, Optional[str]]:
+        params = {
+            "dbfrom": "pubmed",
+            "id": pmids,
+            "linkname": "pubmed_pmc",
+            "retmode": "xml"
+        }
+        response = await self.http.post(f"{self.fetcher.BASE_URL}elink.fcgi", data=params, timeout=30)
+        response.raise_for_status()
+        return self.fetcher.parse_elink(pmids, response.content)
+
+    async def fetch_fulltext_xml(self, pmc_id: str) -> Optional[bytes]:
+        """
+        获取PMC全文XML（优先使用本地缓存，过期时做条件请求）
+
+        Returns:
+            XML原始字节
+        """
+        entry = await self._io(self.cache.get, pmc_id)
+        if entry and (self.cache.offline or entry.is_fresh(self.cache.max_age_seconds)):
+            return entry.data
+        if self.cache.offline:
+            return None
+
+        try:
+            params = {
+                "db": "pmc",
+                "id": pmc_id.replace("PMC", ""),
+                "rettype": "xml",
+                "retmode": "xml"
+            }
+            headers = entry.validators() if entry else {}
+            response = await self.http.get(f"{self.fetcher.BASE_URL}efetch.fcgi",
+                                           params=params, headers=headers, timeout=30)
+            if response.status_code == 304 and entry:
+                await self._io(self.cache.touch, pmc_id)
+                return entry.data
+            response.raise_for_status()
+
+            await self._io(self.fetcher.store_xml, pmc_id, response.content, response.headers)
+            return response.content
+        except Exception as e:
+            print(f"获取全文XML错误 (PMC ID: {pmc_id}): {e}")
+            return None
+
+    async def get_document(self, pmc_id: str) -> Optional[Dict]:
+        """获取文章的结构化文档（缓存的文档 → 缓存的XML → 网络）"""
+        document = await self._io(self.cache.get_document, pmc_id, PMCFetcher.DOCUMENT_VERSION)
+        if document is not None:
+            return document
+
+        xml_content = await self.fetch_fulltext_xml(pmc_id)
+        if not xml_content:
+            return None
+        return await self._cpu(self.fetcher.document_from_xml, pmc_id, xml_content)
+
+    async def get_fulltext_info(self, pmid: str, keyword: Union[str, KeywordMatcher],
+                                pmc_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        获取文章的完整全文信息
+
+        Returns:
+            与 PMCFetcher.get_fulltext_info 相同
+        """
+        if not pmc_id:
+            pmc_id = await self.get_pmc_id(pmid)
+        if not pmc_id:
+            return None
+
+        document = await self.get_document(pmc_id)
+        infos = await self._cpu(self.fetcher.analyze_documents, [pmc_id], {pmc_id: document}, keyword)
+        return infos[pmc_id]
+
+    async def get_fulltext_info_batch(self, pmc_ids: List[str],
+                                      keyword: Union[str, KeywordMatcher]) -> Dict[str, Optional[Dict]]:
+        """
+        一次 efetch 批量获取多篇全文；批量响应中缺失的文章同时单独重试
+
+        Returns:
+            与 PMCFetcher.get_fulltext_info_batch 相同
+        """
+        documents, to_fetch = await self._cpu(self.fetcher.cached_documents, pmc_ids)
+
+        if to_fetch and not self.cache.offline:
+            try:
+                # 响应体边下载边在线程中逐篇拆分解析，与同步版本的 stream=True 一样不整体读入内存
+                # （读取方需要在线程中回调事件循环，不能交给进程执行器）
+                async with self.http.stream("POST", f"{self.fetcher.BASE_URL}efetch.fcgi",
+                                            data=PMCFetcher.efetch_params(to_fetch), timeout=60) as response:
+                    response.raise_for_status()
+                    reader = AsyncBodyReader(response, asyncio.get_running_loop())
+                    documents.update(await self._io(
+                        self.fetcher.documents_from_articleset, reader, set(to_fetch)
+                    ))
+            except Exception as e:
+                print(f"批量获取全文XML错误 ({len(to_fetch)} 篇): {e}")
+
+        missing = list(dict.fromkeys(pmc_id for pmc_id in pmc_ids if pmc_id not in documents))
+        if missing:
+            fetched = await asyncio.gather(*(self.get_document(pmc_id) for pmc_id in missing))
+            documents.update(zip(missing, fetched))
+
+        return await self._cpu(self.fetcher.analyze_documents, pmc_ids, documents, keyword)
+
+    async def get_cached_fulltext_info(self, pmc_id: str,
+                                       keyword: Union[str, KeywordMatcher]) -> Optional[Dict]:
+        """只用本地缓存的XML解析全文（不发起网络请求）"""
+        return await self._cpu(self.fetcher.get_cached_fulltext_info, pmc_id, keyword)
+
+
+class AsyncEuropePMCSearcher(EuropePMCSearcher):
+    """
+    EuropePMCSearcher 的异步版本
+
+    search_fulltext / iter_fulltext 为协程和异步生成器；查询构建和结果解析与同步版本相同。
+    """
+
+    def __init__(self, http: Optional[AsyncHttpClient] = None, cache: Optional[SearchCache] = None):
+        super().__init__(cache)
+        self.http = http or AsyncHttpClient()
+
+    async def search_fulltext(self, keyword: str, years: int = 3,
+                              journals: List[str] = None, max_results: int = 1000,
+                              aliases: Optional[List[str]] = None,
+                              bypass_cache: bool = False, since: Optional[str] = None) -> List[Dict]:
+        """在全文中搜索关键词，参数与返回值同 EuropePMCSearcher.search_fulltext"""
+        return [article async for article in self.iter_fulltext(keyword, years, journals, max_results, aliases,
+                                                                bypass_cache=bypass_cache, since=since)]
+
+    async def iter_fulltext(self, keyword: str, years: int = 3,
+                            journals: List[str] = None, max_results: int = 1000,
+                            aliases: Optional[List[str]] = None,
+                            page_size: int = EuropePMCSearcher.MAX_PAGE_SIZE,
+                            bypass_cache: bool = False, since: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        逐篇产出全文搜索结果，沿 nextCursorMark 持续翻页
+
+        处理当前页时下一页已在请求中。
+
+        Yields:
+            解析后的文章；搜索出错时记录日志、设置 error 并停止翻页
+        """
+        matcher = KeywordMatcher.from_query(keyword, aliases)
+        query = self._build_query(matcher, years, journals, since)
+        self.error = None
+        print(f"Europe PMC 查询: {query}")
+
+        # 缓存读写是本地 SQLite 操作，在线程中进行
+        cached = await asyncio.to_thread(self._cached_results, query, keyword, max_results, bypass_cache)
+        if cached is not None:
+            for article in cached:
+                yield article
+            return
+
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+        self.hit_count = None
+        self.truncated = False
+        cursor = "*"
+        fetched = 0
+        page = 0
+        snapshots = []
+
+        task = asyncio.ensure_future(self._fetch_page(query, cursor, min(page_size, max_results)))
+        try:
+            while task is not None:
+                try:
+                    data = await task
+                except Exception as e:
+                    print(f"Europe PMC 搜索错误: {e}")
+                    self.error = str(e)
+                    return
+
+                page += 1
+                results = data.get("resultList", {}).get("result", [])
+                if self.hit_count is None:
+                    self.hit_count = data.get("hitCount")
+                fetched += len(results)
+                print(f"Europe PMC 第 {page} 页返回 {len(results)} 篇文章"
+                      f"（累计 {fetched}/{self.hit_count}）")
+
+                # 先发出下一页请求，再解析当前页
+                next_cursor = data.get("nextCursorMark")
+                task = None
+                if (results and next_cursor and next_cursor != cursor
+                        and fetched < max_results
+                        and (self.hit_count is None or fetched < self.hit_count)):
+                    cursor = next_cursor
+                    task = asyncio.ensure_future(
+                        self._fetch_page(query, cursor, min(page_size, max_results - fetched))
+                    )
+                elif fetched >= max_results and (self.hit_count or 0) > fetched:
+                    self.truncated = True
+
+                for result in results:
+                    article = self._parse_result(result, keyword, matcher)
+                    if article:
+                        snapshots.append(json.dumps(article, ensure_ascii=False))
+                        yield article
+
+            await asyncio.to_thread(self._store_results, query, max_results, snapshots)
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def _fetch_page(self, query: str, cursor: str, page_size: int) -> Dict:
+        """请求一页搜索结果（JSON 在线程中解码）"""
+        response = await self.http.get(f"{self.BASE_URL}/search",
+                                       params=self._page_params(query, cursor, page_size), timeout=30)
+        response.raise_for_status()
+        return await asyncio.to_thread(response.json)
+
+
+class AsyncBridge:
+    """
+    在后台线程中运行一个常驻事件循环，供同步代码调用协程
+
+    所有协程共用这一个事件循环，因此 httpx 连接池在多次调用之间保持复用。
+    不能在事件循环线程内（即协程或 Future 回调中）调用 run / iterate，否则会死锁。
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-bridge", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, coro: Awaitable) -> Future:
+        """在后台事件循环中运行协程，立即返回 concurrent.futures.Future（取消时同时取消协程）"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None):
+        """运行协程并等待结果"""
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """把异步生成器转为同步迭代器；调用方提前停止迭代时关闭异步生成器"""
+        async def next_item():
+            return await agen.__anext__()
+
+        try:
+            while True:
+                try:
+                    item = self.run(next_item())
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            self.run(agen.aclose())
+
+
+_default_bridge: Optional[AsyncBridge] = None
+_default_bridge_lock = threading.Lock()
+
+
+def get_bridge() -> AsyncBridge:
+    """进程内共享的事件循环桥"""
+    global _default_bridge
+    with _default_bridge_lock:
+        if _default_bridge is None:
+            _default_bridge = AsyncBridge()
+        return _default_bridge
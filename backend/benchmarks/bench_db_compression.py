@@ -0,0 +1,186 @@
+"""
+大文本列压缩基准测试
+对比不同压缩方式下样本项目的数据库文件大小和读取耗时
+
+用法（在 backend 目录下运行）：
+    # 使用已有数据库中的真实项目作为样本
+    python benchmarks/bench_db_compression.py --from-db figurescout_projects.db --project a1b2c3d4
+
+    # 或使用生成的样本文章
+    python benchmarks/bench_db_compression.py [--articles 200] [--repeat 5]
+
+每种压缩方式使用独立的临时数据库，写入后 VACUUM 再测量文件大小。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import TEXT_FORMATS, ProjectDatabase, zstandard
+
+# 生成样本正文用的词表（按 Zipf 分布抽词，压缩率接近真实论文正文）
+VOCABULARY = (
+    "the of and in to a with for was were cells is that by as on from this cell "
+    "expression cancer we gene data analysis using these dependency CRISPR screen "
+    "knockout line lines tumor patients treatment samples results shown figure "
+    "significantly increased decreased compared between response protein RNA sequencing "
+    "DepMap Achilles essential genes model mice inhibitor resistance growth viability "
+    "pathway signaling mutation mutations profiles correlation score scores dataset "
+    "across identified associated performed described previously method methods"
+).split()
+
+
+def sample_text(rng: random.Random, words: int) -> str:
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(12, 30))
+        sentence = " ".join(rng.choices(VOCABULARY, weights, k=length))
+        sentences.append(sentence.capitalize() + f" ({rng.randint(1, 99)}).")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def make_articles(count: int) -> List[Dict]:
+    """生成带全文分析结果的样本文章"""
+    rng = random.Random(42)
+    articles = []
+    for i in range(count):
+        mentions = [{
+            "section": rng.choice(["Methods", "Results", "Discussion"]),
+            "context": sample_text(rng, 30),
+            "paragraph": sample_text(rng, 150),
+            "position": rng.randint(0, 5000),
+            "keyword": "DepMap",
+        } for _ in range(8)]
+        articles.append({
+            "pmid": str(31000000 + i),
+            "pmc_id": f"PMC{8000000 + i}",
+            "title": sample_text(rng, 14),
+            "abstract": sample_text(rng, 250),
+            "journal": rng.choice(["Nature", "Cell", "Cancer Cell", "Nature Genetics"]),
+            "year": "2024",
+            "date": f"2024-{rng.randint(1, 12):02d}-01",
+            "authors": [f"Author {j}" for j in range(8)],
+            "keyword": "DepMap",
+            "relevance": {"score": rng.randint(0, 80), "mentions": ["abstract"]},
+            "has_fulltext": True,
+            "pmc_available": True,
+            "fulltext_processed": True,
+            "fulltext": {
+                "methods": sample_text(rng, 2500),
+                "results": sample_text(rng, 3500),
+                "discussion": sample_text(rng, 1800),
+                "keyword_mentions": mentions,
+                "total_mentions": len(mentions),
+                "figures": [{
+                    "id": f"fig{j}", "label": f"Figure {j}", "caption": sample_text(rng, 60),
+                    "mentions_keyword": j == 1,
+                } for j in range(1, 7)],
+                "keywords": ["DepMap"],
+            },
+        })
+    return articles
+
+
+def load_sample_project(db_path: str, project_id: str) -> List[Dict]:
+    db = ProjectDatabase(db_path)
+    data = db.load_project(project_id)
+    if data is None:
+        sys.exit(f"项目不存在: {project_id}")
+    return data["articles"]
+
+
+def table_sizes(db: ProjectDatabase) -> Dict[str, int]:
+    """各表（含索引）占用的字节数，SQLite 未编译 dbstat 时返回空"""
+    try:
+        with db.connection() as conn:
+            rows = conn.execute('''
+                SELECT m.tbl_name AS name, SUM(s.pgsize) AS size
+                FROM dbstat s JOIN sqlite_master m ON m.name = s.name
+                GROUP BY m.tbl_name
+            ''').fetchall()
+    except Exception:
+        return {}
+    return {row["name"]: row["size"] for row in rows}
+
+
+def timed(func, repeat: int) -> float:
+    """多次运行取最快一次（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(compression: str, articles: List[Dict], workdir: str, repeat: int) -> Dict:
+    path = os.path.join(workdir, f"{compression}.db")
+    db = ProjectDatabase(path, compression=compression)
+    project_id = db.create_project("compression bench", "DepMap", 3)
+    start = time.perf_counter()
+    db.save_articles(project_id, articles)
+    save_seconds = time.perf_counter() - start
+    with db.connection() as conn:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    pmids = [article["pmid"] for article in articles[:50]]
+    return {
+        "file_mb": os.path.getsize(path) / 1024 / 1024,
+        "tables": table_sizes(db),
+        "save": save_seconds,
+        "load_project": timed(lambda: db.load_project(project_id), repeat),
+        "list_summary": timed(lambda: db.list_articles(project_id, limit=500), repeat),
+        "get_article": timed(lambda: [db.get_article(project_id, pmid) for pmid in pmids], repeat) / len(pmids),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="大文本列压缩基准测试")
+    parser.add_argument("--from-db", help="读取样本项目的数据库")
+    parser.add_argument("--project", help="样本项目ID（与 --from-db 一起使用）")
+    parser.add_argument("--articles", type=int, default=200, help="生成的样本文章数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项读取测试的重复次数")
+    args = parser.parse_args()
+
+    # 屏蔽数据库日志输出
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        if args.from_db:
+            articles = load_sample_project(args.from_db, args.project)
+        else:
+            articles = make_articles(args.articles)
+
+        workdir = tempfile.mkdtemp(prefix="bench_compress_")
+        compressions = [c for c in TEXT_FORMATS if c != "zstd" or zstandard is not None]
+        results = {c: run(c, articles, workdir, args.repeat) for c in compressions}
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    baseline = results["none"]
+    print(f"样本: {len(articles)} 篇文章\n")
+    print(f"{'压缩方式':<10}{'文件(MB)':>10}{'节省':>8}{'保存(s)':>10}"
+          f"{'加载项目(ms)':>14}{'摘要列表(ms)':>14}{'单篇详情(ms)':>14}")
+    for compression, result in results.items():
+        saving = 1 - result["file_mb"] / baseline["file_mb"]
+        print(f"{compression:<10}{result['file_mb']:>10.2f}{saving:>8.0%}{result['save']:>10.2f}"
+              f"{result['load_project'] * 1000:>14.1f}{result['list_summary'] * 1000:>14.1f}"
+              f"{result['get_article'] * 1000:>14.2f}")
+
+    if baseline["tables"]:
+        print("\n各表占用（MB）:")
+        names = sorted(baseline["tables"], key=baseline["tables"].get, reverse=True)[:8]
+        print(f"{'表':<28}" + "".join(f"{c:>10}" for c in results))
+        for name in names:
+            print(f"{name:<28}" + "".join(
+                f"{result['tables'].get(name, 0) / 1024 / 1024:>10.2f}" for result in results.values()
+            ))
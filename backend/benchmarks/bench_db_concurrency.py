@@ -0,0 +1,280 @@
+"""
+项目数据库并发读写基准测试
+对比连接池 + WAL 的 ProjectDatabase 与原先“每次调用新建连接、默认日志模式”的实现
+
+用法（在 backend 目录下运行）：
+    python benchmarks/bench_db_concurrency.py [--writers 4] [--readers 8] [--seconds 10]
+
+写线程模拟多个浏览器标签页反复保存文章，读线程模拟加载项目、项目列表和统计信息。
+每种实现使用独立的临时数据库文件。
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ProjectDatabase
+
+
+class LegacyProjectDatabase:
+    """原实现：每个方法新建并关闭连接，默认 rollback 日志，默认 5 秒超时"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # 表结构与 ProjectDatabase 一致，但不开启 WAL
+        conn = sqlite3.connect(db_path)
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS projects (
+                project_id TEXT PRIMARY KEY, name TEXT NOT NULL, keyword TEXT NOT NULL,
+                years INTEGER NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+                total_articles INTEGER DEFAULT 0, processed_articles INTEGER DEFAULT 0,
+                fulltext_articles INTEGER DEFAULT 0, search_method TEXT, description TEXT
+            );
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, project_id TEXT NOT NULL,
+                pmid TEXT NOT NULL, pmc_id TEXT, title TEXT NOT NULL, abstract TEXT,
+                journal TEXT, year TEXT, date TEXT, authors TEXT, doi TEXT, keyword TEXT,
+                relevance_data TEXT, has_fulltext BOOLEAN DEFAULT 0,
+                pmc_available BOOLEAN DEFAULT 0, fulltext_processed BOOLEAN DEFAULT 0,
+                fulltext_data TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+                UNIQUE(project_id, pmid)
+            );
+            CREATE INDEX IF NOT EXISTS idx_project_id ON articles(project_id);
+            CREATE INDEX IF NOT EXISTS idx_updated_at ON projects(updated_at);
+        ''')
+        conn.close()
+
+    def create_project(self, name: str, keyword: str, years: int, description: str = "") -> str:
+        project_id = f"p{random.getrandbits(32):08x}"
+        now = datetime.now().isoformat()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            INSERT INTO projects (project_id, name, keyword, years, created_at, updated_at, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (project_id, name, keyword, years, now, now, description))
+        conn.commit()
+        conn.close()
+        return project_id
+
+    def save_articles(self, project_id: str, articles: List[Dict]) -> int:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        now = datetime.now().isoformat()
+        for article in articles:
+            cursor.execute('''
+                INSERT INTO articles
+                (project_id, pmid, pmc_id, title, abstract, journal, year, date,
+                 authors, doi, keyword, relevance_data, has_fulltext, pmc_available,
+                 fulltext_processed, fulltext_data, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(project_id, pmid) DO UPDATE SET
+                    pmc_id = excluded.pmc_id, title = excluded.title, abstract = excluded.abstract,
+                    journal = excluded.journal, year = excluded.year, date = excluded.date,
+                    authors = excluded.authors, doi = excluded.doi,
+                    relevance_data = excluded.relevance_data, has_fulltext = excluded.has_fulltext,
+                    pmc_available = excluded.pmc_available,
+                    fulltext_processed = excluded.fulltext_processed,
+                    fulltext_data = excluded.fulltext_data, updated_at = excluded.updated_at
+            ''', (
+                project_id, article['pmid'], article.get('pmc_id'), article['title'],
+                article.get('abstract'), article.get('journal'), article.get('year'),
+                article.get('date'), json.dumps(article.get('authors', [])), article.get('doi'),
+                article.get('keyword'), json.dumps(article.get('relevance', {})),
+                article.get('has_fulltext', False), article.get('pmc_available', False),
+                article.get('fulltext_processed', False),
+                json.dumps(article['fulltext']) if article.get('fulltext') else None, now, now
+            ))
+        cursor.execute('''
+            UPDATE projects SET
+                total_articles = (SELECT COUNT(*) FROM articles WHERE project_id = ?),
+                processed_articles = (SELECT COUNT(*) FROM articles WHERE project_id = ? AND fulltext_processed = 1),
+                fulltext_articles = (SELECT COUNT(*) FROM articles WHERE project_id = ? AND has_fulltext = 1),
+                updated_at = ?
+            WHERE project_id = ?
+        ''', (project_id, project_id, project_id, now, project_id))
+        conn.commit()
+        conn.close()
+        return len(articles)
+
+    def load_project(self, project_id: str) -> Optional[Dict]:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        project = conn.execute('SELECT * FROM projects WHERE project_id = ?', (project_id,)).fetchone()
+        if not project:
+            conn.close()
+            return None
+        rows = conn.execute('''
+            SELECT * FROM articles WHERE project_id = ? ORDER BY updated_at DESC
+        ''', (project_id,)).fetchall()
+        articles = []
+        for row in rows:
+            article = dict(row)
+            article['authors'] = json.loads(article['authors']) if article['authors'] else []
+            article['relevance'] = json.loads(article['relevance_data']) if article['relevance_data'] else {}
+            if article['fulltext_data']:
+                article['fulltext'] = json.loads(article['fulltext_data'])
+            articles.append(article)
+        conn.close()
+        return {'project': dict(project), 'articles': articles}
+
+    def list_projects(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute('''
+            SELECT * FROM projects ORDER BY updated_at DESC LIMIT ? OFFSET ?
+        ''', (limit, offset)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def get_project_stats(self, project_id: str) -> Optional[Dict]:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute('SELECT * FROM projects WHERE project_id = ?', (project_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+
+def make_articles(count: int, fulltext_kb: int) -> List[Dict]:
+    """生成测试文章（一半带全文分析结果）"""
+    filler = "x" * 1024
+    articles = []
+    for i in range(count):
+        article = {
+            "pmid": str(30000000 + i),
+            "pmc_id": f"PMC{9000000 + i}",
+            "title": f"Benchmark article {i}",
+            "abstract": filler[:800],
+            "journal": "Nature",
+            "year": "2024",
+            "authors": ["A B", "C D"],
+            "keyword": "DepMap",
+            "relevance": {"score": i % 50, "mentions": ["abstract"], "contexts": []},
+            "pmc_available": True,
+            "fulltext_processed": i % 2 == 0,
+            "has_fulltext": i % 2 == 0,
+        }
+        if article["has_fulltext"]:
+            article["fulltext"] = {"methods": filler * fulltext_kb, "total_mentions": 3,
+                                   "keyword_mentions": [], "figures": []}
+        articles.append(article)
+    return articles
+
+
+def run(db, label: str, writers: int, readers: int, seconds: float,
+        articles_per_project: int, batch_size: int, fulltext_kb: int) -> Dict:
+    articles = make_articles(articles_per_project, fulltext_kb)
+    project_ids = []
+    for i in range(writers):
+        project_id = db.create_project(f"bench {i}", "DepMap", 3)
+        db.save_articles(project_id, articles)
+        project_ids.append(project_id)
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    stop = threading.Event()
+    lock = threading.Lock()
+
+    def record(kind: str, func):
+        start = time.perf_counter()
+        try:
+            func()
+        except sqlite3.OperationalError as e:
+            with lock:
+                errors[f"{kind}: {e}"] += 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[kind].append(elapsed)
+
+    def writer(project_id: str):
+        rng = random.Random(project_id)
+        while not stop.is_set():
+            start = rng.randrange(0, max(1, len(articles) - batch_size))
+            batch = articles[start:start + batch_size]
+            record("save_articles", lambda: db.save_articles(project_id, batch))
+
+    def reader(seed: int):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            choice = rng.random()
+            project_id = rng.choice(project_ids)
+            if choice < 0.2:
+                record("load_project", lambda: db.load_project(project_id))
+            elif choice < 0.6:
+                record("list_projects", lambda: db.list_projects())
+            else:
+                record("get_project_stats", lambda: db.get_project_stats(project_id))
+
+    threads = [threading.Thread(target=writer, args=(pid,)) for pid in project_ids]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+
+    # 屏蔽保存时的日志输出
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    print(f"\n== {label} ==")
+    print(f"{'操作':<20}{'次数':>8}{'次/秒':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'max(ms)':>10}")
+    summary = {}
+    for kind in ("save_articles", "load_project", "list_projects", "get_project_stats"):
+        values = sorted(latencies.get(kind, []))
+        if not values:
+            continue
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{kind:<20}{len(values):>8}{len(values) / seconds:>10.1f}"
+              f"{statistics.median(values) * 1000:>10.2f}{p95 * 1000:>10.2f}{values[-1] * 1000:>10.2f}")
+        summary[kind] = len(values) / seconds
+    if errors:
+        print("错误:")
+        for message, count in errors.items():
+            print(f"  {count} × {message}")
+    else:
+        print("错误: 无")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="项目数据库并发读写基准测试")
+    parser.add_argument("--writers", type=int, default=4, help="写线程数（每个写一个项目）")
+    parser.add_argument("--readers", type=int, default=8, help="读线程数")
+    parser.add_argument("--seconds", type=float, default=10, help="每种实现的运行时间")
+    parser.add_argument("--articles", type=int, default=200, help="每个项目的文章数")
+    parser.add_argument("--batch", type=int, default=20, help="每次保存的文章数")
+    parser.add_argument("--fulltext-kb", type=int, default=20, help="每篇全文分析结果大小（KB）")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_db_")
+    params = (args.writers, args.readers, args.seconds, args.articles, args.batch, args.fulltext_kb)
+
+    legacy = run(LegacyProjectDatabase(os.path.join(workdir, "legacy.db")),
+                 "原实现（每次新建连接，rollback 日志）", *params)
+
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    pooled_db = ProjectDatabase(os.path.join(workdir, "pooled.db"))
+    sys.stdout = stdout
+    pooled = run(pooled_db, "连接池 + WAL", *params)
+
+    print("\n== 吞吐量对比（连接池 / 原实现） ==")
+    for kind, rate in pooled.items():
+        if legacy.get(kind):
+            print(f"{kind:<20}{rate / legacy[kind]:>8.2f}x")
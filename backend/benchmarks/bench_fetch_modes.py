@@ -0,0 +1,153 @@
+"""
+全文获取方式基准测试
+对比线程池（threads）与事件循环（async，需要 httpx）两种获取方式处理整个项目的耗时
+
+用法（在 backend 目录下运行）：
+    python benchmarks/bench_fetch_modes.py [--articles 500] [--batch-size 20] [--latency 0.2 1.5]
+
+上游由本地模拟的 E-utilities 服务代替：每个请求随机延迟 --latency 指定的秒数后返回生成的全文XML，
+不受 NCBI 限速影响，只比较并发方式本身。--batch-size 1 模拟逐篇请求。
+每种方式使用独立的临时全文缓存。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_fetcher
+from fulltext_cache import FulltextCache
+from fulltext_processor import FulltextProcessor
+from pmc_fetcher import PMCFetcher
+
+PMID_BASE = 30000000
+PMC_BASE = 7000000
+
+
+def article_xml(pmc_numeric: str) -> str:
+    """生成一篇带方法/结果章节和图注的样本全文"""
+    paragraph = " ".join(["Cell lines were profiled using DepMap CRISPR screens."] * 20)
+    return (
+        f'<article><front><article-meta><article-id pub-id-type="pmc">{pmc_numeric}</article-id>'
+        f'</article-meta></front><body>'
+        f'<sec sec-type="methods"><title>Methods</title><p>{paragraph}</p></sec>'
+        f'<sec sec-type="results"><title>Results</title><p>{paragraph}</p>'
+        f'<fig id="f1"><label>Figure 1</label><caption><p>DepMap dependency scores.</p></caption></fig></sec>'
+        f'</body></article>'
+    )
+
+
+class MockEutilsHandler(BaseHTTPRequestHandler):
+    """模拟 elink / efetch：延迟后返回结果，并记录每个请求的延迟"""
+
+    protocol_version = "HTTP/1.1"
+    latency = (0.2, 1.5)
+    delays: List[float] = []
+
+    def do_GET(self):
+        self._respond(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._respond(parse_qs(self.rfile.read(length).decode()))
+
+    def _respond(self, params: Dict[str, List[str]]):
+        delay = random.uniform(*self.latency)
+        self.delays.append(delay)
+        time.sleep(delay)
+
+        if urlparse(self.path).path.endswith("elink.fcgi"):
+            link_sets = "".join(
+                f"<LinkSet><IdList><Id>{pmid}</Id></IdList><LinkSetDb><Link>"
+                f"<Id>{PMC_BASE + int(pmid) - PMID_BASE}</Id></Link></LinkSetDb></LinkSet>"
+                for pmid in params.get("id", [])
+            )
+            body = f"<eLinkResult>{link_sets}</eLinkResult>"
+        else:
+            ids = ",".join(params.get("id", [])).split(",")
+            body = "<pmc-articleset>" + "".join(article_xml(i) for i in ids if i) + "</pmc-articleset>"
+
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_articles(count: int, with_pmc_id: bool) -> List[Dict]:
+    return [{
+        "pmid": str(PMID_BASE + i),
+        "pmc_id": f"PMC{PMC_BASE + i}" if with_pmc_id else None,
+        "title": f"Article {i}",
+        "relevance": {"score": 0, "mentions": [], "contexts": []},
+    } for i in range(count)]
+
+
+def run(mode: str, base_url: str, articles: List[Dict]) -> Dict:
+    fetcher = PMCFetcher(cache=FulltextCache(tempfile.mkdtemp(prefix=f"bench_fetch_{mode}_")))
+    fetcher.BASE_URL = base_url
+    processor = FulltextProcessor(fetch_mode=mode, fetcher=fetcher)
+
+    MockEutilsHandler.delays = []
+    start = time.perf_counter()
+    outcomes = processor.process(articles, "DepMap")
+    elapsed = time.perf_counter() - start
+
+    delays = sorted(MockEutilsHandler.delays)
+    return {
+        "seconds": elapsed,
+        "requests": len(delays),
+        "success": sum(1 for outcome in outcomes.values() if outcome["status"] == "success"),
+        "slowest": delays[-1] if delays else 0.0,
+        "sum": sum(delays),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="全文获取方式基准测试")
+    parser.add_argument("--articles", type=int, default=500, help="项目文章数")
+    parser.add_argument("--batch-size", type=int, default=PMCFetcher.EFETCH_BATCH_SIZE,
+                        help="每次 efetch 合并的文章数（1 表示逐篇请求）")
+    parser.add_argument("--latency", type=float, nargs=2, default=[0.2, 1.5],
+                        metavar=("MIN", "MAX"), help="模拟上游每个请求的延迟范围（秒）")
+    parser.add_argument("--resolve", action="store_true", help="文章不带PMC ID，先批量 elink 解析")
+    args = parser.parse_args()
+
+    PMCFetcher.EFETCH_BATCH_SIZE = max(1, args.batch_size)
+    MockEutilsHandler.latency = tuple(args.latency)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockEutilsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/entrez/eutils/"
+
+    modes = ["threads"] + (["async"] if async_fetcher.AVAILABLE else [])
+    results = {}
+    for mode in modes:
+        # 屏蔽逐篇处理日志
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            results[mode] = run(mode, base_url, make_articles(args.articles, not args.resolve))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+    server.shutdown()
+
+    print(f"样本: {args.articles} 篇文章，每批 {PMCFetcher.EFETCH_BATCH_SIZE} 篇，"
+          f"上游延迟 {args.latency[0]}-{args.latency[1]}s\n")
+    print(f"{'方式':<10}{'耗时(s)':>10}{'请求数':>8}{'成功':>8}{'最慢请求(s)':>14}{'请求延迟合计(s)':>18}")
+    for mode, result in results.items():
+        print(f"{mode:<10}{result['seconds']:>10.2f}{result['requests']:>8}{result['success']:>8}"
+              f"{result['slowest']:>14.2f}{result['sum']:>18.2f}")
+    if not async_fetcher.AVAILABLE:
+        print("\n未安装 httpx，跳过 async 方式")
@@ -0,0 +1,93 @@
+"""
+全文解析进程池基准测试
+对比不同解析进程数下解析全文XML并查找关键词的吞吐量（篇/秒），并检查结果与当前进程解析一致
+
+用法（在 backend 目录下运行）：
+    python benchmarks/bench_parse_pool.py [--articles 200] [--sections 300] [--workers 0 2 4 8]
+
+样本为生成的大型论文XML（数百个嵌套章节、大量图表），接近 Nature 系列长文的解析开销。
+进程数 0 表示在当前进程中解析。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xml_parser
+from keyword_matcher import KeywordMatcher
+from parse_pool import ParsePool
+
+WORDS = (
+    "cells were profiled using genome wide CRISPR screens and dependency scores "
+    "from the DepMap portal were compared across lineages with expression data "
+    "tumor samples showed increased sensitivity to knockout of essential genes"
+).split()
+
+
+def paragraph(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + ". Data were obtained from the Cancer Dependency Map (DepMap)."
+
+
+def article_xml(rng: random.Random, index: int, sections: int) -> bytes:
+    """生成一篇带 sections 个嵌套章节的论文"""
+    parts = [f'<article><front><article-meta><article-id pub-id-type="pmc">{index}</article-id>'
+             f'</article-meta></front><body>']
+    kinds = ["methods", "results", "discussion"]
+    for i in range(sections):
+        kind = kinds[i % 3]
+        parts.append(f'<sec sec-type="{kind}"><title>{kind.title()} {i}</title>'
+                     f'<p>{paragraph(rng, 80)}</p>'
+                     f'<sec><title>Subsection {i}</title><p>{paragraph(rng, 60)}'
+                     f'<italic>{paragraph(rng, 10)}</italic></p></sec></sec>')
+        if i % 10 == 0:
+            parts.append(f'<fig id="f{i}"><label>Figure {i // 10 + 1}</label>'
+                         f'<caption><p>{paragraph(rng, 40)}</p></caption></fig>')
+    parts.append("</body></article>")
+    return "".join(parts).encode()
+
+
+def run(workers: int, items: List[Tuple[str, bytes]], matcher: KeywordMatcher, repeat: int):
+    pool = ParsePool(workers=workers)
+    best, results = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        documents = pool.build_documents(items)
+        infos = pool.analyze_documents(documents, matcher)
+        best = min(best, time.perf_counter() - start)
+        results = infos
+    pool.shutdown()
+    return best, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="全文解析进程池基准测试")
+    parser.add_argument("--articles", type=int, default=200, help="样本文章数")
+    parser.add_argument("--sections", type=int, default=300, help="每篇文章的章节数")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="要测试的进程数（默认 0、2、4 … 到CPU核数）")
+    parser.add_argument("--repeat", type=int, default=3, help="每种配置重复次数（取最快一次）")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({0, cpus} | {n for n in (2, 4, 8, 16) if n < cpus})
+
+    rng = random.Random(42)
+    items = [(f"PMC{i}", article_xml(rng, i, args.sections)) for i in range(args.articles)]
+    total_mb = sum(len(data) for _, data in items) / 1024 / 1024
+    matcher = KeywordMatcher(["DepMap", "Cancer Dependency Map"])
+
+    print(f"样本: {len(items)} 篇文章，每篇 {args.sections} 个章节，共 {total_mb:.1f} MB，"
+          f"XML后端 {xml_parser.BACKEND}，CPU {cpus} 核\n")
+    print(f"{'进程数':<8}{'耗时(s)':>10}{'篇/秒':>10}{'加速比':>8}{'结果一致':>10}")
+    baseline_seconds, baseline = None, None
+    for workers in worker_counts:
+        seconds, results = run(workers, items, matcher, args.repeat)
+        if baseline is None:
+            baseline_seconds, baseline = seconds, results
+        print(f"{workers:<8}{seconds:>10.2f}{len(items) / seconds:>10.1f}"
+              f"{baseline_seconds / seconds:>8.2f}{'是' if results == baseline else '否':>10}")
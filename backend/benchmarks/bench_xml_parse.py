@@ -0,0 +1,202 @@
+"""
+XML 解析基准测试
+对比 lxml 与标准库 ElementTree 在已保存的 PMC 全文XML上的解析耗时和峰值内存
+
+用法（在 backend 目录下运行）：
+    # 从本地全文缓存导出样本（需先正常使用过一段时间）
+    python benchmarks/bench_xml_parse.py --export-cache 50
+
+    # 或下载指定文章作为样本
+    python benchmarks/bench_xml_parse.py --fetch PMC7000001 PMC7000002
+
+    # 运行基准测试（默认读取 benchmarks/fixtures/ 下的 *.xml / *.xml.gz）
+    python benchmarks/bench_xml_parse.py [样本目录] [--repeat 3]
+
+每个后端、每种模式都在独立子进程中运行，峰值内存互不影响。
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, BACKEND_DIR)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def load_fixtures(fixture_dir: str):
+    """读取样本目录下的全部XML（字节）"""
+    paths = sorted(glob.glob(os.path.join(fixture_dir, "*.xml")) +
+                   glob.glob(os.path.join(fixture_dir, "*.xml.gz")))
+    fixtures = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            fixtures.append((os.path.basename(path), f.read()))
+    return fixtures
+
+
+def export_from_cache(fixture_dir: str, limit: int):
+    """把本地全文缓存中的文章导出为样本"""
+    from fulltext_cache import get_default_cache
+
+    cache = get_default_cache()
+    rows = cache._conn.execute(
+        'SELECT pmc_id FROM entries ORDER BY last_access DESC LIMIT ?', (limit,)
+    ).fetchall()
+    os.makedirs(fixture_dir, exist_ok=True)
+    exported = 0
+    for (pmc_id,) in rows:
+        entry = cache.get(pmc_id)
+        if entry is None:
+            continue
+        with gzip.open(os.path.join(fixture_dir, f"{pmc_id}.xml.gz"), "wb") as f:
+            f.write(entry.data)
+        exported += 1
+    print(f"✅ 从缓存导出 {exported} 篇到 {fixture_dir}")
+
+
+def fetch_fixtures(fixture_dir: str, pmc_ids):
+    """从 NCBI 下载指定文章作为样本"""
+    from pmc_fetcher import PMCFetcher
+
+    fetcher = PMCFetcher()
+    os.makedirs(fixture_dir, exist_ok=True)
+    for pmc_id in pmc_ids:
+        data = fetcher.fetch_fulltext_xml(pmc_id)
+        if data is None:
+            print(f"⚠️ {pmc_id}: 下载失败")
+            continue
+        with gzip.open(os.path.join(fixture_dir, f"{pmc_id}.xml.gz"), "wb") as f:
+            f.write(data)
+        print(f"✅ {pmc_id}: {len(data) / 1024:.0f} KB")
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(mode: str, fixture_dir: str, repeat: int):
+    """
+    子进程入口：按 FIGURESCOUT_XML_BACKEND 选定的后端运行一种模式，输出JSON结果
+
+    Args:
+        mode: "document"（逐篇 fromstring + build_document）或
+              "stream"（把所有样本拼成一个 <pmc-articleset>，用 iter_children 流式拆分）
+        fixture_dir: 样本目录
+        repeat: 重复次数，取最快的一次
+    """
+    import xml_parser
+    from fulltext_cache import FulltextCache
+    from pmc_fetcher import PMCFetcher
+
+    fixtures = load_fixtures(fixture_dir)
+    fetcher = PMCFetcher(cache=FulltextCache(cache_dir=tempfile.mkdtemp(prefix="bench_cache_")))
+    total_bytes = sum(len(data) for _, data in fixtures)
+
+    stream_path = None
+    if mode == "stream":
+        # 拼接后写入临时文件，流式读取时输入本身也不驻留内存
+        fd, stream_path = tempfile.mkstemp(suffix=".xml")
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"<pmc-articleset>")
+            for _, data in fixtures:
+                if data.startswith(b"<?xml"):
+                    data = data[data.index(b"?>") + 2:]
+                f.write(data)
+            f.write(b"</pmc-articleset>")
+        fixtures = None
+
+    baseline_mb = _peak_rss_mb()
+    timings = []
+    articles = 0
+    for _ in range(repeat):
+        articles = 0
+        start = time.perf_counter()
+        if mode == "document":
+            for _, data in fixtures:
+                fetcher.build_document(xml_parser.fromstring(data))
+                articles += 1
+        else:
+            with open(stream_path, "rb") as f:
+                for elem in xml_parser.iter_children(f, "article"):
+                    fetcher.build_document(elem)
+                    articles += 1
+        timings.append(time.perf_counter() - start)
+
+    if stream_path:
+        os.remove(stream_path)
+
+    print(json.dumps({
+        "backend": xml_parser.BACKEND,
+        "mode": mode,
+        "articles": articles,
+        "input_mb": round(total_bytes / 1024 / 1024, 2),
+        "best_seconds": round(min(timings), 4),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "peak_growth_mb": round(_peak_rss_mb() - baseline_mb, 1)
+    }))
+
+
+def run_benchmark(fixture_dir: str, repeat: int):
+    import xml_parser
+
+    fixtures = load_fixtures(fixture_dir)
+    if not fixtures:
+        print(f"❌ {fixture_dir} 下没有样本，请先使用 --export-cache 或 --fetch 准备样本")
+        sys.exit(1)
+    print(f"📂 样本: {len(fixtures)} 篇, "
+          f"{sum(len(data) for _, data in fixtures) / 1024 / 1024:.1f} MB\n")
+
+    backends = ["stdlib"]
+    if xml_parser._lxml_etree is not None:
+        backends.insert(0, "lxml")
+    else:
+        print("⚠️ 未安装 lxml，只测试标准库后端\n")
+
+    print(f"{'后端':<8}{'模式':<10}{'文章数':>8}{'耗时(s)':>10}{'篇/秒':>10}{'峰值增长(MB)':>14}")
+    for backend in backends:
+        for mode in ("document", "stream"):
+            env = dict(os.environ, FIGURESCOUT_XML_BACKEND=backend)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), fixture_dir,
+                 "--worker", mode, "--repeat", str(repeat)],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            rate = result["articles"] / result["best_seconds"] if result["best_seconds"] else 0
+            print(f"{result['backend']:<8}{mode:<10}{result['articles']:>8}"
+                  f"{result['best_seconds']:>10.3f}{rate:>10.1f}{result['peak_growth_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XML 解析基准测试")
+    parser.add_argument("fixture_dir", nargs="?", default=DEFAULT_FIXTURES, help="样本目录")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快的一次")
+    parser.add_argument("--export-cache", type=int, metavar="N", help="从全文缓存导出最近访问的 N 篇作为样本")
+    parser.add_argument("--fetch", nargs="+", metavar="PMC_ID", help="下载指定文章作为样本")
+    parser.add_argument("--worker", choices=["document", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.fixture_dir, args.repeat)
+    elif args.export_cache:
+        export_from_cache(args.fixture_dir, args.export_cache)
+    elif args.fetch:
+        fetch_fixtures(args.fixture_dir, args.fetch)
+    else:
+        run_benchmark(args.fixture_dir, args.repeat)
@@ -3,23 +3,260 @@
 使用 SQLite 存储检索项目和结果
 """
 import sqlite3
+import hashlib
 import json
+import queue
+import threading
 import uuid
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 import os
 
+import processing_state
+from keyword_matcher import keyword_signature
+
+try:
+    import zstandard  # 可选依赖：已安装时默认使用 zstd 压缩大文本列
+except ImportError:
+    zstandard = None
+
+# 连接池配置（可通过环境变量覆盖）
+DB_POOL_SIZE = int(os.environ.get("FIGURESCOUT_DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("FIGURESCOUT_DB_BUSY_TIMEOUT_MS", "10000"))
+DB_CACHE_SIZE_KB = int(os.environ.get("FIGURESCOUT_DB_CACHE_KB", "16384"))
+
+# 大文本列（正文章节、提及段落、fulltext_data）的压缩方式：zstd / zlib / none
+DB_COMPRESSION = os.environ.get("FIGURESCOUT_DB_COMPRESSION", "zstd" if zstandard else "zlib").lower()
+DB_COMPRESS_MIN_BYTES = int(os.environ.get("FIGURESCOUT_DB_COMPRESS_MIN_BYTES", "256"))
+
+# 压缩后的值以 BLOB 存储，第一个字节为格式版本；未压缩的值仍为 TEXT（版本 0）
+TEXT_PLAIN = 0
+TEXT_ZLIB = 1
+TEXT_ZSTD = 2
+TEXT_FORMATS = {'none': TEXT_PLAIN, 'zlib': TEXT_ZLIB, 'zstd': TEXT_ZSTD}
+
+# articles.fulltext_format：全文分析结果的存储方式
+FULLTEXT_JSON = 0        # 整个 fulltext 以 JSON 存在 fulltext_data（旧格式）
+FULLTEXT_NORMALIZED = 1  # 章节/图表存在文档表、提及存在文章表中，fulltext_data 只保存其余字段
+
+# 拆分到独立表中的 fulltext 字段
+FULLTEXT_SECTIONS = ('methods', 'results', 'discussion')
+NORMALIZED_FULLTEXT_KEYS = set(FULLTEXT_SECTIONS) | {'keyword_mentions', 'figures', 'total_mentions'}
+MENTION_KEYS = ('section', 'context', 'paragraph', 'position', 'keyword', 'section_path')
+FIGURE_KEYS = ('id', 'label', 'caption', 'mentions_keyword')
+
+# SQLite 单条语句的参数数量有限，IN (...) 查询分批执行
+SQL_BATCH_SIZE = 500
+
+# 全文检索索引（FTS5）的列及 BM25 权重：标题和摘要命中比正文更重要
+SEARCH_COLUMNS = ('title', 'abstract', 'methods', 'results', 'discussion', 'captions')
+SEARCH_WEIGHTS = (5.0, 3.0, 1.0, 1.0, 1.0, 2.0)
+
+
+def section_kind(mention: Dict) -> Optional[str]:
+    """
+    提及所在章节的类型（methods / results / discussion），规则与 PMCFetcher._classify_section 一致
+    
+    从内层章节向外查找，子章节（如 "Cell culture"）归入所在的外层章节。
+    """
+    labels = [mention.get('section') or ''] + list(reversed(mention.get('section_path') or []))
+    for label in labels:
+        label = label.lower()
+        if "method" in label:
+            return "methods"
+        if "result" in label:
+            return "results"
+        if "discuss" in label or "conclusion" in label:
+            return "discussion"
+    return None
+
+
+def pack_text(text: Optional[str], compression: str = DB_COMPRESSION):
+    """
+    按压缩方式编码大文本列的值（短文本保持原样）
+    
+    Returns:
+        原文（TEXT）或 格式版本字节 + 压缩数据（BLOB）
+    """
+    if text is None or compression == 'none' or len(text) < DB_COMPRESS_MIN_BYTES:
+        return text
+    data = text.encode('utf-8')
+    if compression == 'zstd':
+        return bytes([TEXT_ZSTD]) + zstandard.ZstdCompressor(level=3).compress(data)
+    return bytes([TEXT_ZLIB]) + zlib.compress(data, 6)
+
+
+def unpack_text(value) -> Optional[str]:
+    """pack_text 的逆操作，TEXT 值原样返回"""
+    if not isinstance(value, bytes):
+        return value
+    version, payload = value[0], value[1:]
+    if version == TEXT_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if version == TEXT_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("数据库中有 zstd 压缩的内容，需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    raise ValueError(f"未知的文本压缩格式: {version}")
+
+
+def text_format(value) -> int:
+    """大文本列的值的存储格式版本"""
+    return value[0] if isinstance(value, bytes) else TEXT_PLAIN
+
+
+def fulltext_match_key(fulltext: Optional[Dict]) -> Optional[str]:
+    """全文分析所用关键词集合的标识（与 KeywordMatcher.signature 一致），旧结果中没有记录时为 None"""
+    keywords = (fulltext or {}).get('keywords')
+    return keyword_signature(keywords) if keywords else None
+
+
+class ConnectionPool:
+    """
+    SQLite 连接池
+    
+    连接在请求之间复用（Flask 开发服务器每个请求一个新线程，线程本地连接无法复用），
+    同一时刻一个连接只被一个线程使用。每个连接保留自己的预编译语句缓存。
+    """
+    
+    def __init__(self, db_path: str, size: int = DB_POOL_SIZE,
+                 busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _create(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,  # 由连接池保证同一时刻只有一个线程使用
+            cached_statements=256,
+            isolation_level="IMMEDIATE"  # 写事务一开始就拿写锁，避免读锁升级时的死锁
+        )
+        conn.row_factory = sqlite3.Row
+        # WAL：写入时不阻塞读取；NORMAL 在 WAL 下仍保证一致性
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA busy_timeout = {self.busy_timeout_ms}')
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        return conn
+    
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._create()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        
+        # 连接已全部借出，等待归还
+        return self._idle.get(timeout=self.busy_timeout_ms / 1000)
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """借出一个连接，用完自动归还（未提交的事务会被回滚）"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+    
+    def close_all(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
 class ProjectDatabase:
     """项目数据库管理类"""
     
-    def __init__(self, db_path: str = "figurescout_projects.db"):
-        """初始化数据库连接"""
+    def __init__(self, db_path: str = "figurescout_projects.db", pool_size: int = DB_POOL_SIZE,
+                 compression: str = DB_COMPRESSION):
+        """
+        初始化数据库连接池
+        
+        Args:
+            compression: 新写入的大文本列的压缩方式（zstd / zlib / none），读取时按每个值的格式版本解压
+        """
+        if compression not in TEXT_FORMATS:
+            raise ValueError(f"无效的压缩方式: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            print("⚠️ 未安装 zstandard，改用 zlib 压缩")
+            compression = 'zlib'
+        self.compression = compression
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, pool_size)
         self.init_database()
     
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """借出一个连接（只读查询使用）"""
+        with self.pool.connection() as conn:
+            yield conn
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """借出一个连接并开启事务，正常退出时提交，出错时回滚"""
+        with self.pool.connection() as conn:
+            with conn:
+                yield conn
+    
     def init_database(self):
         """初始化数据库表结构"""
-        conn = sqlite3.connect(self.db_path)
+        with self.connection() as conn:
+            legacy = 'title' in self._table_columns(conn, 'articles')
+        if legacy:
+            # 旧数据库的文章表按 (项目, PMID) 保存完整文章，迁移为全局文档 + 项目成员
+            self._migrate_to_documents()
+        
+        with self.transaction() as conn:
+            index_missing = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'"
+            ).fetchone() is None
+            self._create_tables(conn)
+            self._add_state_columns(conn)
+            self._create_indexes(conn)
+            has_documents = conn.execute('SELECT 1 FROM documents LIMIT 1').fetchone() is not None
+        
+        # 旧数据库首次打开时为已有文章建立全文检索索引
+        if index_missing and has_documents:
+            print("🔄 为已有文章建立全文检索索引...")
+            self.rebuild_search_index()
+        
+        print(f"✅ 数据库初始化完成: {self.db_path}")
+    
+    @staticmethod
+    def _table_columns(conn: sqlite3.Connection, table: str) -> set:
+        return {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+    
+    def _create_tables(self, conn: sqlite3.Connection):
         cursor = conn.cursor()
         
         # 项目表
@@ -35,16 +272,24 @@ class ProjectDatabase:
                 processed_articles INTEGER DEFAULT 0,
                 fulltext_articles INTEGER DEFAULT 0,
                 search_method TEXT,
-                description TEXT
+                description TEXT,
+                version INTEGER DEFAULT 0,
+                last_synced_at TEXT
             )
         ''')
+        project_columns = self._table_columns(conn, 'projects')
+        if 'version' not in project_columns:
+            # 内容版本号，项目或其引用的文档每次变化时递增（条件请求的 ETag）
+            cursor.execute('ALTER TABLE projects ADD COLUMN version INTEGER DEFAULT 0')
+        if 'last_synced_at' not in project_columns:
+            # 增量更新的同步水位（YYYY-MM-DD）：此前发表或收录的文章已检索过
+            cursor.execute('ALTER TABLE projects ADD COLUMN last_synced_at TEXT')
         
-        # 文章表
+        # 全局文档表：每个 PMID 一行，所有项目共享文章元数据和全文内容
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS articles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id TEXT NOT NULL,
-                pmid TEXT NOT NULL,
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pmid TEXT NOT NULL UNIQUE,
                 pmc_id TEXT,
                 title TEXT NOT NULL,
                 abstract TEXT,
@@ -53,30 +298,315 @@ class ProjectDatabase:
                 date TEXT,
                 authors TEXT,
                 doi TEXT,
+                fulltext_hash TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        # 全文章节和图表与关键词无关，按文档保存一份
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS document_sections (
+                doc_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                content TEXT,
+                PRIMARY KEY (doc_id, name),
+                FOREIGN KEY (doc_id) REFERENCES documents (doc_id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS document_figures (
+                doc_id INTEGER NOT NULL,
+                ordinal INTEGER NOT NULL,
+                figure_id TEXT,
+                label TEXT,
+                caption TEXT,
+                extra TEXT,
+                PRIMARY KEY (doc_id, ordinal),
+                FOREIGN KEY (doc_id) REFERENCES documents (doc_id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # 文章表（项目成员）：只保存与项目关键词有关的结果，文章内容见 documents
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id TEXT NOT NULL,
+                pmid TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
                 keyword TEXT,
                 relevance_data TEXT,
                 has_fulltext BOOLEAN DEFAULT 0,
                 pmc_available BOOLEAN DEFAULT 0,
                 fulltext_processed BOOLEAN DEFAULT 0,
                 fulltext_data TEXT,
+                fulltext_format INTEGER DEFAULT 0,
+                relevance_score INTEGER DEFAULT 0,
+                total_mentions INTEGER DEFAULT 0,
+                content_hash TEXT,
+                match_key TEXT,
+                sort_date TEXT,
+                sort_journal TEXT,
+                state TEXT NOT NULL DEFAULT 'pending',
+                resume_stage TEXT,
+                failure_reason TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_retry_at TEXT,
                 created_at TEXT NOT NULL,
                 updated_at TEXT NOT NULL,
                 FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE,
+                FOREIGN KEY (doc_id) REFERENCES documents (doc_id),
                 UNIQUE(project_id, pmid)
             )
         ''')
         
+        # 关键词提及和图注是否提到关键词（fulltext_format = 1 的文章）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS article_mentions (
+                article_id INTEGER NOT NULL,
+                ordinal INTEGER NOT NULL,
+                section TEXT,
+                section_kind TEXT,
+                section_path TEXT,
+                keyword TEXT,
+                context TEXT,
+                paragraph TEXT,
+                position INTEGER,
+                extra TEXT,
+                PRIMARY KEY (article_id, ordinal),
+                FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS article_figure_hits (
+                article_id INTEGER NOT NULL,
+                ordinal INTEGER NOT NULL,
+                PRIMARY KEY (article_id, ordinal),
+                FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE
+            )
+        ''')
+    
+    def _create_indexes(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
+        
         # 创建索引
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_project_id ON articles(project_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_pmid ON articles(pmid)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_doc ON articles(doc_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_pmc ON documents(pmc_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_updated_at ON projects(updated_at)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_mentions_kind
+            ON article_mentions(article_id, section_kind)
+        ''')
         
-        conn.commit()
-        conn.close()
+        # 文章列表排序用的索引（项目内按相关性/日期/期刊/更新时间）
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_relevance ON articles(project_id, relevance_score)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_date ON articles(project_id, sort_date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_journal ON articles(project_id, sort_journal)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_updated ON articles(project_id, updated_at)')
         
-        print(f"✅ 数据库初始化完成: {self.db_path}")
+        # 按处理状态查询待处理/待重试的文章
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_state ON articles(project_id, state, next_retry_at)')
+        
+        # 全文检索索引（rowid = documents.doc_id），内容由 _index_documents 维护
+        search_columns = ', '.join(SEARCH_COLUMNS)
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                {search_columns},
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents
+            BEGIN
+                DELETE FROM documents_fts WHERE rowid = old.doc_id;
+            END
+        ''')
+        # 最后一个引用文档的项目文章被删除（包括删除项目时级联删除）时删除文档
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS articles_release_document AFTER DELETE ON articles
+            WHEN NOT EXISTS (SELECT 1 FROM articles WHERE doc_id = old.doc_id)
+            BEGIN
+                DELETE FROM documents WHERE doc_id = old.doc_id;
+            END
+        ''')
+    
+    def _add_legacy_columns(self, conn: sqlite3.Connection):
+        """旧文章表补充后来新增的列（迁移前调用）"""
+        columns = self._table_columns(conn, 'articles')
+        if 'content_hash' not in columns:
+            conn.execute('ALTER TABLE articles ADD COLUMN content_hash TEXT')
+        if 'relevance_score' not in columns:
+            conn.execute('ALTER TABLE articles ADD COLUMN relevance_score INTEGER DEFAULT 0')
+            conn.execute('ALTER TABLE articles ADD COLUMN total_mentions INTEGER DEFAULT 0')
+            # 从已有的JSON字段回填排序列
+            conn.execute('''
+                UPDATE articles SET
+                    relevance_score = COALESCE(json_extract(relevance_data, '$.score'), 0),
+                    total_mentions = COALESCE(json_extract(fulltext_data, '$.total_mentions'), 0)
+            ''')
+        if 'fulltext_format' not in columns:
+            # 旧数据保持 JSON 格式，可用 migrate_db.py normalize 迁移
+            conn.execute(f'ALTER TABLE articles ADD COLUMN fulltext_format INTEGER DEFAULT {FULLTEXT_JSON}')
+    
+    def _add_state_columns(self, conn: sqlite3.Connection):
+        """文章表补充处理状态列，并按已有的布尔字段回填"""
+        if 'state' in self._table_columns(conn, 'articles'):
+            return
+        conn.execute(f"ALTER TABLE articles ADD COLUMN state TEXT NOT NULL DEFAULT '{processing_state.PENDING}'")
+        conn.execute('ALTER TABLE articles ADD COLUMN resume_stage TEXT')
+        conn.execute('ALTER TABLE articles ADD COLUMN failure_reason TEXT')
+        conn.execute('ALTER TABLE articles ADD COLUMN attempts INTEGER DEFAULT 0')
+        conn.execute('ALTER TABLE articles ADD COLUMN next_retry_at TEXT')
+        self._backfill_states(conn)
     
-    def create_project(self, name: str, keyword: str, years: int, 
+    def _backfill_states(self, conn: sqlite3.Connection):
+        """按布尔字段推断已有文章的处理状态（规则与 processing_state.current_state 一致）"""
+        failed = 'articles.has_fulltext = 0 AND articles.fulltext_processed = 1'
+        conn.execute(f'''
+            UPDATE articles SET (state, resume_stage, failure_reason, attempts) = (
+                SELECT CASE
+                           WHEN articles.has_fulltext = 1 THEN '{processing_state.PARSED}'
+                           WHEN articles.fulltext_processed = 1 THEN '{processing_state.FAILED}'
+                           WHEN d.pmc_id IS NOT NULL THEN '{processing_state.PMCID_RESOLVED}'
+                           ELSE '{processing_state.PENDING}'
+                       END,
+                       CASE WHEN {failed} THEN
+                           CASE WHEN d.pmc_id IS NOT NULL THEN '{processing_state.PMCID_RESOLVED}'
+                                ELSE '{processing_state.PENDING}' END
+                       END,
+                       CASE WHEN {failed} THEN
+                           CASE WHEN d.pmc_id IS NOT NULL THEN '{processing_state.FETCH_FAILED}'
+                                ELSE '{processing_state.NO_PMC_ID}' END
+                       END,
+                       {failed}
+                FROM documents d WHERE d.doc_id = articles.doc_id
+            )
+        ''')
+    
+    def _migrate_to_documents(self):
+        """
+        把旧的文章表迁移为全局文档表 + 项目成员表（整个迁移在一个事务中完成）
+        
+        同一 PMID 在多个项目中的文章合并为一个文档，章节和图表取自已拆分存储全文的那一份；
+        各项目的相关性、关键词提及等留在成员行中，成员行 id 保持不变。
+        已删除项目遗留的文章不再迁移。
+        """
+        print("🔄 迁移文章表：合并各项目中重复保存的文章...")
+        legacy_tables = ('articles', 'article_sections', 'article_mentions', 'article_figures')
+        
+        with self.pool.connection() as conn:
+            # 重建表需要关闭外键（只能在事务外设置），否则删除旧表时会级联删除数据
+            conn.execute('PRAGMA foreign_keys = OFF')
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                self._add_legacy_columns(conn)
+                existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                renamed = [table for table in legacy_tables if table in existing]
+                
+                conn.execute('DROP TRIGGER IF EXISTS articles_fts_delete')
+                conn.execute('DROP TABLE IF EXISTS articles_fts')
+                for table in renamed:
+                    conn.execute(f'ALTER TABLE {table} RENAME TO legacy_{table}')
+                self._create_tables(conn)
+                
+                # 每个 PMID 选一行作为文档来源：优先已拆分存储全文的，其次最近更新的
+                conn.execute(f'''
+                    CREATE TEMP TABLE document_sources AS
+                    SELECT id AS article_id, pmid FROM (
+                        SELECT id, pmid, ROW_NUMBER() OVER (
+                            PARTITION BY pmid
+                            ORDER BY (fulltext_format = {FULLTEXT_NORMALIZED} AND has_fulltext = 1) DESC,
+                                     updated_at DESC
+                        ) AS choice
+                        FROM legacy_articles
+                        WHERE project_id IN (SELECT project_id FROM projects)
+                    ) WHERE choice = 1
+                ''')
+                conn.execute('''
+                    INSERT INTO documents
+                    (pmid, pmc_id, title, abstract, journal, year, date, authors, doi,
+                     created_at, updated_at)
+                    SELECT a.pmid, a.pmc_id, a.title, a.abstract, a.journal, a.year, a.date,
+                           a.authors, a.doi, a.created_at, a.updated_at
+                    FROM document_sources s
+                    JOIN legacy_articles a ON a.id = s.article_id
+                ''')
+                # 来源行没有 PMC ID 时使用其他项目已解析到的
+                conn.execute('''
+                    UPDATE documents SET pmc_id = (
+                        SELECT MAX(pmc_id) FROM legacy_articles a WHERE a.pmid = documents.pmid
+                    )
+                    WHERE pmc_id IS NULL
+                ''')
+                conn.execute('''
+                    INSERT INTO articles
+                    (id, project_id, pmid, doc_id, keyword, relevance_data, has_fulltext,
+                     pmc_available, fulltext_processed, fulltext_data, fulltext_format,
+                     relevance_score, total_mentions, content_hash, sort_date, sort_journal,
+                     created_at, updated_at)
+                    SELECT a.id, a.project_id, a.pmid, d.doc_id, a.keyword, a.relevance_data,
+                           a.has_fulltext, a.pmc_available, a.fulltext_processed, a.fulltext_data,
+                           a.fulltext_format, a.relevance_score, a.total_mentions, a.content_hash,
+                           d.date, d.journal, a.created_at, a.updated_at
+                    FROM legacy_articles a
+                    JOIN documents d ON d.pmid = a.pmid
+                    WHERE a.project_id IN (SELECT project_id FROM projects)
+                ''')
+                self._backfill_states(conn)
+                
+                if 'article_sections' in renamed:
+                    conn.execute('''
+                        INSERT INTO document_sections (doc_id, name, content)
+                        SELECT d.doc_id, x.name, x.content
+                        FROM document_sources s
+                        JOIN legacy_article_sections x ON x.article_id = s.article_id
+                        JOIN documents d ON d.pmid = s.pmid
+                    ''')
+                if 'article_mentions' in renamed:
+                    conn.execute('''
+                        INSERT INTO article_mentions
+                        (article_id, ordinal, section, section_kind, section_path, keyword,
+                         context, paragraph, position, extra)
+                        SELECT article_id, ordinal, section, section_kind, section_path, keyword,
+                               context, paragraph, position, extra
+                        FROM legacy_article_mentions
+                        WHERE article_id IN (SELECT id FROM articles)
+                    ''')
+                if 'article_figures' in renamed:
+                    conn.execute('''
+                        INSERT INTO document_figures (doc_id, ordinal, figure_id, label, caption, extra)
+                        SELECT d.doc_id, f.ordinal, f.figure_id, f.label, f.caption, f.extra
+                        FROM document_sources s
+                        JOIN legacy_article_figures f ON f.article_id = s.article_id
+                        JOIN documents d ON d.pmid = s.pmid
+                    ''')
+                    conn.execute('''
+                        INSERT INTO article_figure_hits (article_id, ordinal)
+                        SELECT article_id, ordinal FROM legacy_article_figures
+                        WHERE mentions_keyword = 1 AND article_id IN (SELECT id FROM articles)
+                    ''')
+                
+                conn.execute('DROP TABLE temp.document_sources')
+                for table in reversed(renamed):
+                    conn.execute(f'DROP TABLE legacy_{table}')
+                
+                problems = conn.execute('PRAGMA foreign_key_check').fetchall()
+                if problems:
+                    raise sqlite3.IntegrityError(f"迁移后外键检查失败: {len(problems)} 行")
+                documents, memberships = conn.execute(
+                    'SELECT (SELECT COUNT(*) FROM documents), (SELECT COUNT(*) FROM articles)'
+                ).fetchone()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute('PRAGMA foreign_keys = ON')
+        
+        print(f"✅ 文章表迁移完成: {memberships} 篇项目文章 → {documents} 篇文档")
+    
+    def create_project(self, name: str, keyword: str, years: int,
                       description: str = "") -> str:
         """
         创建新项目
@@ -87,17 +617,12 @@ class ProjectDatabase:
         project_id = str(uuid.uuid4())[:8]  # 使用8位UUID
         now = datetime.now().isoformat()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO projects 
-            (project_id, name, keyword, years, created_at, updated_at, description)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (project_id, name, keyword, years, now, now, description))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO projects
+                (project_id, name, keyword, years, created_at, updated_at, description)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (project_id, name, keyword, years, now, now, description))
         
         print(f"✅ 项目创建成功: {project_id}")
         return project_id
@@ -106,50 +631,33 @@ class ProjectDatabase:
         """
         保存文章到项目（批量保存/更新）
         
+        文章元数据和全文章节、图表写入全局文档表，多个项目检索到同一篇文章时只保存一份；
+        相关性、关键词提及等与项目关键词有关的结果写入项目的文章行。
+        内容与数据库中一致的文章（按内容哈希判断）会被跳过，客户端重复提交不会产生写入。
+        
         Args:
             project_id: 项目ID
-            articles: 文章列表
-            
+            articles: 文章列表（只需包含有变化的文章）
+        
         Returns:
-            保存/更新的文章数量
+            实际写入（新增或内容有变化）的文章数量
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         now = datetime.now().isoformat()
         
-        saved_count = 0
-        
+        # 先在事务外完成序列化，缩短持有写锁的时间（同一 pmid 以最后一次为准）
+        documents = {}
+        memberships = {}
+        fulltexts = {}
         for article in articles:
             # 准备数据
+            pmid = article['pmid']
+            fulltext = article.get('fulltext') or None
             authors_json = json.dumps(article.get('authors', []))
-            relevance_json = json.dumps(article.get('relevance', {}))
-            fulltext_json = json.dumps(article.get('fulltext', {})) if article.get('fulltext') else None
+            # 键排序后序列化：从数据库读回的文章字段顺序不同，内容哈希也应相同
+            relevance_json = json.dumps(article.get('relevance', {}), sort_keys=True)
+            fulltext_json = json.dumps(fulltext, sort_keys=True) if fulltext else None
             
-            # 尝试插入或更新
-            cursor.execute('''
-                INSERT INTO articles 
-                (project_id, pmid, pmc_id, title, abstract, journal, year, date, 
-                 authors, doi, keyword, relevance_data, has_fulltext, pmc_available,
-                 fulltext_processed, fulltext_data, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(project_id, pmid) DO UPDATE SET
-                    pmc_id = excluded.pmc_id,
-                    title = excluded.title,
-                    abstract = excluded.abstract,
-                    journal = excluded.journal,
-                    year = excluded.year,
-                    date = excluded.date,
-                    authors = excluded.authors,
-                    doi = excluded.doi,
-                    relevance_data = excluded.relevance_data,
-                    has_fulltext = excluded.has_fulltext,
-                    pmc_available = excluded.pmc_available,
-                    fulltext_processed = excluded.fulltext_processed,
-                    fulltext_data = excluded.fulltext_data,
-                    updated_at = excluded.updated_at
-            ''', (
-                project_id,
-                article['pmid'],
+            content = (
                 article.get('pmc_id'),
                 article['title'],
                 article.get('abstract'),
@@ -160,31 +668,419 @@ class ProjectDatabase:
                 article.get('doi'),
                 article.get('keyword'),
                 relevance_json,
-                article.get('has_fulltext', False),
-                article.get('pmc_available', False),
-                article.get('fulltext_processed', False),
-                fulltext_json,
-                now,
-                now
-            ))
+                bool(article.get('has_fulltext', False)),
+                bool(article.get('pmc_available', False)),
+                bool(article.get('fulltext_processed', False)),
+                fulltext_json
+            )
+            state = processing_state.current_state(article)
+            state = tuple(state[field] for field in processing_state.STATE_FIELDS)
+            documents[pmid] = (pmid, *content[:8], now, now)
+            memberships[pmid] = (
+                *content[8:-1],
+                self._fulltext_residual(fulltext),
+                FULLTEXT_NORMALIZED if fulltext else FULLTEXT_JSON,
+                (article.get('relevance') or {}).get('score', 0),
+                (fulltext or {}).get('total_mentions', 0),
+                fulltext_match_key(fulltext),
+                *state,
+                self._content_hash(content + state)
+            )
+            fulltexts[pmid] = fulltext
+        
+        with self.transaction() as conn:
+            # 只写入新增或内容哈希变化的文章
+            existing = {}
+            pmids = list(memberships)
+            for i in range(0, len(pmids), SQL_BATCH_SIZE):
+                chunk = pmids[i:i + SQL_BATCH_SIZE]
+                existing.update(conn.execute(f'''
+                    SELECT pmid, content_hash FROM articles
+                    WHERE project_id = ? AND pmid IN ({', '.join('?' * len(chunk))})
+                ''', (project_id, *chunk)).fetchall())
+            changed = [pmid for pmid, row in memberships.items()
+                       if pmid not in existing or existing[pmid] != row[-1]]
             
-            saved_count += 1
+            if changed:
+                doc_ids = self._upsert_documents(conn, [documents[pmid] for pmid in changed])
+                
+                # 插入或更新（同一条预编译语句批量执行）
+                conn.executemany('''
+                    INSERT INTO articles
+                    (project_id, pmid, doc_id, keyword, relevance_data, has_fulltext,
+                     pmc_available, fulltext_processed, fulltext_data, fulltext_format,
+                     relevance_score, total_mentions, match_key, state, resume_stage,
+                     failure_reason, attempts, next_retry_at, content_hash,
+                     created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(project_id, pmid) DO UPDATE SET
+                        relevance_data = excluded.relevance_data,
+                        has_fulltext = excluded.has_fulltext,
+                        pmc_available = excluded.pmc_available,
+                        fulltext_processed = excluded.fulltext_processed,
+                        fulltext_data = excluded.fulltext_data,
+                        fulltext_format = excluded.fulltext_format,
+                        relevance_score = excluded.relevance_score,
+                        total_mentions = excluded.total_mentions,
+                        match_key = excluded.match_key,
+                        state = excluded.state,
+                        resume_stage = excluded.resume_stage,
+                        failure_reason = excluded.failure_reason,
+                        attempts = excluded.attempts,
+                        next_retry_at = excluded.next_retry_at,
+                        content_hash = excluded.content_hash,
+                        updated_at = excluded.updated_at
+                ''', [(project_id, pmid, doc_ids[pmid], *memberships[pmid], now, now) for pmid in changed])
+                
+                self._sync_sort_keys(conn, list(doc_ids.values()))
+                self._touch_document_projects(conn, list(doc_ids.values()), project_id)
+                self._write_fulltext(conn, [
+                    (article_id, doc_id, fulltexts[pmid])
+                    for pmid, (article_id, doc_id) in self._article_ids(conn, project_id, changed).items()
+                ])
+                self._index_documents(conn, list(doc_ids.values()))
+                self._refresh_project_stats(conn, project_id, now)
         
-        # 更新项目统计
-        cursor.execute('''
-            UPDATE projects SET
-                total_articles = (SELECT COUNT(*) FROM articles WHERE project_id = ?),
-                processed_articles = (SELECT COUNT(*) FROM articles WHERE project_id = ? AND fulltext_processed = 1),
-                fulltext_articles = (SELECT COUNT(*) FROM articles WHERE project_id = ? AND has_fulltext = 1),
-                updated_at = ?
-            WHERE project_id = ?
-        ''', (project_id, project_id, project_id, now, project_id))
+        saved_count = len(changed)
+        print(f"✅ 保存文章: {saved_count} 篇到项目 {project_id}（{len(memberships) - saved_count} 篇无变化）")
+        return saved_count
+    
+    def _upsert_documents(self, conn: sqlite3.Connection, rows: List[tuple]) -> Dict[str, int]:
+        """
+        写入全局文档表（调用方持有事务）
         
-        conn.commit()
-        conn.close()
+        标题总是更新；其余字段只在新值非空时覆盖，避免缺少某些字段的项目清空其他项目已保存的信息。
         
-        print(f"✅ 保存文章: {saved_count} 篇到项目 {project_id}")
-        return saved_count
+        Returns:
+            {pmid: doc_id}
+        """
+        conn.executemany('''
+            INSERT INTO documents
+            (pmid, pmc_id, title, abstract, journal, year, date, authors, doi,
+             created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(pmid) DO UPDATE SET
+                pmc_id = COALESCE(excluded.pmc_id, documents.pmc_id),
+                title = excluded.title,
+                abstract = COALESCE(excluded.abstract, documents.abstract),
+                journal = COALESCE(excluded.journal, documents.journal),
+                year = COALESCE(excluded.year, documents.year),
+                date = COALESCE(excluded.date, documents.date),
+                authors = COALESCE(NULLIF(excluded.authors, '[]'), documents.authors),
+                doi = COALESCE(excluded.doi, documents.doi),
+                updated_at = excluded.updated_at
+        ''', rows)
+        
+        doc_ids = {}
+        pmids = [row[0] for row in rows]
+        for i in range(0, len(pmids), SQL_BATCH_SIZE):
+            chunk = pmids[i:i + SQL_BATCH_SIZE]
+            doc_ids.update(conn.execute(f'''
+                SELECT pmid, doc_id FROM documents
+                WHERE pmid IN ({', '.join('?' * len(chunk))})
+            ''', chunk).fetchall())
+        return doc_ids
+    
+    def _sync_sort_keys(self, conn: sqlite3.Connection, doc_ids: List[int]):
+        """把文档的日期和期刊同步到引用它的所有项目文章（项目内排序使用）"""
+        conn.executemany('''
+            UPDATE articles SET (sort_date, sort_journal) = (
+                SELECT date, journal FROM documents WHERE documents.doc_id = articles.doc_id
+            )
+            WHERE doc_id = ?
+        ''', [(doc_id,) for doc_id in doc_ids])
+    
+    def _touch_document_projects(self, conn: sqlite3.Connection, doc_ids: List[int], project_id: str):
+        """共享这些文档的其他项目内容也随之变化，递增它们的版本号（调用方持有事务）"""
+        for i in range(0, len(doc_ids), SQL_BATCH_SIZE):
+            chunk = doc_ids[i:i + SQL_BATCH_SIZE]
+            conn.execute(f'''
+                UPDATE projects SET version = version + 1
+                WHERE project_id != ? AND project_id IN (
+                    SELECT project_id FROM articles WHERE doc_id IN ({', '.join('?' * len(chunk))})
+                )
+            ''', (project_id, *chunk))
+    
+    def _article_ids(self, conn: sqlite3.Connection, project_id: str,
+                     pmids: List[str]) -> Dict[str, tuple]:
+        """查询项目中文章的 {pmid: (id, doc_id)}"""
+        result = {}
+        for i in range(0, len(pmids), SQL_BATCH_SIZE):
+            chunk = pmids[i:i + SQL_BATCH_SIZE]
+            for row in conn.execute(f'''
+                SELECT pmid, id, doc_id FROM articles
+                WHERE project_id = ? AND pmid IN ({', '.join('?' * len(chunk))})
+            ''', (project_id, *chunk)):
+                result[row['pmid']] = (row['id'], row['doc_id'])
+        return result
+    
+    def _fulltext_residual(self, fulltext: Optional[Dict]):
+        """fulltext 中未拆分到独立表的字段（JSON，按设置压缩），没有则为 None"""
+        residual = {k: v for k, v in (fulltext or {}).items() if k not in NORMALIZED_FULLTEXT_KEYS}
+        return pack_text(json.dumps(residual), self.compression) if residual else None
+    
+    def _write_fulltext(self, conn: sqlite3.Connection, items: List[tuple],
+                        keep_documents: bool = False):
+        """
+        用新的全文分析结果替换文章的关键词提及和图表标记，同时更新文档的章节和图表（调用方持有事务）
+        
+        没有全文分析结果的文章只清空提及，不影响其他项目共享的文档内容。
+        
+        Args:
+            items: [(article_id, doc_id, fulltext 或 None)]
+            keep_documents: 为 True 时只给还没有章节和图表的文档写入
+        """
+        article_ids = [(article_id,) for article_id, _, _ in items]
+        for table in ('article_mentions', 'article_figure_hits'):
+            conn.executemany(f'DELETE FROM {table} WHERE article_id = ?', article_ids)
+        
+        mentions, hits = [], []
+        documents = {}
+        for article_id, doc_id, fulltext in items:
+            if not fulltext:
+                continue
+            for ordinal, mention in enumerate(fulltext.get('keyword_mentions') or []):
+                extra = {k: v for k, v in mention.items() if k not in MENTION_KEYS}
+                section_path = mention.get('section_path')
+                mentions.append((
+                    article_id, ordinal, mention.get('section'), section_kind(mention),
+                    json.dumps(section_path) if section_path is not None else None,
+                    mention.get('keyword'), mention.get('context'),
+                    pack_text(mention.get('paragraph'), self.compression),
+                    mention.get('position'), json.dumps(extra) if extra else None
+                ))
+            
+            sections = [(name, fulltext[name]) for name in FULLTEXT_SECTIONS if name in fulltext]
+            figures = []
+            for ordinal, figure in enumerate(fulltext.get('figures') or []):
+                extra = {k: v for k, v in figure.items() if k not in FIGURE_KEYS}
+                figures.append((
+                    figure.get('id'), figure.get('label'), figure.get('caption'),
+                    json.dumps(extra) if extra else None
+                ))
+                if figure.get('mentions_keyword'):
+                    hits.append((article_id, ordinal))
+            documents[doc_id] = (sections, figures)
+        
+        self._write_document_parts(conn, documents, keep_documents)
+        conn.executemany('''
+            INSERT INTO article_mentions
+            (article_id, ordinal, section, section_kind, section_path, keyword,
+             context, paragraph, position, extra)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', mentions)
+        conn.executemany('''
+            INSERT INTO article_figure_hits (article_id, ordinal) VALUES (?, ?)
+        ''', hits)
+    
+    def _write_document_parts(self, conn: sqlite3.Connection, documents: Dict[int, tuple],
+                              keep_existing: bool = False):
+        """
+        写入文档的章节和图表，内容哈希与已保存的一致时跳过（调用方持有事务）
+        
+        Args:
+            documents: {doc_id: ([(章节名, 内容)], [(figure_id, label, caption, extra)])}
+            keep_existing: 为 True 时跳过已有章节或图表的文档
+        """
+        hashes = {
+            doc_id: hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()
+            for doc_id, parts in documents.items()
+        }
+        existing = {}
+        doc_ids = list(hashes)
+        for i in range(0, len(doc_ids), SQL_BATCH_SIZE):
+            chunk = doc_ids[i:i + SQL_BATCH_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            for row in conn.execute(f'''
+                SELECT doc_id, fulltext_hash,
+                       EXISTS (SELECT 1 FROM document_sections s WHERE s.doc_id = documents.doc_id)
+                       OR EXISTS (SELECT 1 FROM document_figures f WHERE f.doc_id = documents.doc_id)
+                       AS has_parts
+                FROM documents WHERE doc_id IN ({placeholders})
+            ''', chunk):
+                existing[row['doc_id']] = (row['fulltext_hash'], row['has_parts'])
+        
+        changed = [
+            doc_id for doc_id, digest in hashes.items()
+            if existing[doc_id][0] != digest and not (keep_existing and existing[doc_id][1])
+        ]
+        if not changed:
+            return
+        
+        for table in ('document_sections', 'document_figures'):
+            conn.executemany(f'DELETE FROM {table} WHERE doc_id = ?', [(doc_id,) for doc_id in changed])
+        conn.executemany('''
+            INSERT INTO document_sections (doc_id, name, content) VALUES (?, ?, ?)
+        ''', [
+            (doc_id, name, pack_text(content, self.compression))
+            for doc_id in changed
+            for name, content in documents[doc_id][0]
+        ])
+        conn.executemany('''
+            INSERT INTO document_figures (doc_id, ordinal, figure_id, label, caption, extra)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (doc_id, ordinal, *figure)
+            for doc_id in changed
+            for ordinal, figure in enumerate(documents[doc_id][1])
+        ])
+        conn.executemany('UPDATE documents SET fulltext_hash = ? WHERE doc_id = ?',
+                         [(hashes[doc_id], doc_id) for doc_id in changed])
+    
+    # PATCH 可更新的字段：请求字段名 → (列名, 是否需要JSON序列化)
+    PATCHABLE_FIELDS = {
+        'pmc_id': ('pmc_id', False),
+        'title': ('title', False),
+        'abstract': ('abstract', False),
+        'journal': ('journal', False),
+        'year': ('year', False),
+        'date': ('date', False),
+        'doi': ('doi', False),
+        'keyword': ('keyword', False),
+        'authors': ('authors', True),
+        'relevance': ('relevance_data', True),
+        'has_fulltext': ('has_fulltext', False),
+        'pmc_available': ('pmc_available', False),
+        'fulltext_processed': ('fulltext_processed', False),
+        'fulltext': ('fulltext_data', True),
+        'state': ('state', False),
+        'resume_stage': ('resume_stage', False),
+        'failure_reason': ('failure_reason', False),
+        'attempts': ('attempts', False),
+        'next_retry_at': ('next_retry_at', False),
+    }
+    
+    # 保存在全局文档表中的字段（其余字段属于项目的文章行）
+    DOCUMENT_FIELDS = {'pmc_id', 'title', 'abstract', 'journal', 'year', 'date', 'authors', 'doi'}
+    
+    # 影响全文检索索引的字段
+    SEARCH_FIELDS = {'title', 'abstract', 'fulltext'}
+    
+    # 从JSON字段派生的列：字段名 → [(列名, 取值函数)]
+    DERIVED_COLUMNS = {
+        'relevance': [('relevance_score', lambda value: (value or {}).get('score', 0))],
+        'fulltext': [
+            ('total_mentions', lambda value: (value or {}).get('total_mentions', 0)),
+            ('fulltext_format', lambda value: FULLTEXT_NORMALIZED if value else FULLTEXT_JSON),
+            ('match_key', fulltext_match_key),
+        ],
+    }
+    
+    def patch_articles(self, project_id: str, patches: List[Dict]) -> int:
+        """
+        只更新文章的指定字段
+        
+        文章元数据（标题、摘要等）更新在全局文档表中，所有包含该文章的项目都会看到新值。
+        
+        Args:
+            project_id: 项目ID
+            patches: [{"pmid": ..., 字段: 新值, ...}]，未知字段会被忽略
+        
+        Returns:
+            实际更新的文章数量
+        """
+        now = datetime.now().isoformat()
+        
+        # 按更新的字段组合分组，每组使用一条预编译语句
+        groups: Dict[tuple, List[tuple]] = {}
+        fulltexts = {}
+        reindex = []
+        for patch in patches:
+            fields = tuple(sorted(f for f in patch if f in self.PATCHABLE_FIELDS))
+            if not patch.get('pmid') or not fields:
+                continue
+            if self.SEARCH_FIELDS.intersection(fields):
+                reindex.append(patch['pmid'])
+            values = {}
+            derived = []
+            for field in fields:
+                value = patch[field]
+                for _, derive in self.DERIVED_COLUMNS.get(field, []):
+                    derived.append(derive(value))
+                if field == 'fulltext':
+                    # 章节/提及/图表写入独立表，fulltext_data 只保存其余字段
+                    fulltexts[patch['pmid']] = value or None
+                    value = self._fulltext_residual(value)
+                elif self.PATCHABLE_FIELDS[field][1]:
+                    value = json.dumps(value) if value else None
+                values[field] = value
+            groups.setdefault(fields, []).append((values, derived, patch['pmid']))
+        
+        with self.transaction() as conn:
+            updated_count = 0
+            patched_documents = []
+            for fields, items in groups.items():
+                article_fields = [f for f in fields if f not in self.DOCUMENT_FIELDS]
+                document_fields = [f for f in fields if f in self.DOCUMENT_FIELDS]
+                
+                columns = [self.PATCHABLE_FIELDS[f][0] for f in article_fields]
+                columns += [column for f in article_fields for column, _ in self.DERIVED_COLUMNS.get(f, [])]
+                assignments = ''.join(f"{column} = ?, " for column in columns)
+                # 部分更新后内容哈希失效，下次整篇保存时会重新写入
+                changes_before = conn.total_changes
+                conn.executemany(f'''
+                    UPDATE articles SET {assignments}content_hash = NULL, updated_at = ?
+                    WHERE project_id = ? AND pmid = ?
+                ''', [
+                    (*(values[f] for f in article_fields), *derived, now, project_id, pmid)
+                    for values, derived, pmid in items
+                ])
+                updated_count += conn.total_changes - changes_before
+                
+                if document_fields:
+                    assignments = ''.join(f"{self.PATCHABLE_FIELDS[f][0]} = ?, " for f in document_fields)
+                    conn.executemany(f'''
+                        UPDATE documents SET {assignments}updated_at = ?
+                        WHERE doc_id = (SELECT doc_id FROM articles WHERE project_id = ? AND pmid = ?)
+                    ''', [
+                        (*(values[f] for f in document_fields), now, project_id, pmid)
+                        for values, _, pmid in items
+                    ])
+                    patched_documents.extend(pmid for _, _, pmid in items)
+            
+            if fulltexts:
+                self._write_fulltext(conn, [
+                    (article_id, doc_id, fulltexts[pmid])
+                    for pmid, (article_id, doc_id) in self._article_ids(conn, project_id, list(fulltexts)).items()
+                ])
+            if patched_documents:
+                self._sync_sort_keys(conn, [
+                    doc_id for _, doc_id in self._article_ids(conn, project_id, patched_documents).values()
+                ])
+            if patched_documents or fulltexts:
+                self._touch_document_projects(conn, [
+                    doc_id for _, doc_id in
+                    self._article_ids(conn, project_id, patched_documents + list(fulltexts)).values()
+                ], project_id)
+            if reindex:
+                self._index_documents(conn, [
+                    doc_id for _, doc_id in self._article_ids(conn, project_id, reindex).values()
+                ])
+            if updated_count:
+                self._refresh_project_stats(conn, project_id, now)
+        
+        print(f"✅ 更新文章: {updated_count} 篇（项目 {project_id}）")
+        return updated_count
+    
+    @staticmethod
+    def _content_hash(content: tuple) -> str:
+        """文章内容哈希（不含时间戳），用于跳过未变化的行"""
+        return hashlib.sha1(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def _refresh_project_stats(self, conn: sqlite3.Connection, project_id: str, now: str):
+        """一次聚合查询更新项目统计（调用方持有事务）"""
+        conn.execute('''
+            UPDATE projects SET
+                (total_articles, processed_articles, fulltext_articles) = (
+                    SELECT COUNT(*),
+                           COALESCE(SUM(fulltext_processed = 1), 0),
+                           COALESCE(SUM(has_fulltext = 1), 0)
+                    FROM articles WHERE project_id = ?
+                ),
+                updated_at = ?,
+                version = version + 1
+            WHERE project_id = ?
+        ''', (project_id, now, project_id))
     
     def load_project(self, project_id: str) -> Optional[Dict]:
         """
@@ -196,98 +1092,889 @@ class ProjectDatabase:
                 'articles': [...]
             }
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        columns = self._select_columns(list(self.ARTICLE_COLUMNS))
+        with self.connection() as conn:
+            # 项目信息和文章在同一个读事务中读取，保证一致
+            conn.execute('BEGIN DEFERRED')
+            
+            # 加载项目信息
+            project_row = conn.execute(
+                'SELECT * FROM projects WHERE project_id = ?', (project_id,)
+            ).fetchone()
+            
+            if not project_row:
+                return None
+            
+            # 加载文章
+            rows = conn.execute(f'''
+                SELECT a.project_id AS project_id, {columns}
+                FROM articles a JOIN documents d ON d.doc_id = a.doc_id
+                WHERE a.project_id = ?
+                ORDER BY a.updated_at DESC
+            ''', (project_id,)).fetchall()
+            articles = self._rows_to_articles(conn, rows)
+            conn.rollback()
+        
+        return {
+            'project': dict(project_row),
+            'articles': articles
+        }
+    
+    # 文章字段 → 数据库列（用于字段投影）
+    ARTICLE_COLUMNS = {
+        'pmid': 'pmid',
+        'pmc_id': 'pmc_id',
+        'title': 'title',
+        'abstract': 'abstract',
+        'journal': 'journal',
+        'year': 'year',
+        'date': 'date',
+        'authors': 'authors',
+        'doi': 'doi',
+        'keyword': 'keyword',
+        'relevance': 'relevance_data',
+        'has_fulltext': 'has_fulltext',
+        'pmc_available': 'pmc_available',
+        'fulltext_processed': 'fulltext_processed',
+        'total_mentions': 'total_mentions',
+        'state': 'state',
+        'resume_stage': 'resume_stage',
+        'failure_reason': 'failure_reason',
+        'attempts': 'attempts',
+        'next_retry_at': 'next_retry_at',
+        'fulltext': 'fulltext_data',
+    }
+    
+    # 预设视图：summary 不含全文分析结果（列表展示用），full 为完整文章
+    ARTICLE_VIEWS = {
+        'summary': [f for f in ARTICLE_COLUMNS if f != 'fulltext'],
+        'full': list(ARTICLE_COLUMNS),
+    }
+    
+    # 排序方式 → (文章表的列名, 默认方向)；均有 (project_id, 列) 索引
+    ARTICLE_SORTS = {
+        'relevance': ('relevance_score', 'DESC'),
+        'date': ('sort_date', 'DESC'),
+        'journal': ('sort_journal', 'ASC'),
+        'updated': ('updated_at', 'DESC'),
+    }
+    
+    def _select_columns(self, fields: List[str]) -> str:
+        """
+        文章字段 → SELECT 列表（文档字段取自 documents d，其余取自 articles a）
         
-        # 加载项目信息
-        cursor.execute('SELECT * FROM projects WHERE project_id = ?', (project_id,))
-        project_row = cursor.fetchone()
+        包含 fulltext 时附带组装拆分存储的全文分析结果所需的内部列。
+        """
+        columns = []
+        for field in fields:
+            table = 'd' if field in self.DOCUMENT_FIELDS else 'a'
+            column = self.ARTICLE_COLUMNS[field]
+            columns.append(f'{table}.{column} AS {column}')
+        if 'fulltext' in fields:
+            columns += ['a.id AS id', 'a.doc_id AS doc_id', 'a.fulltext_format AS fulltext_format']
+        return ', '.join(columns)
+    
+    def list_articles(self, project_id: str, offset: int = 0, limit: int = 50,
+                      sort: str = 'relevance', order: Optional[str] = None,
+                      fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        分页获取项目文章（排序在SQL中完成，只读取需要的列）
         
-        if not project_row:
-            conn.close()
-            return None
+        Args:
+            project_id: 项目ID
+            offset: 起始位置
+            limit: 每页数量
+            sort: 排序方式（relevance / date / journal / updated）
+            order: asc / desc，默认按排序方式决定
+            fields: 返回的字段列表（见 ARTICLE_COLUMNS），默认 summary 视图
         
-        project = dict(project_row)
+        Returns:
+            {'articles': [...], 'total': 总数, 'offset': ..., 'limit': ...}，项目不存在时返回 None
         
-        # 加载文章
-        cursor.execute('''
-            SELECT * FROM articles 
-            WHERE project_id = ? 
-            ORDER BY updated_at DESC
-        ''', (project_id,))
-        
-        articles = []
-        for row in cursor.fetchall():
-            article = dict(row)
-            # 解析JSON字段
+        Raises:
+            ValueError: 排序方式或字段无效
+        """
+        if sort not in self.ARTICLE_SORTS:
+            raise ValueError(f"无效的排序方式: {sort}")
+        column, direction = self.ARTICLE_SORTS[sort]
+        if order:
+            if order.lower() not in ('asc', 'desc'):
+                raise ValueError(f"无效的排序方向: {order}")
+            direction = order.upper()
+        
+        fields = fields or self.ARTICLE_VIEWS['summary']
+        unknown = [f for f in fields if f not in self.ARTICLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"无效的字段: {', '.join(unknown)}")
+        # pmid 始终返回，用于客户端定位文章
+        columns = self._select_columns(['pmid'] + [f for f in fields if f != 'pmid'])
+        
+        with self.connection() as conn:
+            conn.execute('BEGIN DEFERRED')
+            project_row = conn.execute(
+                'SELECT total_articles FROM projects WHERE project_id = ?', (project_id,)
+            ).fetchone()
+            
+            if not project_row:
+                return None
+            
+            # id 作为第二排序键，保证分页稳定
+            rows = conn.execute(f'''
+                SELECT {columns}
+                FROM articles a JOIN documents d ON d.doc_id = a.doc_id
+                WHERE a.project_id = ?
+                ORDER BY a.{column} {direction}, a.id {direction}
+                LIMIT ? OFFSET ?
+            ''', (project_id, limit, offset)).fetchall()
+            articles = self._rows_to_articles(conn, rows)
+            conn.rollback()
+        
+        return {
+            'articles': articles,
+            'total': project_row['total_articles'],
+            'offset': offset,
+            'limit': limit
+        }
+    
+    def get_article(self, project_id: str, pmid: str) -> Optional[Dict]:
+        """获取项目中单篇文章的完整信息（含全文分析结果）"""
+        columns = self._select_columns(list(self.ARTICLE_COLUMNS))
+        with self.connection() as conn:
+            row = conn.execute(f'''
+                SELECT {columns}
+                FROM articles a JOIN documents d ON d.doc_id = a.doc_id
+                WHERE a.project_id = ? AND a.pmid = ?
+            ''', (project_id, pmid)).fetchone()
+            
+            if not row:
+                return None
+            
+            return self._rows_to_articles(conn, [row])[0]
+    
+    def list_articles_by_state(self, project_id: str, states: Optional[tuple] = None,
+                               due_at: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        按处理状态查询项目中还需要处理的文章（summary 字段，相关性从高到低）
+        
+        Args:
+            project_id: 项目ID
+            states: 处理状态（见 processing_state），默认全部
+            due_at: 提供时，失败的文章只返回已到重试时间、且未达到重试次数上限的
+        
+        Returns:
+            文章列表，项目不存在时返回 None
+        """
+        states = states or processing_state.STATES
+        conditions = [f"a.state IN ({', '.join('?' * len(states))})"]
+        params = [project_id, *states]
+        if due_at is not None:
+            conditions.append(f'''(a.state != '{processing_state.FAILED}' OR (
+                a.attempts < ? AND (a.next_retry_at IS NULL OR a.next_retry_at <= ?)
+            ))''')
+            params += [processing_state.RETRY_MAX_ATTEMPTS, due_at]
+        columns = self._select_columns(self.ARTICLE_VIEWS['summary'])
+        
+        with self.connection() as conn:
+            conn.execute('BEGIN DEFERRED')
+            if conn.execute('SELECT 1 FROM projects WHERE project_id = ?', (project_id,)).fetchone() is None:
+                return None
+            rows = conn.execute(f'''
+                SELECT {columns}
+                FROM articles a JOIN documents d ON d.doc_id = a.doc_id
+                WHERE a.project_id = ? AND {' AND '.join(conditions)}
+                ORDER BY a.relevance_score DESC, a.id
+            ''', params).fetchall()
+            conn.rollback()
+        
+        return [self._row_to_article(row) for row in rows]
+    
+    def find_processed_fulltext(self, pmids: List[str], match_key: str) -> Dict[str, Dict]:
+        """
+        查找其他项目用相同关键词集合分析过的全文结果，新项目可直接复用而无需重新下载和解析
+        
+        Args:
+            pmids: 待处理文章的PMID
+            match_key: 关键词集合的标识（KeywordMatcher.signature）
+        
+        Returns:
+            {pmid: {'fulltext': 全文分析结果, 'pmc_id': ...}}，同一篇文章取最近保存的一份
+        """
+        pmids = [pmid for pmid in dict.fromkeys(pmids) if pmid]
+        columns = self._select_columns(['pmid', 'pmc_id', 'total_mentions', 'fulltext'])
+        found = {}
+        with self.connection() as conn:
+            conn.execute('BEGIN DEFERRED')
+            for i in range(0, len(pmids), SQL_BATCH_SIZE):
+                chunk = pmids[i:i + SQL_BATCH_SIZE]
+                rows = conn.execute(f'''
+                    SELECT {columns}
+                    FROM (
+                        SELECT id, ROW_NUMBER() OVER (PARTITION BY pmid ORDER BY updated_at DESC) AS choice
+                        FROM articles
+                        WHERE pmid IN ({', '.join('?' * len(chunk))})
+                          AND match_key = ? AND has_fulltext = 1 AND fulltext_format = ?
+                    ) latest
+                    JOIN articles a ON a.id = latest.id
+                    JOIN documents d ON d.doc_id = a.doc_id
+                    WHERE latest.choice = 1
+                ''', (*chunk, match_key, FULLTEXT_NORMALIZED)).fetchall()
+                for article in self._rows_to_articles(conn, rows):
+                    found[article['pmid']] = {
+                        'fulltext': article['fulltext'],
+                        'pmc_id': article['pmc_id']
+                    }
+            conn.rollback()
+        
+        return found
+    
+    def _rows_to_articles(self, conn: sqlite3.Connection, rows: List[sqlite3.Row]) -> List[Dict]:
+        """数据库行 → 文章字典，拆分存储的全文分析结果从独立表中批量读取"""
+        normalized = [
+            (row['id'], row['doc_id']) for row in rows
+            if 'fulltext_format' in row.keys() and row['fulltext_format'] == FULLTEXT_NORMALIZED
+        ]
+        if not normalized:
+            return [self._row_to_article(row) for row in rows]
+        
+        parts = self._load_fulltext_parts(conn, normalized)
+        return [self._row_to_article(row, parts.get(row['id'])) for row in rows]
+    
+    def _load_fulltext_parts(self, conn: sqlite3.Connection, members: List[tuple]) -> Dict[int, Dict]:
+        """
+        批量读取文章的章节、关键词提及和图表
+        
+        Args:
+            members: [(article_id, doc_id)]
+        
+        Returns:
+            {article_id: {章节名: 内容, 'keyword_mentions': [...], 'figures': [...]}}
+        """
+        parts = {
+            article_id: {'keyword_mentions': [], 'figures': []}
+            for article_id, _ in members
+        }
+        articles_of: Dict[int, List[int]] = {}
+        for article_id, doc_id in members:
+            articles_of.setdefault(doc_id, []).append(article_id)
+        
+        # 与项目关键词有关的部分：提及、图注是否提到关键词
+        hits = set()
+        article_ids = list(parts)
+        for i in range(0, len(article_ids), SQL_BATCH_SIZE):
+            chunk = article_ids[i:i + SQL_BATCH_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            
+            for row in conn.execute(f'''
+                SELECT * FROM article_mentions
+                WHERE article_id IN ({placeholders})
+                ORDER BY article_id, ordinal
+            ''', chunk):
+                mention = {
+                    'section': row['section'],
+                    'context': row['context'],
+                    'paragraph': unpack_text(row['paragraph']),
+                    'position': row['position']
+                }
+                if row['keyword'] is not None:
+                    mention['keyword'] = row['keyword']
+                if row['section_path'] is not None:
+                    mention['section_path'] = json.loads(row['section_path'])
+                if row['extra']:
+                    mention.update(json.loads(row['extra']))
+                parts[row['article_id']]['keyword_mentions'].append(mention)
+            
+            hits.update(tuple(row) for row in conn.execute(f'''
+                SELECT article_id, ordinal FROM article_figure_hits
+                WHERE article_id IN ({placeholders})
+            ''', chunk))
+        
+        # 文档共享的部分：章节、图表
+        doc_ids = list(articles_of)
+        for i in range(0, len(doc_ids), SQL_BATCH_SIZE):
+            chunk = doc_ids[i:i + SQL_BATCH_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            
+            for row in conn.execute(f'''
+                SELECT doc_id, name, content FROM document_sections
+                WHERE doc_id IN ({placeholders})
+            ''', chunk):
+                content = unpack_text(row['content'])
+                for article_id in articles_of[row['doc_id']]:
+                    parts[article_id][row['name']] = content
+            
+            for row in conn.execute(f'''
+                SELECT * FROM document_figures
+                WHERE doc_id IN ({placeholders})
+                ORDER BY doc_id, ordinal
+            ''', chunk):
+                for article_id in articles_of[row['doc_id']]:
+                    figure = {
+                        'id': row['figure_id'],
+                        'label': row['label'],
+                        'caption': row['caption'],
+                        'mentions_keyword': (article_id, row['ordinal']) in hits
+                    }
+                    if row['extra']:
+                        figure.update(json.loads(row['extra']))
+                    parts[article_id]['figures'].append(figure)
+        
+        return parts
+    
+    @staticmethod
+    def _row_to_article(row: sqlite3.Row, fulltext_parts: Optional[Dict] = None) -> Dict:
+        """数据库行 → 文章字典（只处理查询中包含的列）"""
+        article = dict(row)
+        
+        # 解析JSON字段
+        if 'authors' in article:
             article['authors'] = json.loads(article['authors']) if article['authors'] else []
-            article['relevance'] = json.loads(article['relevance_data']) if article['relevance_data'] else {}
-            if article['fulltext_data']:
-                article['fulltext'] = json.loads(article['fulltext_data'])
+        if 'relevance_data' in article:
+            relevance_data = article.pop('relevance_data')
+            article['relevance'] = json.loads(relevance_data) if relevance_data else {}
+        if 'fulltext_data' in article:
+            fulltext_data = unpack_text(article.pop('fulltext_data'))
+            if article.get('fulltext_format') == FULLTEXT_NORMALIZED:
+                fulltext = json.loads(fulltext_data) if fulltext_data else {}
+                fulltext.update(fulltext_parts or {'keyword_mentions': [], 'figures': []})
+                fulltext['total_mentions'] = article.get('total_mentions', len(fulltext['keyword_mentions']))
+                article['fulltext'] = fulltext
+            elif fulltext_data:
+                article['fulltext'] = json.loads(fulltext_data)
+        
+        # 🔧 修复：确保布尔字段正确转换（SQLite存储为0/1）
+        for field in ('has_fulltext', 'pmc_available', 'fulltext_processed'):
+            if field in article:
+                article[field] = bool(article[field])
+        
+        # 移除内部字段
+        for field in ('id', 'doc_id', 'fulltext_format'):
+            article.pop(field, None)
+        
+        return article
+    
+    def _index_documents(self, conn: sqlite3.Connection, doc_ids: List[int]):
+        """
+        按数据库中的当前内容重建文档的全文检索索引（调用方持有事务）
+        
+        文档还没有拆分存储的章节时，使用引用它的旧 JSON 格式文章中的全文分析结果。
+        """
+        doc_ids = list(dict.fromkeys(doc_ids))
+        for i in range(0, len(doc_ids), SQL_BATCH_SIZE):
+            chunk = doc_ids[i:i + SQL_BATCH_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
             
-            # 🔧 修复：确保布尔字段正确转换（SQLite存储为0/1）
-            article['has_fulltext'] = bool(article.get('has_fulltext', 0))
-            article['pmc_available'] = bool(article.get('pmc_available', 0))
-            article['fulltext_processed'] = bool(article.get('fulltext_processed', 0))
+            documents = {
+                row['doc_id']: {'title': row['title'], 'abstract': row['abstract']}
+                for row in conn.execute(f'''
+                    SELECT doc_id, title, abstract FROM documents
+                    WHERE doc_id IN ({placeholders})
+                ''', chunk)
+            }
+            for row in conn.execute(f'''
+                SELECT doc_id, name, content FROM document_sections
+                WHERE doc_id IN ({placeholders})
+            ''', chunk):
+                documents[row['doc_id']][row['name']] = unpack_text(row['content'])
+            for row in conn.execute(f'''
+                SELECT doc_id, group_concat(caption, char(10)) AS captions
+                FROM document_figures
+                WHERE doc_id IN ({placeholders})
+                GROUP BY doc_id
+            ''', chunk):
+                documents[row['doc_id']]['captions'] = row['captions']
             
-            # 移除内部字段
-            del article['id']
-            del article['relevance_data']
-            del article['fulltext_data']
-            del article['created_at']
-            del article['updated_at']
+            legacy = [doc_id for doc_id, document in documents.items()
+                      if not any(document.get(name) for name in FULLTEXT_SECTIONS)]
+            if legacy:
+                for row in conn.execute(f'''
+                    SELECT doc_id, fulltext_data FROM articles
+                    WHERE doc_id IN ({', '.join('?' * len(legacy))})
+                      AND fulltext_format = ? AND fulltext_data IS NOT NULL
+                ''', (*legacy, FULLTEXT_JSON)):
+                    document = documents[row['doc_id']]
+                    if any(document.get(name) for name in FULLTEXT_SECTIONS):
+                        continue
+                    fulltext = json.loads(unpack_text(row['fulltext_data']))
+                    for name in FULLTEXT_SECTIONS:
+                        document[name] = fulltext.get(name)
+                    document['captions'] = '\n'.join(
+                        figure.get('caption') or '' for figure in fulltext.get('figures') or []
+                    )
             
-            articles.append(article)
+            conn.executemany('DELETE FROM documents_fts WHERE rowid = ?', [(doc_id,) for doc_id in chunk])
+            conn.executemany(f'''
+                INSERT INTO documents_fts (rowid, {', '.join(SEARCH_COLUMNS)})
+                VALUES (?, {', '.join('?' * len(SEARCH_COLUMNS))})
+            ''', [
+                (doc_id, *(document.get(column) for column in SEARCH_COLUMNS))
+                for doc_id, document in documents.items()
+            ])
+    
+    def rebuild_search_index(self, batch_size: int = 500) -> int:
+        """
+        重建全部文档的全文检索索引（每批一个事务）
         
-        conn.close()
+        Returns:
+            已建立索引的文档数
+        """
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM documents_fts')
+        
+        indexed = 0
+        last_id = 0
+        while True:
+            with self.transaction() as conn:
+                doc_ids = [row[0] for row in conn.execute('''
+                    SELECT doc_id FROM documents WHERE doc_id > ? ORDER BY doc_id LIMIT ?
+                ''', (last_id, batch_size))]
+                if not doc_ids:
+                    break
+                self._index_documents(conn, doc_ids)
+            indexed += len(doc_ids)
+            last_id = doc_ids[-1]
+        
+        with self.transaction() as conn:
+            # 合并索引段，提高查询速度
+            conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        
+        print(f"✅ 全文检索索引已重建: {indexed} 篇文档")
+        return indexed
+    
+    def search_articles(self, query: str, project_id: Optional[str] = None,
+                        offset: int = 0, limit: int = 20,
+                        highlight: tuple = ('<mark>', '</mark>')) -> Dict:
+        """
+        在已保存文章的标题、摘要、正文章节和图注中全文检索（BM25 排序）
+        
+        Args:
+            query: FTS5 查询，支持 AND / OR / NOT、"短语"、前缀 crispr*、
+                   NEAR(a b, 10) 以及限定列 methods: depmap
+            project_id: 只在该项目中检索，None 表示全部项目
+            offset: 起始位置
+            limit: 每页数量
+            highlight: 片段中标记命中词的前后缀
+        
+        Returns:
+            {'results': [{pmid, project_id, project_name, title, journal, year, pmc_id, score, snippet}],
+             'total': ..., 'offset': ..., 'limit': ...}
+            多个项目包含同一篇文章时，每个项目各返回一条
+        
+        Raises:
+            ValueError: 查询语法错误
+        """
+        conditions = ['documents_fts MATCH ?']
+        params: List = [query]
+        if project_id:
+            conditions.append('a.project_id = ?')
+            params.append(project_id)
+        where = ' AND '.join(conditions)
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        
+        try:
+            with self.connection() as conn:
+                conn.execute('BEGIN DEFERRED')
+                total = conn.execute(f'''
+                    SELECT COUNT(*) FROM documents_fts
+                    JOIN articles a ON a.doc_id = documents_fts.rowid
+                    WHERE {where}
+                ''', params).fetchone()[0]
+                # snippet 列号 -1：自动选择命中最好的列
+                rows = conn.execute(f'''
+                    SELECT a.pmid, a.project_id, p.name AS project_name, d.title,
+                           d.journal, d.year, d.pmc_id,
+                           -bm25(documents_fts, {weights}) AS score,
+                           snippet(documents_fts, -1, ?, ?, '…', 32) AS snippet
+                    FROM documents_fts
+                    JOIN documents d ON d.doc_id = documents_fts.rowid
+                    JOIN articles a ON a.doc_id = d.doc_id
+                    JOIN projects p ON p.project_id = a.project_id
+                    WHERE {where}
+                    ORDER BY score DESC, a.id
+                    LIMIT ? OFFSET ?
+                ''', (*highlight, *params, limit, offset)).fetchall()
+                conn.rollback()
+        except sqlite3.OperationalError as e:
+            # 除锁冲突外，MATCH 的错误都来自用户输入的检索式
+            if 'locked' in str(e):
+                raise
+            raise ValueError(f"检索语法错误: {e}（含连字符等符号的词请加双引号）") from e
         
         return {
-            'project': project,
-            'articles': articles
+            'results': [dict(row) for row in rows],
+            'total': total,
+            'offset': offset,
+            'limit': limit
         }
     
-    def list_projects(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+    # 提及章节筛选：other 表示无法归类的章节
+    MENTION_SECTIONS = ('methods', 'results', 'discussion', 'other')
+    
+    def list_mentions(self, project_id: str, section: Optional[str] = None,
+                      keyword: Optional[str] = None, offset: int = 0,
+                      limit: int = 50) -> Optional[Dict]:
         """
-        获取项目列表（按更新时间倒序）
+        分页查询项目中的关键词提及（按文章相关性排序）
+        
+        Args:
+            project_id: 项目ID
+            section: 章节类型（methods / results / discussion / other），None 表示全部
+            keyword: 实际命中的别名（不区分大小写），None 表示全部
+        
+        Returns:
+            {'mentions': [...], 'total': ..., 'offset': ..., 'limit': ...}，项目不存在时返回 None
+        
+        Raises:
+            ValueError: 章节类型无效
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        conditions = ['a.project_id = ?']
+        params: List = [project_id]
+        if section:
+            if section not in self.MENTION_SECTIONS:
+                raise ValueError(f"无效的章节类型: {section}")
+            if section == 'other':
+                conditions.append('m.section_kind IS NULL')
+            else:
+                conditions.append('m.section_kind = ?')
+                params.append(section)
+        if keyword:
+            conditions.append('m.keyword = ? COLLATE NOCASE')
+            params.append(keyword)
+        where = ' AND '.join(conditions)
         
-        cursor.execute('''
-            SELECT * FROM projects 
-            ORDER BY updated_at DESC 
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
+        with self.connection() as conn:
+            conn.execute('BEGIN DEFERRED')
+            if not self._project_exists(conn, project_id):
+                conn.rollback()
+                return None
+            
+            total = conn.execute(f'''
+                SELECT COUNT(*) FROM articles a
+                JOIN article_mentions m ON m.article_id = a.id
+                WHERE {where}
+            ''', params).fetchone()[0]
+            rows = conn.execute(f'''
+                SELECT a.pmid, d.title, m.section, m.section_kind, m.section_path,
+                       m.keyword, m.context, m.paragraph, m.position
+                FROM articles a
+                JOIN article_mentions m ON m.article_id = a.id
+                JOIN documents d ON d.doc_id = a.doc_id
+                WHERE {where}
+                ORDER BY a.relevance_score DESC, a.id, m.ordinal
+                LIMIT ? OFFSET ?
+            ''', (*params, limit, offset)).fetchall()
+            conn.rollback()
         
-        projects = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        mentions = []
+        for row in rows:
+            mention = dict(row)
+            mention['section_path'] = json.loads(mention['section_path']) if mention['section_path'] else []
+            mention['paragraph'] = unpack_text(mention['paragraph'])
+            mentions.append(mention)
         
-        return projects
+        return {'mentions': mentions, 'total': total, 'offset': offset, 'limit': limit}
     
-    def delete_project(self, project_id: str) -> bool:
-        """删除项目及所有相关文章"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def list_figures(self, project_id: str, mentions_keyword: Optional[bool] = None,
+                     offset: int = 0, limit: int = 50) -> Optional[Dict]:
+        """
+        分页查询项目中的图表（按文章相关性排序）
+        
+        Args:
+            project_id: 项目ID
+            mentions_keyword: True 只返回图注提到关键词的图表，False 只返回未提到的，None 表示全部
+        
+        Returns:
+            {'figures': [...], 'total': ..., 'offset': ..., 'limit': ...}，项目不存在时返回 None
+        """
+        conditions = ['a.project_id = ?', 'a.fulltext_format = ?']
+        params: List = [project_id, FULLTEXT_NORMALIZED]
+        if mentions_keyword is not None:
+            conditions.append('h.ordinal IS NOT NULL' if mentions_keyword else 'h.ordinal IS NULL')
+        where = ' AND '.join(conditions)
+        # 图表属于文档，图注是否提到关键词属于项目的文章行
+        source = '''
+            articles a
+            JOIN document_figures f ON f.doc_id = a.doc_id
+            LEFT JOIN article_figure_hits h ON h.article_id = a.id AND h.ordinal = f.ordinal
+        '''
+        
+        with self.connection() as conn:
+            conn.execute('BEGIN DEFERRED')
+            if not self._project_exists(conn, project_id):
+                conn.rollback()
+                return None
+            
+            total = conn.execute(f'''
+                SELECT COUNT(*) FROM {source}
+                WHERE {where}
+            ''', params).fetchone()[0]
+            rows = conn.execute(f'''
+                SELECT a.pmid, d.pmc_id, d.title, f.figure_id AS id, f.label, f.caption,
+                       h.ordinal IS NOT NULL AS mentions_keyword
+                FROM {source}
+                JOIN documents d ON d.doc_id = a.doc_id
+                WHERE {where}
+                ORDER BY a.relevance_score DESC, a.id, f.ordinal
+                LIMIT ? OFFSET ?
+            ''', (*params, limit, offset)).fetchall()
+            conn.rollback()
+        
+        figures = []
+        for row in rows:
+            figure = dict(row)
+            figure['mentions_keyword'] = bool(figure['mentions_keyword'])
+            figures.append(figure)
+        
+        return {'figures': figures, 'total': total, 'offset': offset, 'limit': limit}
+    
+    def get_mention_stats(self, project_id: str) -> Optional[Dict]:
+        """
+        项目的关键词提及和图表统计（全部在 SQLite 中聚合）
+        
+        Returns:
+            {
+                'sections': {章节类型: {'mentions': 提及数, 'articles': 文章数}},
+                'keywords': {别名: 提及数},
+                'figures': {'total', 'mentions_keyword', 'articles_with_keyword_figures'},
+                'unmigrated_articles': 尚未迁移（不计入统计）的文章数
+            }
+            项目不存在时返回 None
+        """
+        with self.connection() as conn:
+            conn.execute('BEGIN DEFERRED')
+            if not self._project_exists(conn, project_id):
+                conn.rollback()
+                return None
+            
+            section_rows = conn.execute('''
+                SELECT COALESCE(m.section_kind, 'other') AS kind,
+                       COUNT(*) AS mentions,
+                       COUNT(DISTINCT m.article_id) AS articles
+                FROM articles a
+                JOIN article_mentions m ON m.article_id = a.id
+                WHERE a.project_id = ?
+                GROUP BY kind
+            ''', (project_id,)).fetchall()
+            keyword_rows = conn.execute('''
+                SELECT m.keyword, COUNT(*) AS mentions
+                FROM articles a
+                JOIN article_mentions m ON m.article_id = a.id
+                WHERE a.project_id = ? AND m.keyword IS NOT NULL
+                GROUP BY m.keyword
+                ORDER BY mentions DESC
+            ''', (project_id,)).fetchall()
+            figure_row = conn.execute('''
+                SELECT COUNT(*) AS total,
+                       COUNT(h.ordinal) AS mentions_keyword,
+                       COUNT(DISTINCT h.article_id) AS articles_with_keyword_figures
+                FROM articles a
+                JOIN document_figures f ON f.doc_id = a.doc_id
+                LEFT JOIN article_figure_hits h ON h.article_id = a.id AND h.ordinal = f.ordinal
+                WHERE a.project_id = ? AND a.fulltext_format = ?
+            ''', (project_id, FULLTEXT_NORMALIZED)).fetchone()
+            unmigrated = conn.execute('''
+                SELECT COUNT(*) FROM articles
+                WHERE project_id = ? AND fulltext_format = ? AND fulltext_data IS NOT NULL
+            ''', (project_id, FULLTEXT_JSON)).fetchone()[0]
+            conn.rollback()
+        
+        return {
+            'sections': {
+                row['kind']: {'mentions': row['mentions'], 'articles': row['articles']}
+                for row in section_rows
+            },
+            'keywords': {row['keyword']: row['mentions'] for row in keyword_rows},
+            'figures': dict(figure_row),
+            'unmigrated_articles': unmigrated
+        }
+    
+    @staticmethod
+    def _project_exists(conn: sqlite3.Connection, project_id: str) -> bool:
+        return conn.execute(
+            'SELECT 1 FROM projects WHERE project_id = ?', (project_id,)
+        ).fetchone() is not None
+    
+    def migrate_fulltext_batch(self, batch_size: int = 200) -> int:
+        """
+        把一批旧格式（整段JSON）的全文分析结果拆分到独立表
+        
+        每批一个事务，可随时中断后重新运行。文档已有其他项目保存的章节和图表时保留原有内容。
+        
+        Returns:
+            本批迁移的文章数，0 表示已全部迁移
+        """
+        with self.transaction() as conn:
+            rows = conn.execute('''
+                SELECT id, doc_id, fulltext_data FROM articles
+                WHERE fulltext_format = ? AND fulltext_data IS NOT NULL
+                LIMIT ?
+            ''', (FULLTEXT_JSON, batch_size)).fetchall()
+            
+            items = []
+            updates = []
+            for row in rows:
+                fulltext = json.loads(unpack_text(row['fulltext_data'])) or None
+                items.append((row['id'], row['doc_id'], fulltext))
+                updates.append((
+                    self._fulltext_residual(fulltext),
+                    FULLTEXT_NORMALIZED if fulltext else FULLTEXT_JSON,
+                    (fulltext or {}).get('total_mentions', 0),
+                    fulltext_match_key(fulltext),
+                    row['id']
+                ))
+            
+            # 内容哈希基于完整的 fulltext 计算，迁移后仍然有效
+            self._write_fulltext(conn, items, keep_documents=True)
+            conn.executemany('''
+                UPDATE articles SET fulltext_data = ?, fulltext_format = ?, total_mentions = ?,
+                                    match_key = ?
+                WHERE id = ?
+            ''', updates)
+            self._index_documents(conn, [row['doc_id'] for row in rows])
+        
+        return len(rows)
+    
+    # 压缩存储的大文本列：(表, 列)
+    COMPRESSED_COLUMNS = (
+        ('document_sections', 'content'),
+        ('article_mentions', 'paragraph'),
+        ('articles', 'fulltext_data'),
+    )
+    
+    def recompress_text_batch(self, table: str, column: str, after_rowid: int = 0,
+                              batch_size: int = 500) -> tuple:
+        """
+        按当前压缩设置重写一批大文本列的值（每批一个事务，可随时中断后继续）
+        
+        已是目标格式的值不会重写；compression='none' 时把压缩的值还原为 TEXT。
+        
+        Args:
+            table, column: COMPRESSED_COLUMNS 中的列
+            after_rowid: 从该 rowid 之后开始
+            
+        Returns:
+            (本批最后一行的 rowid, 重写的行数)，rowid 为 None 表示该列已处理完
+        """
+        if (table, column) not in self.COMPRESSED_COLUMNS:
+            raise ValueError(f"不支持压缩的列: {table}.{column}")
+        
+        with self.transaction() as conn:
+            rows = conn.execute(f'''
+                SELECT rowid, {column} FROM {table}
+                WHERE rowid > ? AND {column} IS NOT NULL
+                ORDER BY rowid LIMIT ?
+            ''', (after_rowid, batch_size)).fetchall()
+            
+            updates = []
+            for rowid, value in rows:
+                packed = pack_text(unpack_text(value), self.compression)
+                if text_format(packed) != text_format(value):
+                    updates.append((packed, rowid))
+            conn.executemany(f'UPDATE {table} SET {column} = ? WHERE rowid = ?', updates)
+        
+        return (rows[-1][0] if rows else None), len(updates)
+    
+    def get_compression_stats(self) -> Dict[str, Dict]:
+        """
+        各大文本列的压缩情况
+        
+        Returns:
+            {'表.列': {'total': 非空值数, 'compressed': 已压缩数, 'stored_bytes': 占用字节数}}
+        """
+        stats = {}
+        with self.connection() as conn:
+            for table, column in self.COMPRESSED_COLUMNS:
+                row = conn.execute(f'''
+                    SELECT COUNT({column}) AS total,
+                           COALESCE(SUM(typeof({column}) = 'blob'), 0) AS compressed,
+                           COALESCE(SUM(length(CAST({column} AS BLOB))), 0) AS stored_bytes
+                    FROM {table}
+                ''').fetchone()
+                stats[f'{table}.{column}'] = dict(row)
+        
+        return stats
+    
+    def get_storage_stats(self) -> Dict:
+        """文章和全文分析结果的存储情况（迁移工具使用）"""
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT COALESCE(SUM(fulltext_format = ? AND fulltext_data IS NOT NULL), 0) AS json_articles,
+                       COALESCE(SUM(fulltext_format = ?), 0) AS normalized_articles
+                FROM articles
+            ''', (FULLTEXT_JSON, FULLTEXT_NORMALIZED)).fetchone()
+            stats = dict(row)
+            for table in ('documents', 'articles', 'document_sections', 'document_figures',
+                          'article_mentions', 'article_figure_hits'):
+                stats[table] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
         
-        # SQLite 会通过 ON DELETE CASCADE 自动删除相关文章
-        cursor.execute('DELETE FROM projects WHERE project_id = ?', (project_id,))
+        return stats
+    
+    def list_projects(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """
+        获取项目列表（按更新时间倒序）
+        """
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT * FROM projects 
+                ORDER BY updated_at DESC 
+                LIMIT ? OFFSET ?
+            ''', (limit, offset)).fetchall()
         
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        return [dict(row) for row in rows]
+    
+    def get_project_version(self, project_id: str) -> Optional[int]:
+        """项目的内容版本号（项目不存在时返回 None），用于条件请求"""
+        with self.connection() as conn:
+            row = conn.execute(
+                'SELECT version FROM projects WHERE project_id = ?', (project_id,)
+            ).fetchone()
+        return row['version'] if row else None
+    
+    def list_project_versions(self, limit: int = 50, offset: int = 0) -> List[tuple]:
+        """项目列表当前页的 (project_id, version)，排序与 list_projects 一致"""
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT project_id, version FROM projects
+                ORDER BY updated_at DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset)).fetchall()
+        return [tuple(row) for row in rows]
+    
+    def delete_project(self, project_id: str) -> bool:
+        """删除项目及所有相关文章"""
+        with self.transaction() as conn:
+            # 连接启用了 foreign_keys，SQLite 会通过 ON DELETE CASCADE 自动删除相关文章
+            cursor = conn.execute('DELETE FROM projects WHERE project_id = ?', (project_id,))
+            deleted = cursor.rowcount > 0
         
         if deleted:
             print(f"✅ 项目已删除: {project_id}")
         
         return deleted
     
+    def existing_pmids(self, project_id: str, pmids: List[str]) -> set:
+        """项目中已有的 PMID（pmids 的子集）"""
+        with self.connection() as conn:
+            return set(self._article_ids(conn, project_id, list(pmids)))
+    
+    def set_sync_watermark(self, project_id: str, watermark: str) -> bool:
+        """
+        记录增量更新的同步水位
+        
+        Args:
+            project_id: 项目ID
+            watermark: 本次检索开始的日期（YYYY-MM-DD），下次只检索此后发表或收录的文章
+        """
+        with self.transaction() as conn:
+            updated = conn.execute('''
+                UPDATE projects SET last_synced_at = ?, version = version + 1
+                WHERE project_id = ?
+            ''', (watermark, project_id)).rowcount > 0
+        
+        return updated
+    
     def update_project_metadata(self, project_id: str, name: str = None, 
                                 description: str = None) -> bool:
         """更新项目元数据"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         now = datetime.now().isoformat()
         
         updates = []
@@ -302,36 +1989,42 @@ class ProjectDatabase:
             params.append(description)
         
         if not updates:
-            conn.close()
             return False
         
         updates.append('updated_at = ?')
+        updates.append('version = version + 1')
         params.append(now)
         params.append(project_id)
         
         sql = f"UPDATE projects SET {', '.join(updates)} WHERE project_id = ?"
-        cursor.execute(sql, params)
-        
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            updated = conn.execute(sql, params).rowcount > 0
         
         return updated
     
     def get_project_stats(self, project_id: str) -> Optional[Dict]:
-        """获取项目统计信息"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM projects WHERE project_id = ?', (project_id,))
-        row = cursor.fetchone()
-        
-        conn.close()
+        """获取项目统计信息（含各处理状态的文章数和未达到重试次数上限的失败文章数）"""
+        with self.connection() as conn:
+            conn.execute('BEGIN DEFERRED')
+            row = conn.execute(
+                'SELECT * FROM projects WHERE project_id = ?', (project_id,)
+            ).fetchone()
+            if not row:
+                return None
+            
+            states = dict(conn.execute('''
+                SELECT state, COUNT(*) FROM articles WHERE project_id = ? GROUP BY state
+            ''', (project_id,)).fetchall())
+            retryable = conn.execute('''
+                SELECT COUNT(*) FROM articles
+                WHERE project_id = ? AND state = ? AND attempts < ?
+            ''', (project_id, processing_state.FAILED, processing_state.RETRY_MAX_ATTEMPTS)).fetchone()[0]
+            conn.rollback()
         
-        if row:
-            return dict(row)
-        return None
+        stats = dict(row)
+        stats['states'] = {state: states.get(state, 0) for state in processing_state.STATES}
+        stats['retryable'] = retryable
+        return stats
 
 
 # 使用示例
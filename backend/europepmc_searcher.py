@@ -2,20 +2,32 @@
 Europe PMC 全文搜索模块
 真正的全文搜索，不只是摘要 - 能找到方法部分使用数据集的文章
 """
-import requests
-from typing import List, Dict, Optional
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional
 from datetime import datetime, timedelta
+from http_client import get_client
+from keyword_matcher import KeywordMatcher
+from search_cache import SearchCache, get_default_search_cache
 
 class EuropePMCSearcher:
     """Europe PMC 全文搜索器"""
     
     BASE_URL = "https://www.ebi.ac.uk/europepmc/webservices/rest"
+    MAX_PAGE_SIZE = 1000  # Europe PMC 单页上限
     
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, cache: Optional[SearchCache] = None):
+        self.session = get_client()
+        self.cache = cache or get_default_search_cache()
+        self.hit_count: Optional[int] = None  # 最近一次搜索的总命中数
+        self.truncated = False  # 最近一次搜索是否因达到 max_results 而未取完
+        self.cache_info: Optional[Dict] = None  # 最近一次搜索的缓存信息（见 SearchCacheEntry.info）
+        self.error: Optional[str] = None  # 最近一次搜索中断的原因（翻页请求出错），完整取完时为 None
     
     def search_fulltext(self, keyword: str, years: int = 3, 
-                       journals: List[str] = None, page_size: int = 1000) -> List[Dict]:
+                       journals: List[str] = None, max_results: int = 1000,
+                       aliases: Optional[List[str]] = None,
+                       bypass_cache: bool = False, since: Optional[str] = None) -> List[Dict]:
         """
         在全文中搜索关键词（特别关注方法和结果章节）
         
@@ -23,90 +35,213 @@ class EuropePMCSearcher:
             keyword: 搜索关键词（如 DepMap）
             years: 搜索近几年
             journals: 期刊列表
-            page_size: 返回结果数量
+            max_results: 最多返回的结果数量（自动翻页）
+            aliases: 关键词别名（如 Cancer Dependency Map、Achilles），任一命中即可
+            bypass_cache: 不使用缓存的结果，重新搜索（结果仍会写入缓存）
+            since: 只搜索该日期（YYYY-MM-DD）及之后首次发表或被收录的文章，用于增量更新
             
         Returns:
             文章列表，包含全文匹配信息
         """
+        return list(self.iter_fulltext(keyword, years, journals, max_results, aliases,
+                                       bypass_cache=bypass_cache, since=since))
+    
+    def iter_fulltext(self, keyword: str, years: int = 3,
+                      journals: List[str] = None, max_results: int = 1000,
+                      aliases: Optional[List[str]] = None,
+                      page_size: int = MAX_PAGE_SIZE,
+                      bypass_cache: bool = False, since: Optional[str] = None) -> Iterator[Dict]:
+        """
+        逐篇产出全文搜索结果，沿 nextCursorMark 持续翻页
+        
+        解析当前页时，下一页已在后台线程中请求，调用方可以在搜索
+        结束前就开始处理已返回的文章。
+        相同查询的完整结果在有效期内直接从缓存产出，不再请求 Europe PMC。
+        
+        Args:
+            keyword: 搜索关键词
+            years: 搜索近几年
+            journals: 期刊列表
+            max_results: 最多获取的结果数量
+            aliases: 关键词别名
+            page_size: 每页数量（Europe PMC 上限 1000）
+            bypass_cache: 不使用缓存的结果，重新搜索（结果仍会写入缓存）
+            since: 只搜索该日期（YYYY-MM-DD）及之后首次发表或被收录的文章
+            
+        Yields:
+            解析后的文章；搜索出错时记录日志、设置 error 并停止翻页
+        """
+        matcher = KeywordMatcher.from_query(keyword, aliases)
+        query = self._build_query(matcher, years, journals, since)
+        self.error = None
+        print(f"Europe PMC 查询: {query}")
+        
+        cached = self._cached_results(query, keyword, max_results, bypass_cache)
+        if cached is not None:
+            yield from cached
+            return
+        
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+        self.hit_count = None
+        self.truncated = False
+        cursor = "*"
+        fetched = 0
+        page = 0
+        snapshots = []  # 产出时的文章JSON（调用方之后会修改文章）
+        
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="europepmc")
         try:
-            # 构建查询
-            query_parts = []
-            
-            # 1. 核心：在方法或结果章节中搜索（这是关键！）
-            # 同时搜索全文，确保不遗漏
-            section_query = f"(METHODS:{keyword} OR RESULTS:{keyword} OR {keyword})"
-            query_parts.append(section_query)
-            
-            # 2. 期刊筛选
-            if journals:
-                # Europe PMC 的期刊名称可能不完全匹配，使用宽松匹配
-                journal_conditions = []
-                for journal in journals:
-                    # 处理期刊名称
-                    if "Nature" in journal:
-                        journal_conditions.append(f'JOURNAL:"{journal}"')
-                    elif "Cancer" in journal:
-                        journal_conditions.append(f'JOURNAL:"{journal}"')
-                    elif "Cell" in journal:
-                        journal_conditions.append(f'JOURNAL:"{journal}"')
-                    elif "Science" in journal:
-                        journal_conditions.append(f'JOURNAL:"{journal}"')
+            future = executor.submit(self._fetch_page, query, cursor, min(page_size, max_results))
+            while future is not None:
+                try:
+                    data = future.result()
+                except Exception as e:
+                    print(f"Europe PMC 搜索错误: {e}")
+                    self.error = str(e)
+                    return
                 
-                if journal_conditions:
-                    journal_query = " OR ".join(journal_conditions)
-                    query_parts.append(f"({journal_query})")
-            
-            # 3. 时间范围
-            end_year = datetime.now().year
-            start_year = end_year - years
-            query_parts.append(f"PUB_YEAR:[{start_year} TO {end_year}]")
-            
-            # 4. 只要开放获取（必须，否则无法获取全文）
-            query_parts.append("OPEN_ACCESS:Y")
-            
-            # 5. 只要研究文章（排除评论、社论等）
-            query_parts.append('(SRC:MED OR SRC:PMC)')
-            
-            # 组合查询
-            query = " AND ".join(query_parts)
-            
-            print(f"Europe PMC 查询: {query}")
-            
-            # 执行搜索
-            url = f"{self.BASE_URL}/search"
-            params = {
-                "query": query,
-                "resultType": "core",  # 返回完整信息
-                "pageSize": page_size,
-                "format": "json",
-                "synonym": "true",  # 包含同义词
-                "cursorMark": "*"  # 用于分页
-            }
-            
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # 解析结果
-            articles = []
-            results = data.get("resultList", {}).get("result", [])
-            
-            print(f"Europe PMC 返回 {len(results)} 篇文章")
-            
-            for result in results:
-                article = self._parse_result(result, keyword)
-                if article:
-                    articles.append(article)
-            
-            return articles
-            
+                page += 1
+                results = data.get("resultList", {}).get("result", [])
+                if self.hit_count is None:
+                    self.hit_count = data.get("hitCount")
+                fetched += len(results)
+                print(f"Europe PMC 第 {page} 页返回 {len(results)} 篇文章"
+                      f"（累计 {fetched}/{self.hit_count}）")
+                
+                # 先发出下一页请求，再解析当前页
+                next_cursor = data.get("nextCursorMark")
+                future = None
+                if (results and next_cursor and next_cursor != cursor
+                        and fetched < max_results
+                        and (self.hit_count is None or fetched < self.hit_count)):
+                    cursor = next_cursor
+                    future = executor.submit(
+                        self._fetch_page, query, cursor, min(page_size, max_results - fetched)
+                    )
+                elif fetched >= max_results and (self.hit_count or 0) > fetched:
+                    self.truncated = True
+                
+                for result in results:
+                    article = self._parse_result(result, keyword, matcher)
+                    if article:
+                        snapshots.append(json.dumps(article, ensure_ascii=False))
+                        yield article
+            
+            # 只缓存完整取完的搜索（出错或调用方提前停止时不缓存）
+            self._store_results(query, max_results, snapshots)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _cached_results(self, query: str, keyword: str, max_results: int,
+                        bypass_cache: bool) -> Optional[List[Dict]]:
+        """
+        读取缓存的搜索结果，并设置 hit_count / truncated / cache_info
+        
+        Returns:
+            缓存的文章列表（keyword 字段改为本次输入的关键词）；未命中或跳过缓存时为 None
+        """
+        self.cache_info = {"hit": False, "bypassed": bypass_cache}
+        if bypass_cache:
+            return None
+        
+        entry = self.cache.get(query, max_results)
+        if entry is None:
+            return None
+        
+        self.hit_count = entry.hit_count
+        self.truncated = entry.truncated
+        self.cache_info = entry.info()
+        articles = entry.articles()
+        for article in articles:
+            article["keyword"] = keyword
+        print(f"⚡ 使用缓存的搜索结果: {len(articles)} 篇文章"
+              f"（{self.cache_info['age_seconds']} 秒前，{entry.tier}）")
+        return articles
+    
+    def _store_results(self, query: str, max_results: int, snapshots: List[str]):
+        """缓存一次完整的搜索结果（缓存出错不影响搜索）"""
+        try:
+            self.cache.put(query, max_results, snapshots, self.hit_count, self.truncated)
         except Exception as e:
-            print(f"Europe PMC 搜索错误: {e}")
-            return []
+            print(f"⚠️ 保存搜索缓存失败: {e}")
+    
+    def _build_query(self, matcher: KeywordMatcher, years: int,
+                     journals: Optional[List[str]], since: Optional[str] = None) -> str:
+        """构建 Europe PMC 查询语句（since 为 YYYY-MM-DD 时只查该日期之后首次发表或收录的文章）"""
+        query_parts = []
+        
+        # 1. 核心：在方法或结果章节中搜索（这是关键！）
+        # 同时搜索全文，确保不遗漏；多个别名之间为 OR
+        section_queries = []
+        for term in matcher.keywords:
+            term = f'"{term}"' if " " in term else term
+            section_queries.append(f"(METHODS:{term} OR RESULTS:{term} OR {term})")
+        section_query = " OR ".join(section_queries)
+        if len(section_queries) > 1:
+            section_query = f"({section_query})"
+        query_parts.append(section_query)
+        
+        # 2. 期刊筛选
+        if journals:
+            # Europe PMC 的期刊名称可能不完全匹配，使用宽松匹配
+            journal_conditions = []
+            for journal in journals:
+                # 处理期刊名称
+                if "Nature" in journal:
+                    journal_conditions.append(f'JOURNAL:"{journal}"')
+                elif "Cancer" in journal:
+                    journal_conditions.append(f'JOURNAL:"{journal}"')
+                elif "Cell" in journal:
+                    journal_conditions.append(f'JOURNAL:"{journal}"')
+                elif "Science" in journal:
+                    journal_conditions.append(f'JOURNAL:"{journal}"')
+            
+            if journal_conditions:
+                journal_query = " OR ".join(journal_conditions)
+                query_parts.append(f"({journal_query})")
+        
+        # 3. 时间范围
+        end_year = datetime.now().year
+        start_year = end_year - years
+        query_parts.append(f"PUB_YEAR:[{start_year} TO {end_year}]")
+        
+        # 3.1 增量更新：首次发表日期或首次收录日期在水位之后（收录晚于发表的文章也不会漏掉）
+        if since:
+            today = datetime.now().strftime("%Y-%m-%d")
+            query_parts.append(f"(FIRST_PDATE:[{since} TO {today}] OR FIRST_IDATE:[{since} TO {today}])")
+        
+        # 4. 只要开放获取（必须，否则无法获取全文）
+        query_parts.append("OPEN_ACCESS:Y")
+        
+        # 5. 只要研究文章（排除评论、社论等）
+        query_parts.append('(SRC:MED OR SRC:PMC)')
+        
+        # 组合查询
+        return " AND ".join(query_parts)
+    
+    def _fetch_page(self, query: str, cursor: str, page_size: int) -> Dict:
+        """请求一页搜索结果"""
+        url = f"{self.BASE_URL}/search"
+        response = self.session.get(url, params=self._page_params(query, cursor, page_size), timeout=30)
+        response.raise_for_status()
+        return response.json()
+    
+    @staticmethod
+    def _page_params(query: str, cursor: str, page_size: int) -> Dict:
+        """搜索请求参数"""
+        return {
+            "query": query,
+            "resultType": "core",  # 返回完整信息
+            "pageSize": page_size,
+            "format": "json",
+            "synonym": "true",  # 包含同义词
+            "cursorMark": cursor  # 用于分页
+        }
     
-    def _parse_result(self, result: Dict, keyword: str) -> Optional[Dict]:
+    def _parse_result(self, result: Dict, keyword: str,
+                      matcher: Optional[KeywordMatcher] = None) -> Optional[Dict]:
         """解析搜索结果"""
+        matcher = matcher or KeywordMatcher.coerce(keyword)
         try:
             # 提取基本信息
             pmid = result.get("pmid", "")
@@ -163,7 +298,7 @@ class EuropePMCSearcher:
                 snippets = []
             
             for snippet in snippets[:10]:  # 限制数量
-                if keyword.lower() in snippet.lower():
+                if matcher.contains(snippet):
                     article["fulltext_snippets"].append({
                         "text": snippet,
                         "has_keyword": True
@@ -243,7 +378,7 @@ if __name__ == "__main__":
         keyword=keyword,
         years=3,
         journals=journals,
-        page_size=50
+        max_results=50
     )
     
     print(f"\n{'=' * 60}")
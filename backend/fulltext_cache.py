@@ -0,0 +1,263 @@
+"""
+PMC 全文XML本地缓存模块
+按PMC ID寻址、gzip压缩存储、按总大小做LRU淘汰，支持离线模式
+同时保存与关键词无关的结构化文档（章节文本、图注），换关键词时无需重新解析XML
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+# 缓存配置（可通过环境变量覆盖）
+CACHE_DIR = os.environ.get("FIGURESCOUT_CACHE_DIR", "fulltext_cache")
+CACHE_MAX_MB = int(os.environ.get("FIGURESCOUT_CACHE_MAX_MB", "1024"))
+CACHE_MAX_AGE_DAYS = float(os.environ.get("FIGURESCOUT_CACHE_MAX_AGE_DAYS", "30"))
+OFFLINE = os.environ.get("FIGURESCOUT_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+class CacheEntry:
+    """一条缓存记录"""
+
+    def __init__(self, pmc_id: str, data: bytes, etag: Optional[str],
+                 last_modified: Optional[str], fetched_at: float):
+        self.pmc_id = pmc_id
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    @property
+    def text(self) -> str:
+        return self.data.decode("utf-8")
+
+    def is_fresh(self, max_age_seconds: float) -> bool:
+        return time.time() - self.fetched_at < max_age_seconds
+
+    def validators(self) -> Dict[str, str]:
+        """条件请求头（上游支持时用于重新验证）"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class FulltextCache:
+    """PMC 全文XML磁盘缓存"""
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_mb: int = CACHE_MAX_MB,
+                 max_age_days: float = CACHE_MAX_AGE_DAYS, offline: bool = OFFLINE):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_mb: 压缩后总大小上限（MB），超出后淘汰最久未访问的条目
+            max_age_days: 条目在此天数内直接使用，超过后向上游重新验证
+            offline: 离线模式，只使用缓存，不发起网络请求
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.max_age_seconds = max_age_days * 86400
+        self.offline = offline
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                pmc_id TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS documents (
+                pmc_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                data BLOB NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+        row = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+        self._total_bytes = row[0]
+
+    def _path_for(self, pmc_id: str) -> str:
+        """按PMC ID的哈希分目录存放，避免单目录文件过多"""
+        digest = hashlib.sha256(pmc_id.encode("utf-8")).hexdigest()
+        return os.path.join(digest[:2], f"{digest}.xml.gz")
+
+    def get(self, pmc_id: str) -> Optional[CacheEntry]:
+        """读取缓存条目（同时更新LRU访问时间），不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT path, etag, last_modified, fetched_at FROM entries WHERE pmc_id = ?',
+                (pmc_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            path, etag, last_modified, fetched_at = row
+            try:
+                with gzip.open(os.path.join(self.cache_dir, path), "rb") as f:
+                    data = f.read()
+            except (OSError, EOFError):
+                # 文件丢失或损坏，删除索引记录
+                self._delete(pmc_id)
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                'UPDATE entries SET last_access = ? WHERE pmc_id = ?',
+                (time.time(), pmc_id)
+            )
+            self._conn.commit()
+
+        return CacheEntry(pmc_id, data, etag, last_modified, fetched_at)
+
+    def contains(self, pmc_id: str) -> bool:
+        """是否缓存了该文章的XML（不论是否过期，不读取文件）"""
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM entries WHERE pmc_id = ?', (pmc_id,)).fetchone()
+        return row is not None
+
+    def get_fresh(self, pmc_id: str) -> Optional[CacheEntry]:
+        """读取可直接使用的条目：离线模式下任何条目都可用，否则需在有效期内"""
+        entry = self.get(pmc_id)
+        if entry and (self.offline or entry.is_fresh(self.max_age_seconds)):
+            return entry
+        return None
+
+    def put(self, pmc_id: str, data: bytes, etag: Optional[str] = None,
+            last_modified: Optional[str] = None):
+        """写入（或覆盖）缓存条目，必要时淘汰旧条目"""
+        path = self._path_for(pmc_id)
+        full_path = os.path.join(self.cache_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        # 先写临时文件再替换，避免并发读到半个文件
+        tmp_path = f"{full_path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(data)
+        os.replace(tmp_path, full_path)
+        size = os.path.getsize(full_path)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute('SELECT size FROM entries WHERE pmc_id = ?', (pmc_id,)).fetchone()
+            if row:
+                self._total_bytes -= row[0]
+
+            # XML 更新后，旧的结构化文档失效
+            self._conn.execute('DELETE FROM documents WHERE pmc_id = ?', (pmc_id,))
+            self._conn.execute('''
+                INSERT OR REPLACE INTO entries
+                (pmc_id, path, size, etag, last_modified, fetched_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (pmc_id, path, size, etag, last_modified, now, now))
+            self._total_bytes += size
+
+            self._evict()
+            self._conn.commit()
+
+    def get_document(self, pmc_id: str, version: int) -> Optional[Dict]:
+        """读取结构化文档；解析器版本不一致或对应XML已过期时视为不存在"""
+        with self._lock:
+            row = self._conn.execute('''
+                SELECT d.data, e.fetched_at FROM documents d
+                JOIN entries e ON e.pmc_id = d.pmc_id
+                WHERE d.pmc_id = ? AND d.version = ?
+            ''', (pmc_id, version)).fetchone()
+            if row is None:
+                return None
+            if not self.offline and time.time() - row[1] >= self.max_age_seconds:
+                return None
+            self._conn.execute(
+                'UPDATE entries SET last_access = ? WHERE pmc_id = ?',
+                (time.time(), pmc_id)
+            )
+            self._conn.commit()
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put_document(self, pmc_id: str, version: int, document: Dict):
+        """保存结构化文档（随对应的XML条目一起淘汰）"""
+        data = zlib.compress(json.dumps(document, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO documents (pmc_id, version, data) VALUES (?, ?, ?)',
+                (pmc_id, version, data)
+            )
+            self._conn.commit()
+
+    def touch(self, pmc_id: str):
+        """上游确认内容未变化（304）后刷新有效期"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE entries SET fetched_at = ?, last_access = ? WHERE pmc_id = ?',
+                (now, now, pmc_id)
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        """按最久未访问顺序淘汰，直到总大小回到上限以内（调用方持有锁）"""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        rows = self._conn.execute('SELECT pmc_id FROM entries ORDER BY last_access ASC').fetchall()
+        evicted = 0
+        for (pmc_id,) in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._delete(pmc_id)
+            evicted += 1
+
+        if evicted:
+            print(f"🧹 全文缓存淘汰 {evicted} 篇，当前 {self._total_bytes / 1024 / 1024:.1f} MB")
+
+    def _delete(self, pmc_id: str):
+        row = self._conn.execute('SELECT path, size FROM entries WHERE pmc_id = ?', (pmc_id,)).fetchone()
+        if row is None:
+            return
+        path, size = row
+        try:
+            os.remove(os.path.join(self.cache_dir, path))
+        except OSError:
+            pass
+        self._conn.execute('DELETE FROM entries WHERE pmc_id = ?', (pmc_id,))
+        self._conn.execute('DELETE FROM documents WHERE pmc_id = ?', (pmc_id,))
+        self._total_bytes -= size
+
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return {
+            "entries": count,
+            "size_mb": round(self._total_bytes / 1024 / 1024, 2),
+            "max_mb": round(self.max_bytes / 1024 / 1024, 2),
+            "offline": self.offline
+        }
+
+
+_default_cache: Optional[FulltextCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> FulltextCache:
+    """进程内共享的默认缓存实例"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FulltextCache()
+        return _default_cache
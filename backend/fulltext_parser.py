@@ -0,0 +1,358 @@
+"""
+PMC 全文XML解析模块
+把全文XML解析为与关键词无关的结构化文档（章节、正文片段、图注），并在结构化文档上查找关键词。
+只做纯计算，不涉及网络和缓存，可在解析进程池（parse_pool）的子进程中使用。
+"""
+from typing import Dict, List, Optional, Tuple, Union
+
+from keyword_matcher import KeywordMatcher
+import xml_parser
+
+class FulltextParser:
+    """全文XML解析和关键词分析"""
+    
+    DOCUMENT_VERSION = 2  # 结构化文档格式版本，解析逻辑变化时递增以使缓存失效
+    
+    def document_from_bytes(self, pmc_id: str, xml_bytes: bytes) -> Optional[Dict]:
+        """
+        解析XML字节并构建结构化文档
+        
+        Args:
+            pmc_id: PMC ID（用于错误日志）
+            xml_bytes: 全文XML
+            
+        Returns:
+            build_document 的结果；解析失败或没有正文时返回 None
+        """
+        try:
+            root = xml_parser.fromstring(xml_bytes)
+        except Exception as e:
+            print(f"解析全文XML错误 ({pmc_id}): {e}")
+            return None
+        try:
+            return self.build_document(root)
+        except Exception as e:
+            print(f"解析全文XML错误 ({pmc_id}): {e}")
+            return None
+    
+    def parse_fulltext(self, xml_content: Union[bytes, str],
+                       keyword: Union[str, KeywordMatcher]) -> Optional[Dict]:
+        """
+        解析PMC全文XML，提取章节和关键词信息
+        
+        Args:
+            xml_content: XML原始字节（也兼容文本）
+            keyword: 搜索关键词
+            
+        Returns:
+            包含全文信息的字典
+        """
+        try:
+            root = xml_parser.fromstring(xml_content)
+        except Exception as e:
+            print(f"解析全文XML错误: {e}")
+            return None
+        
+        return self.parse_article(root, keyword)
+    
+    def parse_article(self, root, keyword: Union[str, KeywordMatcher]) -> Optional[Dict]:
+        """
+        从已解析的 <article>（或包含它的根元素）中提取章节和关键词信息
+        
+        Args:
+            root: XML元素
+            keyword: 搜索关键词
+            
+        Returns:
+            包含全文信息的字典
+        """
+        try:
+            document = self.build_document(root)
+            if document is None:
+                return None
+            return self.analyze_document(document, keyword)
+            
+        except Exception as e:
+            print(f"解析全文XML错误: {e}")
+            return None
+    
+    def build_document(self, root) -> Optional[Dict]:
+        """
+        构建与关键词无关的结构化文档：章节划分、章节文本、图表标签和图注
+        
+        Args:
+            root: XML元素
+            
+        Returns:
+            {
+                "version": 格式版本,
+                "sections": [{type, title, path, parent, start, end}],
+                "segments": [{section, text}],  # 按文档顺序、每段文本只出现一次
+                "methods" / "results" / "discussion": 对应章节（含子章节）的文本,
+                "figures": [{id, label, caption}]
+            }
+            没有正文时返回 None
+        """
+        # 提取文章正文
+        body = root.find(".//body")
+        if body is None:
+            return None
+        
+        sections, segments = self._walk_sections(body)
+        
+        document = {
+            "version": self.DOCUMENT_VERSION,
+            "sections": sections,
+            "segments": segments,
+            "methods": None,
+            "results": None,
+            "discussion": None,
+            "figures": self._extract_figures(root)
+        }
+        
+        # 根据类型或标题识别章节；子章节不覆盖已识别的外层章节
+        categories: Dict[int, str] = {}
+        for idx, section in enumerate(sections):
+            category = self._classify_section(section["type"], section["title"].lower())
+            if category is None:
+                continue
+            categories[idx] = category
+            
+            parent = section["parent"]
+            while parent >= 0 and categories.get(parent) != category:
+                parent = sections[parent]["parent"]
+            if parent < 0 and document[category] is None:
+                document[category] = " ".join(
+                    segment["text"] for segment in segments[section["start"]:section["end"]]
+                )
+        
+        return document
+    
+    def _walk_sections(self, body) -> Tuple[List[Dict], List[Dict]]:
+        """
+        单次遍历正文，维护章节栈，把每个文本节点恰好输出一次
+        
+        同一章节内连续的文本合并为一个片段；每个章节记录其子树覆盖的片段区间
+        [start, end)，因此取章节全文无需再次遍历子章节。
+        
+        Returns:
+            (sections, segments)；不属于任何章节的正文文本，其片段 section 为 -1
+        """
+        sections: List[Dict] = []
+        segments: List[Dict] = []
+        buffer: List[str] = []
+        section_stack = [-1]
+        
+        def emit(text):
+            if text and text.strip():
+                buffer.append(text.strip())
+        
+        def flush():
+            if buffer:
+                segments.append({"section": section_stack[-1], "text": " ".join(buffer)})
+                buffer.clear()
+        
+        def enter(elem):
+            if elem.tag == "sec":
+                flush()
+                parent = section_stack[-1]
+                title_elem = elem.find("title")
+                title = self._extract_text(title_elem) if title_elem is not None else ""
+                sections.append({
+                    "type": elem.get("sec-type", ""),
+                    "title": title,
+                    "path": (sections[parent]["path"] if parent >= 0 else []) + [title],
+                    "parent": parent,
+                    "start": len(segments),
+                    "end": len(segments)
+                })
+                section_stack.append(len(sections) - 1)
+            emit(elem.text)
+        
+        def leave(elem):
+            if elem.tag == "sec":
+                flush()
+                sections[section_stack.pop()]["end"] = len(segments)
+            emit(elem.tail)
+        
+        # 显式栈代替递归，避免深层嵌套触发递归上限
+        emit(body.text)
+        stack = [(body, iter(body))]
+        while stack:
+            elem, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if stack:
+                    leave(elem)
+                continue
+            if not isinstance(child.tag, str):
+                # 注释、处理指令等只保留尾部文本
+                emit(child.tail)
+                continue
+            enter(child)
+            stack.append((child, iter(child)))
+        flush()
+        
+        return sections, segments
+    
+    @staticmethod
+    def _classify_section(section_type: str, section_title: str) -> Optional[str]:
+        if "method" in section_type or "method" in section_title:
+            return "methods"
+        if "result" in section_type or "result" in section_title:
+            return "results"
+        if "discussion" in section_type or "discuss" in section_title or "conclusion" in section_title:
+            return "discussion"
+        return None
+    
+    def analyze_document(self, document: Dict, keyword: Union[str, KeywordMatcher]) -> Dict:
+        """
+        在结构化文档上查找关键词（不需要XML，可对同一文档反复使用不同关键词）
+        
+        Args:
+            document: build_document 返回的结构化文档
+            keyword: 搜索关键词，或包含别名的 KeywordMatcher
+            
+        Returns:
+            包含全文信息的字典
+        """
+        matcher = KeywordMatcher.coerce(keyword)
+        sections = document["sections"]
+        fulltext_info = {
+            "methods": document["methods"],
+            "results": document["results"],
+            "discussion": document["discussion"],
+            "keyword_mentions": [],
+            "total_mentions": 0,
+            "figures": [],
+            "keywords": list(matcher.keywords)  # 本次分析使用的关键词及别名
+        }
+        
+        # 每个文本片段只扫描一次，嵌套章节不会重复计数
+        for segment in document["segments"]:
+            if segment["section"] >= 0:
+                section = sections[segment["section"]]
+                section_label = section["title"].lower() or section["type"]
+                section_path = section["path"]
+            else:
+                section_label = ""
+                section_path = []
+            
+            mentions = self._find_keyword_mentions(segment["text"], matcher, section_label)
+            for mention in mentions:
+                mention["section_path"] = section_path
+            fulltext_info["keyword_mentions"].extend(mentions)
+        
+        # 图注中是否包含关键词（任一别名）
+        fulltext_info["figures"] = [
+            {
+                "id": figure["id"],
+                "label": figure["label"],
+                "caption": figure["caption"][:1000],  # 限制长度
+                "mentions_keyword": matcher.contains(figure["caption"])
+            }
+            for figure in document["figures"]
+        ]
+        
+        # 统计总提及次数
+        fulltext_info["total_mentions"] = len(fulltext_info["keyword_mentions"])
+        
+        return fulltext_info
+    
+    def _extract_text(self, element) -> str:
+        """提取元素的所有文本内容"""
+        text_parts = []
+        
+        for text in element.itertext():
+            if text and text.strip():
+                text_parts.append(text.strip())
+        
+        return " ".join(text_parts)
+    
+    def _find_keyword_mentions(self, text: str, keyword: Union[str, KeywordMatcher],
+                               section: str) -> List[Dict]:
+        """
+        在文本中查找关键词并提取上下文
+        
+        Args:
+            text: 文本内容
+            keyword: 关键词，或包含别名的 KeywordMatcher
+            section: 章节名称
+            
+        Returns:
+            包含提及信息的列表（keyword 字段为实际命中的别名）
+        """
+        mentions = []
+        
+        # 一次扫描找出所有别名的匹配位置
+        for match in KeywordMatcher.coerce(keyword).find_all(text):
+            pos = match.start
+            
+            # 提取上下文 (前后200字符)
+            start = max(0, pos - 200)
+            end = min(len(text), match.end + 200)
+            context = text[start:end].strip()
+            
+            # 提取完整句子或段落
+            sentence_end = text.rfind(". ", 0, pos)
+            paragraph_start = sentence_end + 2 if sentence_end != -1 else 0
+            paragraph_end = text.find(". ", match.end)
+            if paragraph_end == -1:
+                paragraph_end = len(text)
+            else:
+                paragraph_end += 1
+            
+            paragraph = text[paragraph_start:paragraph_end].strip()
+            
+            mentions.append({
+                "section": section,
+                "context": context,
+                "paragraph": paragraph[:500],  # 限制长度
+                "position": pos,
+                "keyword": match.keyword
+            })
+        
+        return mentions
+    
+    def _extract_figures(self, root) -> List[Dict]:
+        """
+        提取图表信息（完整图注，关键词匹配在 analyze_document 中进行）
+        
+        Args:
+            root: XML根元素
+            
+        Returns:
+            图表信息列表
+        """
+        figures = []
+        
+        # 查找所有图表
+        fig_elements = root.findall(".//fig")
+        
+        for fig in fig_elements:
+            fig_id = fig.get("id", "")
+            label_elem = fig.find(".//label")
+            caption_elem = fig.find(".//caption")
+            
+            label = label_elem.text if label_elem is not None and label_elem.text else ""
+            caption_text = self._extract_text(caption_elem) if caption_elem is not None else ""
+            
+            if caption_text:  # 只添加有图注的图表
+                figures.append({
+                    "id": fig_id,
+                    "label": label,
+                    "caption": caption_text
+                })
+        
+        return figures
+    
+    def analyze_safely(self, document: Optional[Dict], keyword: Union[str, KeywordMatcher]) -> Optional[Dict]:
+        """analyze_document 的容错版本：文档为空或分析出错时返回 None"""
+        if document is None:
+            return None
+        try:
+            return self.analyze_document(document, keyword)
+        except Exception as e:
+            print(f"分析全文错误: {e}")
+            return None
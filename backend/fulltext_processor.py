@@ -0,0 +1,347 @@
+"""
+全文并发处理模块
+为 /api/search、/api/continue-fulltext、/api/retry-failed 提供共享的全文处理引擎：
+已安装 httpx 时在后台事件循环中并发获取（async_fetcher），否则使用有界线程池
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import async_fetcher
+import processing_state
+from keyword_matcher import KeywordMatcher
+from pmc_fetcher import PMCFetcher
+
+# 并发配置（可通过环境变量覆盖）；每个上游主机的并发数和限速由 http_client 控制
+MAX_WORKERS = int(os.environ.get("FIGURESCOUT_FULLTEXT_WORKERS", "6"))
+
+# 获取方式：async（事件循环，需要 httpx）或 threads（线程池）；默认在已安装 httpx 时使用 async
+FETCH_MODE = os.environ.get(
+    "FIGURESCOUT_FETCH_MODE", "async" if async_fetcher.AVAILABLE else "threads"
+).lower()
+
+# 批量解析未覆盖到的文章标记（与“确认没有PMC ID”的 None 区分）
+MISSING = object()
+
+
+class FulltextProcessor:
+    """全文处理引擎（事件循环或有界线程池）"""
+
+    def __init__(self, max_workers: int = MAX_WORKERS,
+                 known_fulltext: Optional[Callable[[List[str], str], Dict[str, Dict]]] = None,
+                 fetch_mode: str = FETCH_MODE, fetcher: Optional[PMCFetcher] = None):
+        """
+        Args:
+            max_workers: 线程池模式下同时处理的文章数上限
+            known_fulltext: 查询已保存全文分析结果的函数 (PMID列表, 关键词签名) -> {pmid: 全文结果}，
+                命中的文章直接复用，不再下载和解析
+            fetch_mode: "async" 在后台事件循环中并发获取，"threads" 使用线程池
+            fetcher: 使用的 PMCFetcher（默认使用共享缓存的新实例）
+        """
+        self.max_workers = max(1, max_workers)
+        self.known_fulltext = known_fulltext
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="fulltext"
+        )
+        # 所有工作线程共用一个 fetcher：请求经共享的 http_client 按主机限并发和限速。
+        # 先于线程池和事件循环线程创建：启用解析进程池时 fetcher 会在此 fork 出解析子进程
+        self._fetcher = fetcher or PMCFetcher()
+        # 等待全文XML的文章：PMC ID → [(文章, on_xml_fetched)]，XML写入缓存时推进到 xml_fetched
+        self._awaiting_xml: Dict[str, List[Tuple[Dict, Optional[Callable[[Dict], None]]]]] = {}
+        self._awaiting_lock = threading.Lock()
+        self._fetcher.xml_listeners.append(self._xml_cached)
+
+        # 异步模式：网络请求全部在一个事件循环中进行，同时进行的请求数只受上游限速约束
+        self._async_fetcher = None
+        self._bridge = None
+        if fetch_mode == "async":
+            if async_fetcher.AVAILABLE:
+                self._async_fetcher = async_fetcher.AsyncPMCFetcher(self._fetcher)
+                self._bridge = async_fetcher.get_bridge()
+            else:
+                print("⚠️ 未安装 httpx，全文获取使用线程池")
+
+    def _get_fetcher(self) -> PMCFetcher:
+        return self._fetcher
+
+    def _spawn(self, method: str, *args) -> Future:
+        """
+        在后台执行 fetcher 的方法：异步模式下在事件循环中运行 AsyncPMCFetcher 的同名协程，
+        否则在线程池中运行 PMCFetcher 的方法
+
+        Returns:
+            结果的 Future（异步模式下完成回调在事件循环线程中执行）
+        """
+        if self._async_fetcher is not None:
+            return self._bridge.submit(getattr(self._async_fetcher, method)(*args))
+        return self._executor.submit(getattr(self._get_fetcher(), method), *args)
+
+    def process(self, articles: List[Dict], keyword: Union[str, KeywordMatcher],
+                record_errors: bool = False, label: str = "") -> "OrderedDict[str, Dict]":
+        """
+        并发处理一批文章的全文（文章字典会被原地更新）
+
+        Args:
+            articles: 待处理的文章列表
+            keyword: 搜索关键词，或包含别名的 KeywordMatcher（整批文章共用）
+            record_errors: 是否在文章中记录 fulltext_error（重试接口使用）
+            label: 成功日志的前缀说明
+
+        Returns:
+            按输入顺序排列、以PMID为键的处理结果
+            {pmid: {"status", "mentions", "error", "article"}}
+        """
+        total = len(articles)
+        futures = self.submit(articles, keyword, record_errors)
+
+        results = OrderedDict()
+        for idx, (article, future) in enumerate(zip(articles, futures)):
+            outcome = future.result()
+            self._log_outcome(idx + 1, total, outcome, label)
+            results[article.get('pmid') or article.get('pmc_id')] = outcome
+
+        return results
+
+    def iter_process(self, articles: List[Dict], keyword: Union[str, KeywordMatcher],
+                     record_errors: bool = False, label: str = "") -> Iterator[Tuple[int, Dict]]:
+        """
+        与 process 相同，但按完成顺序逐篇产出结果（用于流式接口）
+
+        Yields:
+            (文章在输入列表中的下标, 处理结果)
+        """
+        futures = self.submit(articles, keyword, record_errors)
+        yield from self.iter_completed(futures, label)
+
+    def iter_completed(self, futures: List[Future], label: str = "") -> Iterator[Tuple[int, Dict]]:
+        """按完成顺序产出 submit 返回的结果：(下标, 处理结果)"""
+        index_of = {future: idx for idx, future in enumerate(futures)}
+        for done, future in enumerate(as_completed(futures), 1):
+            outcome = future.result()
+            self._log_outcome(done, len(futures), outcome, label)
+            yield index_of[future], outcome
+
+    def submit(self, articles: List[Dict], keyword: Union[str, KeywordMatcher],
+               record_errors: bool = False,
+               on_xml_fetched: Optional[Callable[[Dict], None]] = None) -> List[Future]:
+        """
+        提交一批文章，立即返回每篇文章对应的 Future（结果为处理结果字典）
+
+        文章在后台线程中被原地更新；Future 完成后该文章不会再被修改。
+        失败过的文章从已完成的阶段继续（见 processing_state）：已知PMC ID的不再查询，
+        XML已下载到本地缓存的直接解析。返回前已解析到的PMC ID会写入文章（状态 pmcid_resolved），
+        调用方可以立即保存，中断后不必重新查询。
+        全文XML写入本地缓存后、解析之前文章推进到 xml_fetched，并调用 on_xml_fetched(文章)
+        （在写缓存的线程中执行），调用方可以保存该状态，中断后只需重新解析。
+        """
+        keyword = KeywordMatcher.coerce(keyword)
+        known = self._find_known(articles, keyword)
+        cache = self._get_fetcher().cache
+        reparse = {
+            idx for idx, article in enumerate(articles)
+            if article.get('pmid') not in known and article.get('pmc_id')
+            and processing_state.resume_stage(article) == processing_state.XML_FETCHED
+            and cache.contains(article['pmc_id'])
+        }
+        pending = [
+            article for idx, article in enumerate(articles)
+            if article.get('pmid') not in known and idx not in reparse
+        ]
+        resolved = self.resolve_pmc_ids(pending) if pending else {}
+        pmc_ids = [
+            resolved.get(article.get('pmid'), article.get('pmc_id') or MISSING)
+            for article in articles
+        ]
+        # 先登记等待XML的文章，再发出请求（XML写入缓存时由 _xml_cached 推进到 xml_fetched）
+        with self._awaiting_lock:
+            for idx, (article, pmc_id) in enumerate(zip(articles, pmc_ids)):
+                if isinstance(pmc_id, str) and article.get('pmid') not in known and idx not in reparse:
+                    article['pmc_id'] = pmc_id
+                    processing_state.advance(article, processing_state.PMCID_RESOLVED)
+                    self._awaiting_xml.setdefault(pmc_id, []).append((article, on_xml_fetched))
+
+        # 已知PMC ID的文章合并为批量 efetch；线程池模式下批大小按线程数摊开，保持并发度。
+        # 异步模式不受线程数限制，始终用满批大小，上游限速下请求数越少越快
+        batch_ids = list(OrderedDict.fromkeys(
+            pmc_id for idx, (article, pmc_id) in enumerate(zip(articles, pmc_ids))
+            if isinstance(pmc_id, str) and article.get('pmid') not in known and idx not in reparse
+        ))
+        chunk_size = PMCFetcher.EFETCH_BATCH_SIZE
+        if self._async_fetcher is None:
+            chunk_size = max(1, min(chunk_size, math.ceil(len(batch_ids) / self.max_workers)))
+        batch_futures = {}
+        for i in range(0, len(batch_ids), chunk_size):
+            chunk = batch_ids[i:i + chunk_size]
+            future = self._spawn('get_fulltext_info_batch', chunk, keyword)
+            for pmc_id in chunk:
+                batch_futures[pmc_id] = future
+
+        futures = []
+        for idx, (article, pmc_id) in enumerate(zip(articles, pmc_ids)):
+            outcome_future = Future()
+            futures.append(outcome_future)
+            if article.get('pmid') in known:
+                # 其他项目已用相同关键词分析过这篇文章
+                info = known[article['pmid']]
+                self._settle(article, outcome_future, lambda info=info: info, record_errors)
+            elif idx in reparse:
+                # XML已在本地缓存，上次解析失败，只重新解析
+                source = self._spawn('get_cached_fulltext_info', article['pmc_id'], keyword)
+                self._settle_when_done(source, article, outcome_future, lambda info: info, record_errors)
+            elif pmc_id is None:
+                # 已确认没有PMC全文
+                self._settle(article, outcome_future, lambda: None, record_errors)
+            elif pmc_id is MISSING:
+                # 批量解析未覆盖的文章，由 get_fulltext_info 自行查询PMC ID
+                source = self._spawn('get_fulltext_info', article['pmid'], keyword)
+                self._settle_when_done(source, article, outcome_future, lambda info: info, record_errors)
+            else:
+                self._settle_when_done(batch_futures[pmc_id], article, outcome_future,
+                                       lambda infos, p=pmc_id: infos.get(p), record_errors)
+        return futures
+
+    def _find_known(self, articles: List[Dict], keyword: KeywordMatcher) -> Dict[str, Dict]:
+        """查询可以直接复用的全文分析结果，查询失败时全部重新处理"""
+        pmids = [article['pmid'] for article in articles if article.get('pmid')]
+        if self.known_fulltext is None or not pmids:
+            return {}
+        try:
+            known = self.known_fulltext(pmids, keyword.signature)
+        except Exception as e:
+            print(f"⚠️ 查询已保存的全文分析结果失败: {e}")
+            return {}
+        if known:
+            print(f"♻️ 复用已保存的全文分析结果: {len(known)}/{len(articles)} 篇")
+        return known
+
+    def _xml_cached(self, pmc_id: str):
+        """fetcher 回调：全文XML已写入缓存，等待该XML的文章推进到 xml_fetched"""
+        with self._awaiting_lock:
+            waiting = self._awaiting_xml.pop(pmc_id, [])
+        for article, on_xml_fetched in waiting:
+            processing_state.advance(article, processing_state.XML_FETCHED)
+            if on_xml_fetched is not None:
+                on_xml_fetched(article)
+
+    def _stop_awaiting(self, article: Dict):
+        """文章已结算（XML获取失败时不会收到回调），取消登记"""
+        pmc_id = article.get('pmc_id')
+        with self._awaiting_lock:
+            waiting = self._awaiting_xml.get(pmc_id)
+            if waiting is None:
+                return
+            waiting[:] = [entry for entry in waiting if entry[0] is not article]
+            if not waiting:
+                del self._awaiting_xml[pmc_id]
+
+    def _settle_when_done(self, source: Future, article: Dict, future: Future,
+                          pick: Callable[[object], Optional[Dict]], record_errors: bool):
+        """
+        source 完成后用 pick(结果) 结算文章
+
+        异步模式下完成回调在事件循环线程中执行，而结算会查询全文缓存（SQLite）、写回文章，
+        因此转交线程池执行，不阻塞同时进行的其他请求。
+        """
+        def on_done(done: Future):
+            get_info = lambda: pick(done.result())
+            if self._async_fetcher is not None:
+                self._executor.submit(self._settle, article, future, get_info, record_errors)
+            else:
+                self._settle(article, future, get_info, record_errors)
+
+        source.add_done_callback(on_done)
+
+    def _settle(self, article: Dict, future: Future, get_info: Callable[[], Optional[Dict]],
+                record_errors: bool):
+        """把全文结果写回文章并完成对应的 Future"""
+        self._stop_awaiting(article)
+        # 不再直接跳过没有 pmc_id 的文章
+        article['fulltext_processed'] = True
+        try:
+            outcome = self._apply_fulltext_info(article, get_info(), record_errors)
+        except Exception as e:
+            outcome = self._apply_error(article, e, record_errors)
+        self._record_state(article, outcome)
+        future.set_result(outcome)
+
+    def _record_state(self, article: Dict, outcome: Dict):
+        """按处理结果更新文章的处理状态；失败时记录已完成到哪个阶段"""
+        if outcome['status'] == "success":
+            processing_state.advance(article, processing_state.PARSED)
+            return
+
+        pmc_id = article.get('pmc_id')
+        if not pmc_id:
+            stage, reason = processing_state.PENDING, processing_state.NO_PMC_ID
+        elif self._get_fetcher().cache.contains(pmc_id):
+            stage, reason = processing_state.XML_FETCHED, processing_state.PARSE_FAILED
+        else:
+            stage, reason = processing_state.PMCID_RESOLVED, processing_state.FETCH_FAILED
+        processing_state.mark_failed(article, stage, outcome['error'] or reason)
+
+    def resolve_pmc_ids(self, articles: List[Dict]) -> Dict[str, Optional[str]]:
+        """批量解析整批文章的PMC ID，优先复用搜索结果中已有的 pmc_id"""
+        known = {
+            article['pmid']: article['pmc_id']
+            for article in articles
+            if article.get('pmid') and article.get('pmc_id')
+        }
+        pmids = [article.get('pmid') for article in articles]
+        if self._async_fetcher is not None:
+            return self._bridge.run(self._async_fetcher.resolve_pmc_ids(pmids, known))
+        return self._get_fetcher().resolve_pmc_ids(pmids, known)
+
+    def _apply_fulltext_info(self, article: Dict, fulltext_info: Optional[Dict],
+                             record_errors: bool) -> Dict:
+        """把全文结果写回文章，结果与原串行流程一致"""
+        if fulltext_info and fulltext_info.get('fulltext'):
+            # 成功获取全文
+            article['fulltext'] = fulltext_info['fulltext']
+            article['has_fulltext'] = True
+            article['pmc_id'] = fulltext_info.get('pmc_id') or article.get('pmc_id')
+            article['pmc_available'] = True
+            if record_errors:
+                article['fulltext_error'] = None
+
+            # 基于全文提及次数调整相关性分数
+            mentions = fulltext_info['fulltext']['total_mentions']
+            if mentions > 0:
+                article['relevance']['score'] += mentions * 5
+
+            return {"status": "success", "mentions": mentions, "error": None, "article": article}
+
+        # 无法获取全文（可能没有PMC ID或全文不可用）
+        pmc_id = article.get('pmc_id', '')
+        status = "unavailable" if pmc_id else "no_pmc_id"
+        if record_errors:
+            article['fulltext_error'] = 'FETCH_FAILED' if pmc_id else 'NO_PMC_ID'
+
+        article['has_fulltext'] = False
+        article['pmc_available'] = bool(pmc_id)
+        return {"status": status, "mentions": 0, "error": None, "article": article}
+
+    def _apply_error(self, article: Dict, error: Exception, record_errors: bool) -> Dict:
+        if record_errors:
+            article['fulltext_error'] = str(error)
+        article['has_fulltext'] = False
+        article['pmc_available'] = bool(article.get('pmc_id'))
+        return {"status": "error", "mentions": 0, "error": str(error), "article": article}
+
+    def _log_outcome(self, idx: int, total: int, outcome: Dict, label: str):
+        article = outcome['article']
+        pmid = article.get('pmid', 'N/A')
+        pmc_id = article.get('pmc_id') or 'N/A'
+        status = outcome['status']
+
+        if status == "success":
+            print(f"[{idx}/{total}] ✅ {pmc_id}: {label}找到 {outcome['mentions']} 处提及")
+        elif status == "no_pmc_id":
+            print(f"[{idx}/{total}] ⚠️ PMID {pmid}: 无PMC ID，无法获取全文")
+        elif status == "unavailable":
+            print(f"[{idx}/{total}] ⚠️ {pmc_id}: 全文不可用或解析失败")
+        else:
+            print(f"[{idx}/{total}] ❌ PMID {pmid}: 处理失败 - {outcome['error']}")
@@ -0,0 +1,307 @@
+"""
+共享HTTP客户端模块
+进程内所有上游请求（NCBI E-utilities、Europe PMC）共用一组按主机划分的长连接池，
+并按主机限制并发数和请求速率，遇到 429/5xx 时按指数退避（带随机抖动）重试，同时记录请求指标
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 连接和并发配置（可通过环境变量覆盖）
+PER_HOST_LIMIT = int(os.environ.get("FIGURESCOUT_PER_HOST_LIMIT", "3"))
+HTTP_POOL_SIZE = int(os.environ.get("FIGURESCOUT_HTTP_POOL_SIZE", "10"))
+HTTP_MAX_RETRIES = int(os.environ.get("FIGURESCOUT_HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_SECONDS = float(os.environ.get("FIGURESCOUT_HTTP_BACKOFF_SECONDS", "0.5"))
+HTTP_BACKOFF_MAX_SECONDS = float(os.environ.get("FIGURESCOUT_HTTP_BACKOFF_MAX_SECONDS", "30"))
+
+# NCBI 限制：没有 API key 时每秒 3 次，有 API key 时每秒 10 次
+NCBI_HOST = "eutils.ncbi.nlm.nih.gov"
+NCBI_API_KEY = os.environ.get("FIGURESCOUT_NCBI_API_KEY") or os.environ.get("NCBI_API_KEY", "")
+NCBI_EMAIL = os.environ.get("FIGURESCOUT_NCBI_EMAIL", "")
+NCBI_RATE = float(os.environ.get("FIGURESCOUT_NCBI_RATE", "10" if NCBI_API_KEY else "3"))
+
+EUROPEPMC_HOST = "www.ebi.ac.uk"
+EUROPEPMC_RATE = float(os.environ.get("FIGURESCOUT_EUROPEPMC_RATE", "10"))
+
+# 需要退避重试的状态码
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 每个主机保留最近多少次请求的耗时用于计算分位数
+LATENCY_SAMPLES = 1000
+
+
+class TokenBucket:
+    """令牌桶限速器：平均每秒 rate 个请求，最多连续放行 burst 个"""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        预约一个令牌但不等待（先到先得：每次调用预约下一个令牌），异步调用方自行 sleep
+
+        Returns:
+            需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            self._tokens -= 1
+            wait = (self._updated - now) + max(0.0, -self._tokens) / self.rate
+        return max(wait, 0.0)
+
+    def acquire(self) -> float:
+        """
+        取一个令牌，令牌不足时等待
+
+        Returns:
+            等待的秒数
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """上游要求降速（429）时暂停发放令牌"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._updated:
+                self._tokens = min(self._tokens, 0.0)
+                self._updated = until
+
+
+class HostState:
+    """单个上游主机的并发名额、限速器和请求指标"""
+
+    def __init__(self, host: str, per_host_limit: int, rate: Optional[float]):
+        self.host = host
+        self.semaphore = threading.BoundedSemaphore(max(1, per_host_limit))
+        self.bucket = TokenBucket(rate) if rate else None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.throttled = 0
+        self.statuses: Dict[int, int] = {}
+        self.rate_wait_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, status: Optional[int], elapsed: float, waited: float):
+        with self._lock:
+            self.requests += 1
+            self.rate_wait_seconds += waited
+            self.latencies.append(elapsed)
+            if status is None:
+                self.errors += 1
+            else:
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+                if status == 429:
+                    self.throttled += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            statuses = dict(self.statuses)
+            counters = (self.requests, self.retries, self.errors, self.throttled, self.rate_wait_seconds)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1)
+
+        requests_count, retries, errors, throttled, rate_wait = counters
+        return {
+            "requests": requests_count,
+            "retries": retries,
+            "errors": errors,
+            "throttled": throttled,
+            "statuses": statuses,
+            "rate_limit": self.bucket.rate if self.bucket else None,
+            "rate_wait_seconds": round(rate_wait, 2),
+            "latency_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1] * 1000, 1) if latencies else None,
+            },
+        }
+
+
+class HttpClient:
+    """
+    进程内共享的HTTP客户端
+
+    接口与 requests.Session 的 get / post / request 相同，可直接作为各检索器的 session 使用。
+    每个线程持有自己的 Session（requests.Session 不保证线程安全），但挂载同一个连接池适配器，
+    同一主机的 TCP/TLS 连接在所有线程和请求之间复用。
+    """
+
+    def __init__(self, per_host_limit: int = PER_HOST_LIMIT, pool_size: int = HTTP_POOL_SIZE,
+                 max_retries: int = HTTP_MAX_RETRIES, backoff_seconds: float = HTTP_BACKOFF_SECONDS,
+                 rate_limits: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            per_host_limit: 每个主机同时进行的请求数上限
+            pool_size: 每个主机保持的长连接数
+            max_retries: 429/5xx 或连接错误时的最大重试次数
+            backoff_seconds: 第一次重试前的基础等待时间，之后每次翻倍
+            rate_limits: {主机: 每秒请求数}，默认按 NCBI / Europe PMC 的限制
+        """
+        self.per_host_limit = max(1, per_host_limit)
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.rate_limits = rate_limits if rate_limits is not None else {
+            NCBI_HOST: NCBI_RATE,
+            EUROPEPMC_HOST: EUROPEPMC_RATE,
+        }
+        self._adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(pool_size, self.per_host_limit))
+        self._hosts: Dict[str, HostState] = {}
+        self._hosts_lock = threading.Lock()
+        self._local = threading.local()
+
+    def session(self) -> requests.Session:
+        """当前线程的 Session（共享连接池）"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+
+    def host_state(self, host: str) -> HostState:
+        """主机的并发名额、限速器和指标（同步与异步客户端共用）"""
+        with self._hosts_lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = HostState(host, self.per_host_limit, self.rate_limits.get(host))
+                self._hosts[host] = state
+            return state
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送请求：按主机限并发和限速，429/5xx 和连接错误时退避重试
+
+        Returns:
+            最后一次的响应（重试用尽时可能仍是 429/5xx，由调用方 raise_for_status）
+
+        Raises:
+            requests.RequestException: 重试用尽后仍无法连接或超时
+        """
+        host = urlparse(url).netloc
+        state = self.host_state(host)
+        if host == NCBI_HOST:
+            self.add_ncbi_params(method, kwargs)
+
+        attempt = 0
+        while True:
+            response, error = None, None
+            with state.semaphore:
+                waited = state.bucket.acquire() if state.bucket else 0.0
+                start = time.perf_counter()
+                try:
+                    response = self.session().request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                state.record(response.status_code if response is not None else None,
+                             time.perf_counter() - start, waited)
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self.backoff_delay(attempt, response)
+            if response is not None:
+                if response.status_code == 429 and state.bucket:
+                    # 同一主机的其他请求也一起等待
+                    state.bucket.pause(delay)
+                response.close()
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            print(f"🔁 {host} 请求失败（{reason}），{delay:.1f}s 后第 {attempt + 1} 次重试")
+            state.record_retry()
+            time.sleep(delay)
+            attempt += 1
+
+    def backoff_delay(self, attempt: int, response=None) -> float:
+        """指数退避 + 随机抖动；上游给出 Retry-After 时以其为准"""
+        retry_after = self._retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, HTTP_BACKOFF_MAX_SECONDS)
+        ceiling = min(HTTP_BACKOFF_MAX_SECONDS, self.backoff_seconds * 2 ** attempt)
+        return random.uniform(ceiling / 2, ceiling)
+
+    @staticmethod
+    def _retry_after(response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def add_ncbi_params(method: str, kwargs: Dict):
+        """NCBI 请求附带 API key 和联系方式（调用方已提供时不覆盖）"""
+        extra = {}
+        if NCBI_API_KEY:
+            extra["api_key"] = NCBI_API_KEY
+        if NCBI_EMAIL:
+            extra["tool"] = "figurescout"
+            extra["email"] = NCBI_EMAIL
+        if not extra:
+            return
+        key = "data" if method.upper() == "POST" and kwargs.get("data") is not None else "params"
+        values = kwargs.get(key)
+        if values is None or isinstance(values, dict):
+            kwargs[key] = {**extra, **(values or {})}
+
+    def metrics(self) -> Dict:
+        """按主机汇总的请求数、重试数、错误数、状态码分布、限速等待时间和耗时分位数"""
+        with self._hosts_lock:
+            hosts = list(self._hosts.values())
+        return {state.host: state.snapshot() for state in hosts}
+
+
+_default_client: Optional[HttpClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """进程内共享的默认客户端"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
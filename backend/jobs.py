@@ -0,0 +1,368 @@
+"""
+后台任务队列模块
+把项目中未处理文章的全文处理放到服务器后台线程中执行，不依赖浏览器保持连接
+任务和子任务记录在项目数据库中，服务重启后自动继续未完成的任务
+"""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import processing_state
+from database import ProjectDatabase
+from fulltext_processor import FulltextProcessor
+from keyword_matcher import KeywordMatcher
+
+# 后台任务配置（可通过环境变量覆盖）
+JOB_WORKERS = int(os.environ.get("FIGURESCOUT_JOB_WORKERS", "1"))
+JOB_WINDOW = 50  # 每次提交给全文处理引擎的文章数
+JOB_SAVE_EVERY = 10  # 每处理完多少篇保存一次
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class JobQueue:
+    """基于 SQLite 的后台全文处理任务队列"""
+
+    def __init__(self, db: ProjectDatabase, processor: FulltextProcessor,
+                 workers: int = JOB_WORKERS):
+        """
+        Args:
+            db: 项目数据库（任务表与项目表存放在同一个数据库文件中）
+            processor: 全文处理引擎
+            workers: 同时执行的任务数
+        """
+        self.db = db
+        self.processor = processor
+        self.workers = max(1, workers)
+
+        self._wakeup = threading.Condition()
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._threads: List[threading.Thread] = []
+        self._started = False
+        self._start_lock = threading.Lock()
+
+        self.init_tables()
+
+    def init_tables(self):
+        """初始化任务表结构"""
+        with self.db.transaction() as conn:
+            self._create_tables(conn)
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
+
+        # 任务表：每个任务处理一个项目中的全部未处理文章
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                project_id TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                aliases TEXT,
+                status TEXT NOT NULL,
+                total INTEGER DEFAULT 0,
+                processed INTEGER DEFAULT 0,
+                fulltext INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                cancel_requested BOOLEAN DEFAULT 0,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE
+            )
+        ''')
+
+        # 子任务表：每篇文章一条，用于断点续跑
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS job_tasks (
+                job_id TEXT NOT NULL,
+                pmid TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                result TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (job_id, pmid),
+                FOREIGN KEY (job_id) REFERENCES jobs (job_id) ON DELETE CASCADE
+            )
+        ''')
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_project ON jobs(project_id)')
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """启动工作线程（可重复调用），并恢复上次服务退出时仍在运行的任务"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+
+            with self.db.transaction() as conn:
+                resumed = conn.execute('''
+                    UPDATE jobs SET status = 'queued', updated_at = ?
+                    WHERE status = 'running'
+                ''', (datetime.now().isoformat(),)).rowcount
+            if resumed:
+                print(f"🔁 恢复 {resumed} 个未完成的后台任务")
+
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def create_job(self, project_id: str, keyword: Optional[str] = None,
+                   aliases: Optional[List[str]] = None,
+                   pmids: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        为项目创建后台处理任务；项目已有进行中的任务时直接返回该任务
+
+        Args:
+            project_id: 项目ID
+            keyword: 关键词（默认使用项目关键词）
+            aliases: 关键词别名
+            pmids: 只处理这些文章（如增量更新新增的文章），默认处理全部未处理的文章
+
+        Returns:
+            任务信息，项目不存在时返回 None
+        """
+        project = self.db.get_project_stats(project_id)
+        if project is None:
+            return None
+
+        job_id = str(uuid.uuid4())[:8]
+        now = datetime.now().isoformat()
+        with self.db.transaction() as conn:
+            # IMMEDIATE 事务：检查与创建之间不会被其他请求插入同一项目的任务
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(f'''
+                SELECT job_id FROM jobs
+                WHERE project_id = ? AND status IN ({",".join("?" * len(ACTIVE_STATUSES))})
+                ORDER BY created_at DESC LIMIT 1
+            ''', (project_id, *ACTIVE_STATUSES)).fetchone()
+            if row:
+                existing_job_id = row['job_id']
+            else:
+                existing_job_id = None
+                unfinished = processing_state.UNFINISHED
+                wanted = set(pmids) if pmids is not None else None
+                pmids = [r['pmid'] for r in conn.execute(f'''
+                    SELECT pmid FROM articles
+                    WHERE project_id = ? AND state IN ({",".join("?" * len(unfinished))})
+                ''', (project_id, *unfinished)) if wanted is None or r['pmid'] in wanted]
+
+                conn.execute('''
+                    INSERT INTO jobs (job_id, project_id, keyword, aliases, status, total, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)
+                ''', (job_id, project_id, keyword or project['keyword'], json.dumps(aliases or []),
+                      len(pmids), now, now))
+                conn.executemany(
+                    'INSERT INTO job_tasks (job_id, pmid) VALUES (?, ?)',
+                    [(job_id, pmid) for pmid in pmids]
+                )
+
+        if existing_job_id:
+            return self.get_job(existing_job_id)
+
+        print(f"📋 创建后台任务 {job_id}: 项目 {project_id}，待处理 {len(pmids)} 篇")
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """获取任务状态和进度"""
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._job_to_dict(row) if row else None
+
+    def list_jobs(self, project_id: str, limit: int = 20) -> List[Dict]:
+        """获取项目的任务列表（最新的在前）"""
+        with self.db.connection() as conn:
+            rows = conn.execute('''
+                SELECT * FROM jobs WHERE project_id = ?
+                ORDER BY created_at DESC LIMIT ?
+            ''', (project_id, limit)).fetchall()
+        return [self._job_to_dict(row) for row in rows]
+
+    def cancel_job(self, job_id: str) -> Optional[Dict]:
+        """
+        取消任务：排队中的任务立即取消，运行中的任务在当前文章处理完后停止
+
+        Returns:
+            更新后的任务信息，任务不存在时返回 None
+        """
+        now = datetime.now().isoformat()
+        with self.db.transaction() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = 'cancelled', cancel_requested = 1,
+                    updated_at = ?, finished_at = ?
+                WHERE job_id = ? AND status = 'queued'
+            ''', (now, now, job_id))
+            conn.execute('''
+                UPDATE jobs SET cancel_requested = 1, updated_at = ?
+                WHERE job_id = ? AND status = 'running'
+            ''', (now, job_id))
+
+        event = self._cancel_events.get(job_id)
+        if event:
+            event.set()
+        return self.get_job(job_id)
+
+    # ------------------------------------------------------------------
+    # 工作线程
+    # ------------------------------------------------------------------
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._claim_next_job()
+            if job_id is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=5)
+                continue
+
+            try:
+                self._run_job(job_id)
+            except JobCancelled:
+                self._finish_job(job_id, "cancelled")
+                print(f"🛑 后台任务 {job_id} 已取消")
+            except Exception as e:
+                print(f"❌ 后台任务 {job_id} 失败: {e}")
+                import traceback
+                traceback.print_exc()
+                self._finish_job(job_id, "failed", str(e))
+            finally:
+                self._cancel_events.pop(job_id, None)
+
+    def _claim_next_job(self) -> Optional[str]:
+        """领取最早排队的任务（多个工作线程之间通过条件更新避免重复领取）"""
+        while True:
+            with self.db.transaction() as conn:
+                row = conn.execute('''
+                    SELECT job_id FROM jobs WHERE status = 'queued'
+                    ORDER BY created_at LIMIT 1
+                ''').fetchone()
+                if row is None:
+                    return None
+
+                now = datetime.now().isoformat()
+                claimed = conn.execute('''
+                    UPDATE jobs SET status = 'running', updated_at = ?,
+                        started_at = COALESCE(started_at, ?)
+                    WHERE job_id = ? AND status = 'queued'
+                ''', (now, now, row['job_id'])).rowcount
+            if claimed:
+                self._cancel_events[row['job_id']] = threading.Event()
+                return row['job_id']
+
+    def _run_job(self, job_id: str):
+        job = self.get_job(job_id)
+        cancel_event = self._cancel_events[job_id]
+        if job['cancel_requested']:
+            raise JobCancelled()
+
+        with self.db.connection() as conn:
+            pending = {r['pmid'] for r in conn.execute(
+                "SELECT pmid FROM job_tasks WHERE job_id = ? AND status = 'pending'", (job_id,)
+            )}
+
+        project_articles = self.db.list_articles_by_state(job['project_id'])
+        if project_articles is None:
+            raise RuntimeError("项目已删除")
+
+        # 按相关性从高到低，与前端一致
+        articles = [a for a in project_articles if a['pmid'] in pending]
+        # 项目中已不存在的文章直接标记完成
+        missing = pending - {a['pmid'] for a in articles}
+        if missing:
+            self._mark_tasks(job_id, [(pmid, "skipped") for pmid in missing])
+
+        print(f"\n{'='*60}")
+        print(f"后台任务 {job_id}: 项目 {job['project_id']}，本次处理 {len(articles)} 篇")
+        print(f"{'='*60}\n")
+
+        matcher = KeywordMatcher.from_query(job['keyword'], job['aliases'])
+        # 预保存与 xml_fetched 状态的写入互斥，保证状态不会被较早的快照覆盖
+        presave_lock = threading.Lock()
+
+        def save_xml_fetched(article: Dict):
+            # 全文XML已缓存、尚未解析：服务中断后只需重新解析
+            with presave_lock:
+                self.db.patch_articles(job['project_id'], [{
+                    'pmid': article['pmid'],
+                    **{field: article.get(field) for field in processing_state.STATE_FIELDS}
+                }])
+
+        for i in range(0, len(articles), JOB_WINDOW):
+            window = articles[i:i + JOB_WINDOW]
+            with presave_lock:
+                futures = self.processor.submit(window, matcher, on_xml_fetched=save_xml_fetched)
+                # 先保存解析到的PMC ID，服务中断后不必重新查询
+                self.db.save_articles(job['project_id'], [dict(article) for article in window])
+            completed = []
+            for _, outcome in self.processor.iter_completed(futures, label=f"[任务 {job_id}] "):
+                completed.append(outcome)
+                if len(completed) >= JOB_SAVE_EVERY:
+                    self._commit_outcomes(job_id, job['project_id'], completed)
+                    completed = []
+                if cancel_event.is_set():
+                    break
+
+            if cancel_event.is_set():
+                # 已提交的文章仍会在后台完成，这里只保存已经拿到的结果
+                self._commit_outcomes(job_id, job['project_id'], completed)
+                raise JobCancelled()
+            self._commit_outcomes(job_id, job['project_id'], completed)
+
+        self._finish_job(job_id, "completed")
+        job = self.get_job(job_id)
+        print(f"\n✅ 后台任务 {job_id} 完成: 成功 {job['fulltext']}/{job['total']} 篇\n")
+
+    def _commit_outcomes(self, job_id: str, project_id: str, outcomes: List[Dict]):
+        """保存一批处理结果：文章写回项目（项目计数随之更新），子任务标记完成，任务进度前进"""
+        if not outcomes:
+            return
+        self.db.save_articles(project_id, [o['article'] for o in outcomes])
+        self._mark_tasks(job_id, [(o['article']['pmid'], o['status']) for o in outcomes])
+
+    def _mark_tasks(self, job_id: str, results: List):
+        now = datetime.now().isoformat()
+        with self.db.transaction() as conn:
+            conn.executemany('''
+                UPDATE job_tasks SET status = 'done', result = ?, updated_at = ?
+                WHERE job_id = ? AND pmid = ?
+            ''', [(result, now, job_id, pmid) for pmid, result in results])
+            conn.execute('''
+                UPDATE jobs SET
+                    processed = (SELECT COUNT(*) FROM job_tasks WHERE job_id = ? AND status = 'done'),
+                    fulltext = (SELECT COUNT(*) FROM job_tasks WHERE job_id = ? AND result = 'success'),
+                    failed = (SELECT COUNT(*) FROM job_tasks WHERE job_id = ? AND result = 'error'),
+                    updated_at = ?
+                WHERE job_id = ?
+            ''', (job_id, job_id, job_id, now, job_id))
+
+    def _finish_job(self, job_id: str, status: str, error: Optional[str] = None):
+        now = datetime.now().isoformat()
+        with self.db.transaction() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ?
+                WHERE job_id = ?
+            ''', (status, error, now, now, job_id))
+
+    @staticmethod
+    def _job_to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job['aliases'] = json.loads(job['aliases']) if job['aliases'] else []
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        job['progress'] = round(job['processed'] / job['total'], 4) if job['total'] else 1.0
+        return job
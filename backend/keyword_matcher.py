@@ -0,0 +1,173 @@
+"""
+多关键词匹配模块
+基于 Aho-Corasick 自动机，一次线性扫描即可找出文本中所有别名（如 DepMap /
+Cancer Dependency Map / Achilles）的出现位置，并做单词边界判断
+"""
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union
+
+
+class KeywordMatch(NamedTuple):
+    """一次匹配：命中的别名及其在原文中的 [start, end) 位置"""
+    start: int
+    end: int
+    keyword: str
+
+
+def _fold(ch: str) -> str:
+    """单字符小写化；小写后长度变化的字符（如 'İ'）保持原样，保证位置与原文一致"""
+    lowered = ch.lower()
+    return lowered if len(lowered) == 1 else ch
+
+
+# 匹配规则版本：边界规则变化时递增，按旧规则保存的全文分析结果不再被复用
+MATCH_RULES_VERSION = 2
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def keyword_signature(keywords: Iterable[str]) -> str:
+    """
+    关键词集合的标识：签名相同的关键词集合在同一文本上产生相同的提及结果
+    （别名顺序不影响匹配，大小写会体现在提及的 keyword 字段中，因此保留；
+    包含匹配规则版本，规则变化后旧结果的签名不再相同）
+    """
+    return f"v{MATCH_RULES_VERSION}\n" + "\n".join(sorted(keywords))
+
+
+class KeywordMatcher:
+    """编译后的多关键词匹配器，每个请求构建一次，在所有文章、章节、图注间复用"""
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Args:
+            keywords: 关键词及其别名，第一个视为主关键词
+        """
+        self.keywords: List[str] = []
+        seen = set()
+        for keyword in keywords:
+            keyword = (keyword or "").strip()
+            folded = "".join(_fold(ch) for ch in keyword)
+            if keyword and folded not in seen:
+                seen.add(folded)
+                self.keywords.append(keyword)
+
+        # 自动机：goto 转移表、失败指针、每个状态的输出（关键词下标）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._lengths = [len(keyword) for keyword in self.keywords]
+        self._build()
+
+    @classmethod
+    def from_query(cls, keyword: str, aliases: Optional[Iterable[str]] = None) -> "KeywordMatcher":
+        """由主关键词和可选别名列表构建"""
+        return cls([keyword] + list(aliases or []))
+
+    @classmethod
+    def coerce(cls, keyword: Union[str, "KeywordMatcher"]) -> "KeywordMatcher":
+        """兼容只传入单个关键词字符串的调用方"""
+        if isinstance(keyword, KeywordMatcher):
+            return keyword
+        return cls([keyword])
+
+    @property
+    def primary(self) -> str:
+        return self.keywords[0] if self.keywords else ""
+
+    @property
+    def signature(self) -> str:
+        """关键词集合的标识（见 keyword_signature），用于复用其他项目的全文分析结果"""
+        return keyword_signature(self.keywords)
+
+    def _build(self):
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                ch = _fold(ch)
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][ch] = next_state
+                state = next_state
+            self._output[state].append(index)
+
+        # 广度优先计算失败指针，并合并输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _boundary_ok(self, text: str, start: int, end: int) -> bool:
+        """
+        单词边界判断：别名前面不能紧接字母数字，后面不能紧接字母
+        （避免 'Achilles' 命中 'Achillesheel'）
+
+        别名后面允许紧接数字和下划线：数据集名称常带版本后缀，如 'DepMap22Q2'、'DepMap_portal'
+        """
+        if start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and _is_word_char(text[end - 1]) and text[end].isalpha():
+            return False
+        return True
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """
+        找出文本中所有不重叠的匹配（同一起点取最长别名，自左向右）
+
+        Args:
+            text: 原文
+
+        Returns:
+            按位置排序的匹配列表
+        """
+        if not text or not self.keywords:
+            return []
+
+        candidates = []
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for i, ch in enumerate(text):
+            ch = _fold(ch)
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in output[state]:
+                end = i + 1
+                start = end - self._lengths[index]
+                if self._boundary_ok(text, start, end):
+                    candidates.append((start, -self._lengths[index], index))
+
+        # 去除重叠：按起点升序、长度降序挑选
+        matches = []
+        last_end = 0
+        for start, neg_length, index in sorted(candidates):
+            if start < last_end:
+                continue
+            end = start - neg_length
+            matches.append(KeywordMatch(start, end, self.keywords[index]))
+            last_end = end
+        return matches
+
+    def contains(self, text: str) -> bool:
+        """文本中是否出现任一别名"""
+        return bool(self.find_all(text))
+
+    def matched_keywords(self, text: str) -> List[str]:
+        """文本中出现过的别名（按首次出现顺序）"""
+        seen = []
+        for match in self.find_all(text):
+            if match.keyword not in seen:
+                seen.append(match.keyword)
+        return seen
@@ -0,0 +1,116 @@
+"""
+项目数据库迁移工具
+
+用法（在 backend 目录下运行，建议先停止后端服务并备份数据库文件）：
+    python migrate_db.py status [--db figurescout_projects.db]
+    python migrate_db.py normalize [--db figurescout_projects.db] [--batch 200] [--vacuum]
+    python migrate_db.py reindex [--db figurescout_projects.db]
+    python migrate_db.py compress [--db figurescout_projects.db] [--compression zlib] [--vacuum]
+
+normalize 把旧格式（整段JSON）的全文分析结果拆分到章节、关键词提及、图表表中
+（章节和图表按文档保存，多个项目共享）。
+每批一个事务，中断后重新运行会从未迁移的文章继续。
+reindex 重建全文检索索引（保存文章时会自动更新索引，一般只在索引损坏时需要）。
+compress 按 --compression（默认 FIGURESCOUT_DB_COMPRESSION）重写已保存的正文章节、提及段落和
+fulltext_data；--compression none 可把压缩的内容还原为文本。需要 --vacuum 才会缩小数据库文件。
+"""
+import argparse
+import os
+import sys
+import time
+
+from database import DB_COMPRESSION, TEXT_FORMATS, ProjectDatabase
+
+
+def print_status(db: ProjectDatabase):
+    stats = db.get_storage_stats()
+    print(f"📊 数据库: {db.db_path}")
+    print(f"   JSON 格式（待迁移）: {stats['json_articles']} 篇")
+    print(f"   已拆分存储: {stats['normalized_articles']} 篇")
+    print(f"   文档: {stats['documents']} 篇（项目文章 {stats['articles']} 篇）")
+    print(f"   章节: {stats['document_sections']} 条, 图表: {stats['document_figures']} 条, "
+          f"提及: {stats['article_mentions']} 条, 图注关键词标记: {stats['article_figure_hits']} 条")
+    print(f"   文件大小: {file_size_mb(db):.1f} MB")
+    for name, column in db.get_compression_stats().items():
+        print(f"   {name}: {column['compressed']}/{column['total']} 已压缩, "
+              f"{column['stored_bytes'] / 1024 / 1024:.1f} MB")
+
+
+def file_size_mb(db: ProjectDatabase) -> float:
+    """数据库文件大小（先把 WAL 写回主文件）"""
+    with db.connection() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return os.path.getsize(db.db_path) / 1024 / 1024
+
+
+def normalize(db: ProjectDatabase, batch_size: int):
+    total = db.get_storage_stats()['json_articles']
+    if not total:
+        print("✅ 没有需要迁移的文章")
+        return
+
+    print(f"🔄 开始迁移 {total} 篇文章（每批 {batch_size} 篇）")
+    start = time.perf_counter()
+    migrated = 0
+    while True:
+        count = db.migrate_fulltext_batch(batch_size)
+        if not count:
+            break
+        migrated += count
+        print(f"   {migrated}/{total}")
+    print(f"✅ 迁移完成: {migrated} 篇，用时 {time.perf_counter() - start:.1f}s")
+
+
+def compress(db: ProjectDatabase, batch_size: int):
+    print(f"🗜️ 按 {db.compression} 重写大文本列（每批 {batch_size} 行）")
+    start = time.perf_counter()
+    for table, column in db.COMPRESSED_COLUMNS:
+        after_rowid = 0
+        rewritten = 0
+        while True:
+            after_rowid, count = db.recompress_text_batch(table, column, after_rowid, batch_size)
+            if after_rowid is None:
+                break
+            rewritten += count
+        print(f"   {table}.{column}: 重写 {rewritten} 行")
+    print(f"✅ 压缩完成，用时 {time.perf_counter() - start:.1f}s")
+
+
+def vacuum(db: ProjectDatabase):
+    """迁移后旧的 JSON 文本占用的页不会自动释放，VACUUM 重建数据库文件"""
+    print("🧹 VACUUM ...")
+    with db.connection() as conn:
+        conn.execute('VACUUM')
+    print("✅ VACUUM 完成")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="项目数据库迁移工具")
+    parser.add_argument("command", choices=["status", "normalize", "reindex", "compress"], help="要执行的操作")
+    parser.add_argument("--db", default="figurescout_projects.db", help="数据库文件路径")
+    parser.add_argument("--batch", type=int, default=200, help="每个事务处理的文章数（compress 为行数）")
+    parser.add_argument("--vacuum", action="store_true", help="迁移后执行 VACUUM 回收空间")
+    parser.add_argument("--compression", choices=list(TEXT_FORMATS), default=DB_COMPRESSION,
+                        help="compress 使用的压缩方式")
+    args = parser.parse_args()
+
+    # 打开数据库时会自动补充新的表和列
+    db = ProjectDatabase(args.db, compression=args.compression)
+
+    if args.command == "status":
+        print_status(db)
+        sys.exit(0)
+
+    if args.command == "reindex":
+        db.rebuild_search_index()
+        sys.exit(0)
+
+    before = file_size_mb(db)
+    if args.command == "compress":
+        compress(db, args.batch)
+    else:
+        normalize(db, args.batch)
+    if args.vacuum:
+        vacuum(db)
+    print_status(db)
+    print(f"📉 文件大小: {before:.1f} MB → {file_size_mb(db):.1f} MB")
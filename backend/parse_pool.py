@@ -0,0 +1,155 @@
+"""
+全文解析进程池模块
+XML解析、章节切分和关键词查找是受 GIL 限制的CPU密集计算，网络并发提高后成为处理大型论文的瓶颈。
+启用后这些计算在子进程中进行：传入XML原始字节，返回与关键词无关的结构化文档（比XML小得多），
+关键词分析同样分块提交。未启用、平台不支持 fork 或进程池异常时在当前进程中计算，结果完全相同。
+"""
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from fulltext_parser import FulltextParser
+from keyword_matcher import KeywordMatcher
+
+# 进程池配置（可通过环境变量覆盖）；PARSE_WORKERS 为 0 时不启用，在当前进程中解析
+PARSE_WORKERS = int(os.environ.get("FIGURESCOUT_PARSE_WORKERS", "0"))
+PARSE_CHUNK_SIZE = int(os.environ.get("FIGURESCOUT_PARSE_CHUNK_SIZE", "4"))  # 每个任务包含的文章数
+
+# 预热用的小文档：让子进程提前导入解析后端并走一遍完整解析流程
+WARM_UP_XML = (
+    b'<article><body><sec sec-type="methods"><title>Methods</title><p>warm up</p></sec>'
+    b'<fig id="f1"><label>Figure 1</label><caption><p>warm up</p></caption></fig></body></article>'
+)
+
+_parser = FulltextParser()
+
+
+def _warm_up(_) -> int:
+    _parser.document_from_bytes("warm-up", WARM_UP_XML)
+    return os.getpid()
+
+
+def _build_chunk(items: List[Tuple[str, bytes]]) -> List[Optional[Dict]]:
+    return [_parser.document_from_bytes(pmc_id, data) for pmc_id, data in items]
+
+
+def _analyze_chunk(documents: List[Optional[Dict]], keyword: KeywordMatcher) -> List[Optional[Dict]]:
+    return [_parser.analyze_safely(document, keyword) for document in documents]
+
+
+class ParsePool:
+    """全文解析进程池，不可用时回退到当前进程"""
+
+    def __init__(self, workers: int = PARSE_WORKERS, chunk_size: int = PARSE_CHUNK_SIZE):
+        """
+        Args:
+            workers: 子进程数，0 表示不启用
+            chunk_size: 每个任务最多包含的文章数（一批文章较少时按进程数摊开）
+        """
+        self.workers = max(0, workers)
+        self.chunk_size = max(1, chunk_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        if self.workers:
+            self._start()
+
+    def _start(self):
+        """
+        创建进程池并预热
+
+        使用 fork：子进程不会重新导入 app.py，也无需重新加载解析后端。
+        fork 方式的 ProcessPoolExecutor 在第一次提交任务时一次性创建全部子进程，
+        因此在这里立即预热，赶在服务启动其他线程之前完成 fork。
+        """
+        if "fork" not in multiprocessing.get_all_start_methods():
+            print("⚠️ 当前平台不支持 fork，全文解析在当前进程中进行")
+            return
+
+        start = time.perf_counter()
+        try:
+            executor = ProcessPoolExecutor(max_workers=self.workers,
+                                           mp_context=multiprocessing.get_context("fork"))
+            pids = set(executor.map(_warm_up, range(self.workers)))
+        except Exception as e:
+            print(f"⚠️ 解析进程池启动失败，全文解析在当前进程中进行: {e}")
+            return
+        self._executor = executor
+        print(f"🧩 解析进程池已启动: {len(pids)} 个进程，预热 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def stats(self) -> Dict:
+        return {"workers": self.workers if self.enabled else 0, "chunk_size": self.chunk_size}
+
+    def build_documents(self, items: Sequence[Tuple[str, bytes]]) -> List[Optional[Dict]]:
+        """
+        解析一批全文XML
+
+        Args:
+            items: [(pmc_id, XML字节)]
+
+        Returns:
+            与输入顺序一致的结构化文档列表（见 FulltextParser.build_document），解析失败的为 None
+        """
+        return self._run(_build_chunk, list(items))
+
+    def analyze_documents(self, documents: Sequence[Optional[Dict]],
+                          keyword: Union[str, KeywordMatcher]) -> List[Optional[Dict]]:
+        """
+        在一批结构化文档上查找关键词
+
+        Returns:
+            与输入顺序一致的全文信息列表（见 FulltextParser.analyze_document），文档为空或分析出错的为 None
+        """
+        return self._run(_analyze_chunk, list(documents), KeywordMatcher.coerce(keyword))
+
+    def _run(self, func: Callable, items: List, *args) -> List:
+        """分块提交到进程池并按输入顺序合并结果；进程池不可用时在当前进程中计算"""
+        executor = self._executor
+        if executor is None or not items:
+            return func(items, *args)
+
+        size = max(1, min(self.chunk_size, math.ceil(len(items) / self.workers)))
+        try:
+            futures = [executor.submit(func, items[i:i + size], *args) for i in range(0, len(items), size)]
+            return [result for future in futures for result in future.result()]
+        except BrokenProcessPool as e:
+            self._disable(executor, e)
+        except Exception as e:
+            print(f"⚠️ 解析进程池任务失败，改为在当前进程中解析: {e}")
+        return func(items, *args)
+
+    def _disable(self, executor: ProcessPoolExecutor, error: Exception):
+        """子进程异常退出后停用进程池（此时服务已有其他线程，不再重新 fork）"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        print(f"⚠️ 解析进程池异常，之后在当前进程中解析: {error}")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_default_pool: Optional[ParsePool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> ParsePool:
+    """进程内共享的解析进程池（第一次调用时创建，应在启动其他线程之前调用）"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ParsePool()
+        return _default_pool
@@ -1,18 +1,40 @@
 """
 PubMed Central (PMC) 全文获取模块
 """
-import requests
-import xml.etree.ElementTree as ET
-from typing import Optional, Dict, List
+from typing import Callable, Optional, Dict, Iterable, List, Iterator, Set, Tuple, Union
 import re
+from fulltext_cache import FulltextCache, get_default_cache
+from fulltext_parser import FulltextParser
+from http_client import get_client
+from keyword_matcher import KeywordMatcher
+from parse_pool import ParsePool, get_parse_pool
+import xml_parser
 
-class PMCFetcher:
-    """PMC全文获取和解析类"""
+class PMCFetcher(FulltextParser):
+    """PMC全文获取和解析类（解析逻辑见 FulltextParser）"""
     
     BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+    ELINK_BATCH_SIZE = 100  # 每次 elink 请求合并的PMID数量
+    EFETCH_BATCH_SIZE = 20  # 每次 efetch 请求合并的PMC全文数量
     
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, cache: Optional[FulltextCache] = None, parse_pool: Optional[ParsePool] = None):
+        """
+        Args:
+            cache: 全文XML缓存，默认使用进程内共享的磁盘缓存
+            parse_pool: 解析XML和查找关键词的进程池，默认使用进程内共享的进程池（未启用时在当前进程中解析）
+        """
+        self.session = get_client()
+        self.cache = cache or get_default_cache()
+        self.parse_pool = parse_pool or get_parse_pool()
+        # 全文XML写入本地缓存后、解析之前调用（参数为PMC ID），在写缓存的线程中执行
+        self.xml_listeners: List[Callable[[str], None]] = []
+    
+    def _notify_xml_cached(self, pmc_id: str):
+        for listener in self.xml_listeners:
+            try:
+                listener(pmc_id)
+            except Exception as e:
+                print(f"⚠️ 全文XML缓存回调错误 ({pmc_id}): {e}")
     
     def get_pmc_id(self, pmid: str) -> Optional[str]:
         """
@@ -24,6 +46,9 @@ class PMCFetcher:
         Returns:
             PMC ID (如 'PMC1234567') 或 None
         """
+        if self.cache.offline:
+            return None
+        
         try:
             url = f"{self.BASE_URL}elink.fcgi"
             params = {
@@ -36,23 +61,114 @@ class PMCFetcher:
             response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             
-            root = ET.fromstring(response.content)
-            
-            # 查找PMC ID
-            pmc_id_elem = root.find(".//Link/Id")
-            if pmc_id_elem is not None and pmc_id_elem.text:
-                pmc_id = pmc_id_elem.text
-                # 避免重复PMC前缀
-                if not pmc_id.startswith("PMC"):
-                    pmc_id = f"PMC{pmc_id}"
-                return pmc_id
-            
-            return None
+            return self.parse_pmc_id(response.content)
         except Exception as e:
             print(f"获取PMC ID错误 (PMID: {pmid}): {e}")
             return None
     
-    def fetch_fulltext_xml(self, pmc_id: str) -> Optional[str]:
+    def parse_pmc_id(self, content: bytes) -> Optional[str]:
+        """从单个PMID的 elink 响应中读取PMC ID"""
+        root = xml_parser.fromstring(content)
+        
+        # 查找PMC ID
+        pmc_id_elem = root.find(".//Link/Id")
+        if pmc_id_elem is not None and pmc_id_elem.text:
+            # 避免重复PMC前缀
+            return self._normalize_pmc_id(pmc_id_elem.text)
+        
+        return None
+    
+    def resolve_pmc_ids(self, pmids: List[str],
+                        known: Optional[Dict[str, str]] = None) -> Dict[str, Optional[str]]:
+        """
+        批量将PubMed ID解析为PMC ID
+
+        已知的PMC ID（如 Europe PMC 搜索结果中自带的）直接复用，
+        其余PMID按块合并为一次 elink 请求（每个PMID单独一个 id 参数，
+        返回结果按PMID一一对应）。
+
+        Args:
+            pmids: PubMed ID列表
+            known: 已知的 {pmid: pmc_id} 映射
+
+        Returns:
+            {pmid: pmc_id 或 None}；某块请求失败时，该块的PMID不会出现在结果中，
+            调用方可再回退到 get_pmc_id 单独查询
+        """
+        resolved, pending = self.split_known(pmids, known)
+
+        # 离线模式只使用已知的PMC ID
+        if self.cache.offline:
+            return resolved
+
+        for i in range(0, len(pending), self.ELINK_BATCH_SIZE):
+            chunk = pending[i:i + self.ELINK_BATCH_SIZE]
+            try:
+                resolved.update(self._elink_batch(chunk))
+            except Exception as e:
+                print(f"批量获取PMC ID错误 ({len(chunk)} 个PMID): {e}")
+
+        return resolved
+
+    def split_known(self, pmids: List[str],
+                    known: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Optional[str]], List[str]]:
+        """
+        区分已知PMC ID的PMID和需要 elink 查询的PMID（去重、跳过空值）
+
+        Returns:
+            ({pmid: pmc_id}, 待查询的PMID列表)
+        """
+        resolved: Dict[str, Optional[str]] = {}
+        pending = []
+
+        for pmid in pmids:
+            if not pmid or pmid in resolved:
+                continue
+            pmc_id = (known or {}).get(pmid)
+            if pmc_id:
+                resolved[pmid] = self._normalize_pmc_id(pmc_id)
+            elif pmid not in pending:
+                pending.append(pmid)
+
+        return resolved, pending
+
+    def _elink_batch(self, pmids: List[str]) -> Dict[str, Optional[str]]:
+        """对一组PMID执行一次 elink 请求"""
+        url = f"{self.BASE_URL}elink.fcgi"
+        params = {
+            "dbfrom": "pubmed",
+            "id": pmids,  # 多个 id 参数，每个PMID返回独立的 LinkSet
+            "linkname": "pubmed_pmc",
+            "retmode": "xml"
+        }
+
+        # 使用 POST 避免大批量时 URL 过长
+        response = self.session.post(url, data=params, timeout=30)
+        response.raise_for_status()
+        return self.parse_elink(pmids, response.content)
+
+    def parse_elink(self, pmids: List[str], content: bytes) -> Dict[str, Optional[str]]:
+        """解析批量 elink 响应：{pmid: pmc_id 或 None}"""
+        root = xml_parser.fromstring(content)
+
+        result = {pmid: None for pmid in pmids}
+        for link_set in root.findall(".//LinkSet"):
+            source_elem = link_set.find("./IdList/Id")
+            if source_elem is None or not source_elem.text:
+                continue
+
+            pmc_id_elem = link_set.find(".//LinkSetDb/Link/Id")
+            if pmc_id_elem is not None and pmc_id_elem.text:
+                result[source_elem.text.strip()] = self._normalize_pmc_id(pmc_id_elem.text.strip())
+
+        return result
+
+    @staticmethod
+    def _normalize_pmc_id(pmc_id: str) -> str:
+        """统一为带 PMC 前缀的形式"""
+        return pmc_id if pmc_id.startswith("PMC") else f"PMC{pmc_id}"
+
+    def fetch_fulltext_xml(self, pmc_id: str) -> Optional[bytes]:
         """
         获取PMC全文XML
         
@@ -60,8 +176,14 @@ class PMCFetcher:
             pmc_id: PMC ID (如 'PMC1234567')
             
         Returns:
-            XML文本内容
+            XML原始字节（优先使用本地缓存），可直接交给 xml_parser 解析
         """
+        entry = self.cache.get(pmc_id)
+        if entry and (self.cache.offline or entry.is_fresh(self.cache.max_age_seconds)):
+            return entry.data
+        if self.cache.offline:
+            return None
+        
         try:
             # 移除PMC前缀
             pmc_numeric = pmc_id.replace("PMC", "")
@@ -74,206 +196,267 @@ class PMCFetcher:
                 "retmode": "xml"
             }
             
-            response = self.session.get(url, params=params, timeout=30)
+            # 缓存过期时带上 ETag/Last-Modified 做条件请求
+            headers = entry.validators() if entry else {}
+            response = self.session.get(url, params=params, headers=headers, timeout=30)
+            if response.status_code == 304 and entry:
+                self.cache.touch(pmc_id)
+                return entry.data
             response.raise_for_status()
             
-            return response.text
+            self.store_xml(pmc_id, response.content, response.headers)
+            return response.content
         except Exception as e:
             print(f"获取全文XML错误 (PMC ID: {pmc_id}): {e}")
             return None
     
-    def parse_fulltext(self, xml_content: str, keyword: str) -> Optional[Dict]:
+    def store_xml(self, pmc_id: str, content: bytes, headers):
+        """缓存下载的全文XML；只缓存真正包含文章的响应（不存在的ID也会返回200）"""
+        if b"<article" in content:
+            self.cache.put(
+                pmc_id, content,
+                etag=headers.get("ETag"),
+                last_modified=headers.get("Last-Modified")
+            )
+            self._notify_xml_cached(pmc_id)
+
+    def iter_fulltext_articles(self, pmc_ids: List[str]) -> Iterator[Tuple[str, object]]:
         """
-        解析PMC全文XML，提取章节和关键词信息
-        
+        一次 efetch 请求批量获取多篇PMC全文，并流式拆分
+
+        返回的 <pmc-articleset> 通过 iterparse 增量解析，每读完一个 <article>
+        就立即交给调用方，随后清空已处理的节点，整个响应不会常驻内存。
+
         Args:
-            xml_content: XML文本内容
-            keyword: 搜索关键词
-            
-        Returns:
-            包含全文信息的字典
+            pmc_ids: PMC ID列表
+
+        Yields:
+            (pmc_id, article 元素)；元素仅在本次迭代内有效
         """
+        for pmc_id, article, _ in self._stream_articleset(pmc_ids):
+            yield pmc_id, article
+
+    def _stream_articleset(self, pmc_ids: List[str]) -> Iterator[Tuple[str, object, bytes]]:
+        response = self.session.post(
+            f"{self.BASE_URL}efetch.fcgi", data=self.efetch_params(pmc_ids), timeout=60, stream=True
+        )
         try:
-            root = ET.fromstring(xml_content.encode('utf-8'))
-            
-            # 提取文章正文
-            body = root.find(".//body")
-            if body is None:
-                return None
-            
-            fulltext_info = {
-                "methods": None,
-                "results": None,
-                "discussion": None,
-                "keyword_mentions": [],
-                "total_mentions": 0,
-                "figures": []
+            response.raise_for_status()
+            response.raw.decode_content = True
+            yield from self._iter_articleset(response.raw)
+        finally:
+            response.close()
+
+    @staticmethod
+    def efetch_params(pmc_ids: List[str]) -> Dict:
+        """批量 efetch 请求参数"""
+        return {
+            "db": "pmc",
+            "id": ",".join(pmc_id.replace("PMC", "") for pmc_id in pmc_ids),
+            "rettype": "xml",
+            "retmode": "xml"
+        }
+
+    def _iter_articleset(self, source) -> Iterator[Tuple[str, object, bytes]]:
+        """逐篇拆分 <pmc-articleset>，每篇写入XML缓存：(pmc_id, article 元素, XML字节)"""
+        # 只处理 <pmc-articleset> 的直接子元素 <article>
+        for elem in xml_parser.iter_children(source, "article"):
+            pmc_id = self._article_pmc_id(elem)
+            if pmc_id:
+                data = xml_parser.tostring(elem)
+                self.cache.put(pmc_id, data)
+                self._notify_xml_cached(pmc_id)
+                yield pmc_id, elem, data
+
+    def documents_from_articleset(self, source, wanted: Set[str]) -> Dict[str, Optional[Dict]]:
+        """
+        从批量 efetch 的响应中构建需要的文章的结构化文档（所有文章的XML都会写入缓存）
+
+        Args:
+            source: 可读取字节的文件对象
+            wanted: 需要构建文档的PMC ID
+
+        Returns:
+            {pmc_id: 结构化文档 或 None}
+        """
+        return self._documents_from_articles(self._iter_articleset(source), wanted)
+
+    def _documents_from_articles(self, articles: Iterable[Tuple[str, object, bytes]],
+                                 wanted: Set[str]) -> Dict[str, Optional[Dict]]:
+        if not self.parse_pool.enabled:
+            # 在当前进程中直接使用拆分时已解析的元素
+            return {
+                pmc_id: self._store_document(pmc_id, article)
+                for pmc_id, article, _ in articles if pmc_id in wanted
             }
-            
-            # 提取各章节
-            sections = body.findall(".//sec")
-            
-            for section in sections:
-                section_type = section.get("sec-type", "")
-                title_elem = section.find(".//title")
-                section_title = title_elem.text.lower() if title_elem is not None and title_elem.text else ""
-                
-                # 获取章节文本
-                section_text = self._extract_text(section)
-                
-                # 根据类型或标题识别章节
-                if "method" in section_type or "method" in section_title:
-                    fulltext_info["methods"] = section_text
-                elif "result" in section_type or "result" in section_title:
-                    fulltext_info["results"] = section_text
-                elif "discussion" in section_type or "discuss" in section_title or "conclusion" in section_title:
-                    fulltext_info["discussion"] = section_text
-                
-                # 在章节中查找关键词
-                mentions = self._find_keyword_mentions(section_text, keyword, section_title or section_type)
-                fulltext_info["keyword_mentions"].extend(mentions)
-            
-            # 提取图表信息
-            figures = self._extract_figures(root, keyword)
-            fulltext_info["figures"] = figures
-            
-            # 统计总提及次数
-            fulltext_info["total_mentions"] = len(fulltext_info["keyword_mentions"])
-            
-            return fulltext_info
-            
-        except Exception as e:
-            print(f"解析全文XML错误: {e}")
-            return None
-    
-    def _extract_text(self, element) -> str:
-        """提取元素的所有文本内容"""
-        text_parts = []
-        
-        for text in element.itertext():
-            if text and text.strip():
-                text_parts.append(text.strip())
-        
-        return " ".join(text_parts)
-    
-    def _find_keyword_mentions(self, text: str, keyword: str, section: str) -> List[Dict]:
+        # 进程池：子进程重新解析每篇文章的XML字节，当前进程只负责拆分
+        return self._store_documents([(pmc_id, data) for pmc_id, _, data in articles if pmc_id in wanted])
+
+    def _article_pmc_id(self, article) -> Optional[str]:
+        """从 <article-meta> 中读取PMC ID"""
+        for article_id in article.findall("./front/article-meta/article-id"):
+            if article_id.get("pub-id-type") in ("pmc", "pmcid") and article_id.text:
+                return self._normalize_pmc_id(article_id.text.strip())
+        return None
+
+    def get_fulltext_info_batch(self, pmc_ids: List[str],
+                                keyword: Union[str, KeywordMatcher]) -> Dict[str, Optional[Dict]]:
         """
-        在文本中查找关键词并提取上下文
-        
+        批量获取并解析多篇文章的全文信息
+
+        整批请求失败或某篇文章不在批量响应中时，只对这些文章单独重试，
+        不会影响同批其他文章。
+
         Args:
-            text: 文本内容
-            keyword: 关键词
-            section: 章节名称
-            
+            pmc_ids: PMC ID列表
+            keyword: 搜索关键词，或包含别名的 KeywordMatcher
+
         Returns:
-            包含提及信息的列表
+            {pmc_id: 与 get_fulltext_info 格式相同的字典 或 None}
         """
-        mentions = []
-        keyword_lower = keyword.lower()
-        text_lower = text.lower()
-        
-        # 查找所有匹配位置
-        pos = 0
-        while True:
-            pos = text_lower.find(keyword_lower, pos)
-            if pos == -1:
-                break
-            
-            # 提取上下文 (前后200字符)
-            start = max(0, pos - 200)
-            end = min(len(text), pos + len(keyword) + 200)
-            context = text[start:end].strip()
-            
-            # 提取完整句子或段落
-            paragraph_start = text.rfind(". ", 0, pos) + 2
-            paragraph_end = text.find(". ", pos + len(keyword))
-            if paragraph_end == -1:
-                paragraph_end = len(text)
-            else:
-                paragraph_end += 1
-            
-            paragraph = text[max(0, paragraph_start):paragraph_end].strip()
-            
-            mentions.append({
-                "section": section,
-                "context": context,
-                "paragraph": paragraph[:500],  # 限制长度
-                "position": pos
-            })
-            
-            pos += len(keyword)
-        
-        return mentions
-    
-    def _extract_figures(self, root, keyword: str) -> List[Dict]:
+        documents, to_fetch = self.cached_documents(pmc_ids)
+
+        if to_fetch and not self.cache.offline:
+            wanted = set(to_fetch)
+            try:
+                documents.update(self._documents_from_articles(self._stream_articleset(to_fetch), wanted))
+            except Exception as e:
+                print(f"批量获取全文XML错误 ({len(to_fetch)} 篇): {e}")
+
+        # 按篇重试批量响应中缺失的文章
+        for pmc_id in pmc_ids:
+            if pmc_id not in documents:
+                documents[pmc_id] = self.get_document(pmc_id)
+
+        return self.analyze_documents(pmc_ids, documents, keyword)
+
+    def cached_documents(self, pmc_ids: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
         """
-        提取图表信息
-        
+        从本地缓存取结构化文档，已有文档或未过期XML的文章不发起网络请求
+
+        Returns:
+            ({pmc_id: 结构化文档}, 需要下载的PMC ID列表)
+        """
+        documents: Dict[str, Dict] = {}
+        xml_items = []
+        for pmc_id in pmc_ids:
+            document = self.cache.get_document(pmc_id, self.DOCUMENT_VERSION)
+            if document is not None:
+                documents[pmc_id] = document
+                continue
+            entry = self.cache.get_fresh(pmc_id)
+            if entry:
+                xml_items.append((pmc_id, entry.data))
+
+        # 缓存的XML一起解析
+        documents.update(
+            (pmc_id, document) for pmc_id, document in self._store_documents(xml_items).items()
+            if document is not None
+        )
+        to_fetch = [pmc_id for pmc_id in pmc_ids if pmc_id not in documents]
+        return documents, to_fetch
+
+    def analyze_documents(self, pmc_ids: List[str], documents: Dict[str, Optional[Dict]],
+                          keyword: Union[str, KeywordMatcher]) -> Dict[str, Optional[Dict]]:
+        """对一批结构化文档查找关键词：{pmc_id: 与 get_fulltext_info 格式相同的字典 或 None}"""
+        infos = self.parse_pool.analyze_documents([documents.get(pmc_id) for pmc_id in pmc_ids], keyword)
+        return {
+            pmc_id: self._wrap_fulltext_info(pmc_id, info)
+            for pmc_id, info in zip(pmc_ids, infos)
+        }
+
+    def get_cached_fulltext_info(self, pmc_id: str,
+                                 keyword: Union[str, KeywordMatcher]) -> Optional[Dict]:
+        """
+        只用本地缓存的XML解析全文（不论缓存是否过期，不发起网络请求）
+
+        用于XML已下载、但上次解析失败的文章，重试时不必重新下载。
+
+        Returns:
+            与 get_fulltext_info 格式相同的字典；缓存中没有或解析失败时返回 None
+        """
+        entry = self.cache.get(pmc_id)
+        document = self.document_from_xml(pmc_id, entry.data) if entry else None
+        return self.analyze_documents([pmc_id], {pmc_id: document}, keyword)[pmc_id]
+
+    def get_document(self, pmc_id: str) -> Optional[Dict]:
+        """
+        获取文章的结构化文档（与关键词无关）
+
+        优先使用缓存的文档，其次解析缓存的XML，最后才从网络下载。
+
         Args:
-            root: XML根元素
-            keyword: 关键词
-            
+            pmc_id: PMC ID
+
         Returns:
-            图表信息列表
+            {"version", "sections": [...], "figures": [...]} 或 None
         """
-        figures = []
-        keyword_lower = keyword.lower()
-        
-        # 查找所有图表
-        fig_elements = root.findall(".//fig")
-        
-        for fig in fig_elements:
-            fig_id = fig.get("id", "")
-            label_elem = fig.find(".//label")
-            caption_elem = fig.find(".//caption")
-            
-            label = label_elem.text if label_elem is not None and label_elem.text else ""
-            caption_text = self._extract_text(caption_elem) if caption_elem is not None else ""
-            
-            # 检查图注中是否包含关键词
-            mentions_keyword = keyword_lower in caption_text.lower()
-            
-            if caption_text:  # 只添加有图注的图表
-                figures.append({
-                    "id": fig_id,
-                    "label": label,
-                    "caption": caption_text[:1000],  # 限制长度
-                    "mentions_keyword": mentions_keyword
-                })
-        
-        return figures
-    
-    def get_fulltext_info(self, pmid: str, keyword: str) -> Optional[Dict]:
+        document = self.cache.get_document(pmc_id, self.DOCUMENT_VERSION)
+        if document is not None:
+            return document
+
+        xml_content = self.fetch_fulltext_xml(pmc_id)
+        if not xml_content:
+            return None
+        return self.document_from_xml(pmc_id, xml_content)
+
+    def document_from_xml(self, pmc_id: str, xml_bytes: bytes) -> Optional[Dict]:
+        """解析XML并构建结构化文档（写入缓存），解析失败时返回 None"""
+        return self._store_documents([(pmc_id, xml_bytes)])[pmc_id]
+
+    def _store_documents(self, items: List[Tuple[str, bytes]]) -> Dict[str, Optional[Dict]]:
+        """解析一批XML（启用进程池时在子进程中进行），构建的结构化文档写入缓存"""
+        documents = dict(zip((pmc_id for pmc_id, _ in items), self.parse_pool.build_documents(items)))
+        for pmc_id, document in documents.items():
+            if document is not None:
+                self.cache.put_document(pmc_id, self.DOCUMENT_VERSION, document)
+        return documents
+
+    def _store_document(self, pmc_id: str, root) -> Optional[Dict]:
+        """构建结构化文档并写入缓存"""
+        try:
+            document = self.build_document(root)
+        except Exception as e:
+            print(f"解析全文XML错误 ({pmc_id}): {e}")
+            return None
+        if document is not None:
+            self.cache.put_document(pmc_id, self.DOCUMENT_VERSION, document)
+        return document
+
+    @staticmethod
+    def _wrap_fulltext_info(pmc_id: str, fulltext_info: Optional[Dict]) -> Optional[Dict]:
+        if not fulltext_info:
+            return None
+        return {
+            "pmc_id": pmc_id,
+            "has_fulltext": True,
+            "fulltext": fulltext_info
+        }
+
+    def get_fulltext_info(self, pmid: str, keyword: Union[str, KeywordMatcher],
+                          pmc_id: Optional[str] = None) -> Optional[Dict]:
         """
         获取文章的完整全文信息
         
         Args:
             pmid: PubMed ID
-            keyword: 搜索关键词
+            keyword: 搜索关键词，或包含别名的 KeywordMatcher
+            pmc_id: 已知的PMC ID（提供时跳过 elink 查询）
             
         Returns:
             包含PMC ID和全文信息的字典
         """
         # 获取PMC ID
-        pmc_id = self.get_pmc_id(pmid)
+        if not pmc_id:
+            pmc_id = self.get_pmc_id(pmid)
         if not pmc_id:
             return None
         
-        # 获取全文XML
-        xml_content = self.fetch_fulltext_xml(pmc_id)
-        if not xml_content:
-            return None
-        
-        # 解析全文
-        fulltext_info = self.parse_fulltext(xml_content, keyword)
-        if not fulltext_info:
-            return None
+        # 获取结构化文档（缓存 → 缓存XML → 网络）
+        document = self.get_document(pmc_id)
         
-        return {
-            "pmc_id": pmc_id,
-            "has_fulltext": True,
-            "fulltext": fulltext_info
-        }
+        # 查找关键词
+        return self.analyze_documents([pmc_id], {pmc_id: document}, keyword)[pmc_id]
 
 
 # 使用示例
@@ -0,0 +1,117 @@
+"""
+文章全文处理状态模块
+每篇文章依次经过 pending → pmcid_resolved → xml_fetched → parsed 四个阶段，任一步失败时进入 failed，
+并记录失败原因、失败次数、下次可重试的时间以及可以从哪个阶段继续。
+状态随文章保存到项目数据库，服务中断或重试时从已完成的阶段继续，不再重复已完成的网络请求。
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+# 失败重试配置（可通过环境变量覆盖）：第 n 次失败后等待 RETRY_BASE_MINUTES * 2^(n-1) 分钟
+RETRY_BASE_MINUTES = float(os.environ.get("FIGURESCOUT_RETRY_BASE_MINUTES", "5"))
+RETRY_MAX_ATTEMPTS = int(os.environ.get("FIGURESCOUT_RETRY_MAX_ATTEMPTS", "6"))
+
+# 处理阶段（按顺序推进）
+PENDING = "pending"                # 尚未处理
+PMCID_RESOLVED = "pmcid_resolved"  # 已知PMC ID
+XML_FETCHED = "xml_fetched"        # 全文XML已下载到本地缓存
+PARSED = "parsed"                  # 全文已解析分析完成
+FAILED = "failed"                  # 某一步失败，resume_stage 为可以继续的阶段
+
+STAGES = (PENDING, PMCID_RESOLVED, XML_FETCHED, PARSED)
+STATES = STAGES + (FAILED,)
+
+# 尚未处理完的状态（中断后需要继续处理）
+UNFINISHED = (PENDING, PMCID_RESOLVED, XML_FETCHED)
+
+# 失败原因（处理出错时为异常信息）
+NO_PMC_ID = "NO_PMC_ID"
+FETCH_FAILED = "FETCH_FAILED"
+PARSE_FAILED = "PARSE_FAILED"
+
+# 文章字典中的状态字段，与数据库 articles 表的列同名
+STATE_FIELDS = ("state", "resume_stage", "failure_reason", "attempts", "next_retry_at")
+
+
+def next_retry_time(attempts: int, now: Optional[datetime] = None) -> Optional[str]:
+    """
+    第 attempts 次失败后的下次重试时间（指数退避）
+
+    Returns:
+        ISO 格式时间；达到 RETRY_MAX_ATTEMPTS 后返回 None，不再自动重试
+    """
+    if attempts >= RETRY_MAX_ATTEMPTS:
+        return None
+    delay = timedelta(minutes=RETRY_BASE_MINUTES * 2 ** (attempts - 1))
+    return ((now or datetime.now()) + delay).isoformat()
+
+
+def current_state(article: Dict) -> Dict:
+    """
+    文章的处理状态字段；没有状态的文章（旧客户端提交的）按布尔字段推断
+
+    Returns:
+        {state, resume_stage, failure_reason, attempts, next_retry_at}
+    """
+    if article.get('state') in STATES:
+        state = {field: article.get(field) for field in STATE_FIELDS}
+        state['attempts'] = state['attempts'] or 0
+        return state
+
+    state = dict.fromkeys(STATE_FIELDS)
+    state['attempts'] = 0
+    if article.get('has_fulltext'):
+        state['state'] = PARSED
+    elif article.get('fulltext_processed'):
+        state['state'] = FAILED
+        state['attempts'] = 1
+        if article.get('pmc_id'):
+            state['resume_stage'], state['failure_reason'] = PMCID_RESOLVED, FETCH_FAILED
+        else:
+            state['resume_stage'], state['failure_reason'] = PENDING, NO_PMC_ID
+    else:
+        state['state'] = PMCID_RESOLVED if article.get('pmc_id') else PENDING
+    return state
+
+
+def resume_stage(article: Dict) -> str:
+    """重新处理时可以继续的阶段（最后完成的阶段）"""
+    state = current_state(article)
+    if state['state'] == FAILED:
+        return state['resume_stage'] or PENDING
+    return state['state']
+
+
+def advance(article: Dict, stage: str):
+    """
+    文章完成一个阶段（只会前进）
+
+    解析完成后清除失败记录；中间阶段保留失败次数，反复失败的文章仍按次数退避。
+    阶段没有前进时，没有状态字段的文章也会写入按布尔字段推断出的状态
+    （如全文结果已写回、has_fulltext 已为 True 的文章），保证处理过的文章都带有状态字段。
+    """
+    if STAGES.index(stage) <= STAGES.index(resume_stage(article)):
+        if article.get('state') not in STATES:
+            article.update(current_state(article))
+        return
+    attempts = 0 if stage == PARSED else current_state(article)['attempts']
+    article.update(dict.fromkeys(STATE_FIELDS))
+    article['state'] = stage
+    article['attempts'] = attempts
+
+
+def mark_failed(article: Dict, stage: str, reason: str, now: Optional[datetime] = None):
+    """
+    记录处理失败
+
+    Args:
+        stage: 已完成的最后一个阶段，重试时从这里继续
+        reason: 失败原因（NO_PMC_ID / FETCH_FAILED / PARSE_FAILED 或异常信息）
+    """
+    attempts = current_state(article)['attempts'] + 1
+    article['state'] = FAILED
+    article['resume_stage'] = stage
+    article['failure_reason'] = reason
+    article['attempts'] = attempts
+    article['next_retry_at'] = next_retry_time(attempts, now)
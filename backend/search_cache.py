@@ -0,0 +1,230 @@
+"""
+搜索结果缓存模块
+按规范化的 Europe PMC 查询语句缓存解析后的搜索结果：内存中保留最近使用的少量结果，
+SQLite 中保留更多结果（服务重启后仍可用），两层都按 TTL 过期、按最近使用淘汰。
+相同的搜索（刷新页面、多人在一小时内搜索同一关键词）直接返回缓存，不再请求 Europe PMC。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fulltext_cache import OFFLINE
+
+# 缓存配置（可通过环境变量覆盖）；TTL 为 0 时不缓存
+SEARCH_CACHE_PATH = os.environ.get("FIGURESCOUT_SEARCH_CACHE_PATH", "search_cache.db")
+SEARCH_CACHE_TTL_MINUTES = float(os.environ.get("FIGURESCOUT_SEARCH_CACHE_TTL_MINUTES", "60"))
+SEARCH_CACHE_MEMORY_ENTRIES = int(os.environ.get("FIGURESCOUT_SEARCH_CACHE_MEMORY_ENTRIES", "16"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("FIGURESCOUT_SEARCH_CACHE_MAX_ENTRIES", "200"))
+
+
+def normalize_query(query: str) -> str:
+    """查询语句规范化：合并空白、统一大小写（Europe PMC 检索不区分大小写）"""
+    return " ".join(query.split()).casefold()
+
+
+def cache_key(query: str, max_results: int) -> str:
+    return hashlib.sha256(f"{normalize_query(query)}\n{max_results}".encode("utf-8")).hexdigest()
+
+
+class SearchCacheEntry:
+    """一条缓存的搜索结果"""
+
+    def __init__(self, key: str, data: bytes, hit_count: Optional[int], truncated: bool,
+                 fetched_at: float, expires_at: float, tier: str = "memory"):
+        self.key = key
+        self.data = data  # 文章列表的JSON
+        self.hit_count = hit_count
+        self.truncated = truncated
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.tier = tier
+
+    def articles(self) -> List[Dict]:
+        """解码文章列表（每次返回新的对象，调用方可以随意修改）"""
+        return json.loads(self.data)
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def info(self) -> Dict:
+        """缓存命中信息（随搜索结果返回给前端）"""
+        return {
+            "hit": True,
+            "tier": self.tier,
+            "fetched_at": datetime.fromtimestamp(self.fetched_at).isoformat(timespec="seconds"),
+            "age_seconds": int(time.time() - self.fetched_at),
+            "expires_at": datetime.fromtimestamp(self.expires_at).isoformat(timespec="seconds"),
+            "stale": not self.is_fresh()
+        }
+
+
+class SearchCache:
+    """两层（内存 + SQLite）搜索结果缓存"""
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH, ttl_minutes: float = SEARCH_CACHE_TTL_MINUTES,
+                 memory_entries: int = SEARCH_CACHE_MEMORY_ENTRIES,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES, offline: bool = OFFLINE):
+        """
+        Args:
+            path: SQLite 缓存文件
+            ttl_minutes: 结果的有效期（分钟），0 表示不缓存
+            memory_entries: 内存中保留的结果数
+            max_entries: SQLite 中保留的结果数，超出后淘汰最久未使用的
+            offline: 离线模式，过期的结果也可以使用
+        """
+        self.ttl_seconds = ttl_minutes * 60
+        self.memory_entries = max(0, memory_entries)
+        self.max_entries = max(1, max_entries)
+        self.offline = offline
+        self._memory: "OrderedDict[str, SearchCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = {"memory": 0, "sqlite": 0}
+        self._misses = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_results (
+                cache_key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                max_results INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                hit_count INTEGER,
+                truncated INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_search_last_access ON search_results(last_access)')
+        self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def _usable(self, entry: SearchCacheEntry) -> bool:
+        return self.offline or entry.is_fresh()
+
+    def get(self, query: str, max_results: int) -> Optional[SearchCacheEntry]:
+        """
+        读取未过期的缓存结果（先查内存，再查 SQLite，命中 SQLite 时放入内存）
+
+        Args:
+            query: EuropePMCSearcher 构建的查询语句
+            max_results: 最多获取的结果数（不同上限的结果分别缓存）
+        """
+        if not self.enabled:
+            return None
+
+        key = cache_key(query, max_results)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._usable(entry):
+                self._memory.move_to_end(key)
+                self._hits["memory"] += 1
+                return entry
+
+            row = self._conn.execute('''
+                SELECT data, hit_count, truncated, fetched_at, expires_at
+                FROM search_results WHERE cache_key = ?
+            ''', (key,)).fetchone()
+            if row is not None:
+                data, hit_count, truncated, fetched_at, expires_at = row
+                entry = SearchCacheEntry(key, zlib.decompress(data), hit_count, bool(truncated),
+                                         fetched_at, expires_at, tier="sqlite")
+                if self._usable(entry):
+                    self._conn.execute(
+                        'UPDATE search_results SET last_access = ? WHERE cache_key = ?', (time.time(), key)
+                    )
+                    self._conn.commit()
+                    self._remember(SearchCacheEntry(key, entry.data, hit_count, bool(truncated),
+                                                    fetched_at, expires_at))
+                    self._hits["sqlite"] += 1
+                    return entry
+
+            self._misses += 1
+            return None
+
+    def put(self, query: str, max_results: int, articles: List[str],
+            hit_count: Optional[int], truncated: bool):
+        """
+        保存一次完整的搜索结果
+
+        Args:
+            articles: 每篇文章的JSON（产出时的快照，之后调用方对文章的修改不影响缓存）
+        """
+        if not self.enabled:
+            return
+
+        key = cache_key(query, max_results)
+        data = ("[" + ",".join(articles) + "]").encode("utf-8")
+        now = time.time()
+        entry = SearchCacheEntry(key, data, hit_count, truncated, now, now + self.ttl_seconds)
+        with self._lock:
+            self._remember(entry)
+            self._conn.execute('''
+                INSERT OR REPLACE INTO search_results
+                (cache_key, query, max_results, data, hit_count, truncated, fetched_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, normalize_query(query), max_results, zlib.compress(data), hit_count,
+                  int(truncated), now, entry.expires_at, now))
+            self._evict(now)
+            self._conn.commit()
+
+    def _remember(self, entry: SearchCacheEntry):
+        """放入内存层，超出数量时淘汰最久未使用的（调用方持有锁）"""
+        if not self.memory_entries:
+            return
+        self._memory[entry.key] = entry
+        self._memory.move_to_end(entry.key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        """删除过期的结果，并按最久未使用淘汰到数量上限以内（调用方持有锁）"""
+        if not self.offline:
+            self._conn.execute('DELETE FROM search_results WHERE expires_at <= ?', (now,))
+        self._conn.execute('''
+            DELETE FROM search_results WHERE cache_key NOT IN (
+                SELECT cache_key FROM search_results ORDER BY last_access DESC LIMIT ?
+            )
+        ''', (self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute('DELETE FROM search_results')
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM search_results').fetchone()[0]
+            return {
+                "enabled": self.enabled,
+                "ttl_minutes": self.ttl_seconds / 60,
+                "memory_entries": len(self._memory),
+                "entries": count,
+                "hits": dict(self._hits),
+                "misses": self._misses
+            }
+
+
+_default_search_cache: Optional[SearchCache] = None
+_default_search_cache_lock = threading.Lock()
+
+
+def get_default_search_cache() -> SearchCache:
+    """进程内共享的默认搜索缓存"""
+    global _default_search_cache
+    with _default_search_cache_lock:
+        if _default_search_cache is None:
+            _default_search_cache = SearchCache()
+        return _default_search_cache
@@ -0,0 +1,5 @@
+"""pytest 配置：后端模块为平铺结构，测试时把 backend 目录加入导入路径"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
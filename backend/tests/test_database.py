@@ -0,0 +1,58 @@
+"""项目数据库：内容未变化的文章重复保存时不产生写入"""
+import pytest
+
+from database import ProjectDatabase
+from fulltext_parser import FulltextParser
+
+ARTICLE_XML = (
+    b'<article><body>'
+    b'<sec sec-type="methods"><title>Methods</title>'
+    b'<p>Cells were grown. DepMap dependency scores were used.</p>'
+    b'<sec><title>CRISPR screens</title><p>Screens followed the DepMap protocol.</p></sec></sec>'
+    b'<sec sec-type="results"><title>Results</title><p>DepMap 22Q2 release showed dependencies.</p>'
+    b'<fig id="f1"><label>Figure 1</label><caption><p>DepMap scores per lineage.</p></caption></fig></sec>'
+    b'</body></article>'
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = ProjectDatabase(str(tmp_path / "projects.db"))
+    yield database
+    database.pool.close_all()
+
+
+def make_articles():
+    parser = FulltextParser()
+    fulltext = parser.analyze_document(parser.document_from_bytes("PMC1", ARTICLE_XML), "DepMap")
+    processed = {
+        "pmid": "1", "pmc_id": "PMC1", "title": "Processed", "abstract": "About DepMap.",
+        "journal": "Nature", "year": "2024", "date": "20240102", "authors": ["A B"], "doi": "10.1/x",
+        "keyword": "DepMap", "relevance": {"score": 25, "mentions": ["fulltext"], "contexts": ["DepMap"]},
+        "has_fulltext": True, "pmc_available": True, "fulltext_processed": True, "fulltext": fulltext,
+    }
+    pending = {
+        "pmid": "2", "pmc_id": None, "title": "Pending", "keyword": "DepMap",
+        "relevance": {"score": 0, "mentions": [], "contexts": []},
+    }
+    return [processed, pending]
+
+
+def test_resaving_loaded_project_writes_nothing(db):
+    project_id = db.create_project("p", "DepMap", 3)
+    assert db.save_articles(project_id, make_articles()) == 2
+
+    loaded = db.load_project(project_id)["articles"]
+
+    assert db.save_articles(project_id, loaded) == 0
+
+
+def test_resaving_listed_articles_writes_nothing(db):
+    project_id = db.create_project("p", "DepMap", 3)
+    db.save_articles(project_id, make_articles())
+
+    full = db.list_articles(project_id, fields=list(ProjectDatabase.ARTICLE_COLUMNS))["articles"]
+    unfinished = db.list_articles_by_state(project_id, ("pending",))
+
+    assert db.save_articles(project_id, full) == 0
+    assert db.save_articles(project_id, unfinished) == 0
@@ -0,0 +1,34 @@
+"""全文解析：关键词提及的上下文提取"""
+from fulltext_parser import FulltextParser
+
+ARTICLE_XML = (
+    b'<article><body><sec sec-type="methods"><title>Methods</title>'
+    b'<p>DepMap data were used. Cells were grown in RPMI.</p></sec></body></article>'
+)
+
+
+def test_mention_paragraph_keeps_first_character_when_keyword_starts_text():
+    mentions = FulltextParser()._find_keyword_mentions(
+        "DepMap dependency scores were used. Cells were grown.", "DepMap", "methods"
+    )
+
+    assert len(mentions) == 1
+    assert mentions[0]["paragraph"] == "DepMap dependency scores were used."
+
+
+def test_mention_paragraph_starts_after_previous_sentence():
+    mentions = FulltextParser()._find_keyword_mentions(
+        "Cells were grown. DepMap scores were used. Data were analysed.", "DepMap", "methods"
+    )
+
+    assert mentions[0]["paragraph"] == "DepMap scores were used."
+
+
+def test_first_sentence_of_section_is_not_truncated():
+    parser = FulltextParser()
+    document = parser.document_from_bytes("PMC1", ARTICLE_XML)
+
+    info = parser.analyze_document(document, "DepMap")
+
+    assert info["total_mentions"] == 1
+    assert info["keyword_mentions"][0]["paragraph"] == "Methods DepMap data were used."
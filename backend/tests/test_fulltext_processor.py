@@ -0,0 +1,66 @@
+"""全文处理引擎：xml_fetched 状态的写入与续传"""
+import io
+
+import pytest
+
+import processing_state
+from fulltext_cache import FulltextCache
+from fulltext_processor import FulltextProcessor
+from pmc_fetcher import PMCFetcher
+
+ARTICLE_XML = (
+    b'<article><front><article-meta><article-id pub-id-type="pmc">PMC1</article-id>'
+    b'</article-meta></front><body>'
+    b'<sec sec-type="methods"><title>Methods</title>'
+    b'<p>Cells were grown. DepMap dependency scores were used.</p></sec>'
+    b'</body></article>'
+)
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    return PMCFetcher(cache=FulltextCache(cache_dir=str(tmp_path / "fulltext_cache")))
+
+
+def make_article():
+    return {"pmid": "1", "pmc_id": "PMC1", "keyword": "DepMap",
+            "relevance": {"score": 0, "mentions": [], "contexts": []}}
+
+
+def no_network(*args, **kwargs):
+    raise AssertionError("不应发起网络请求")
+
+
+def test_resumed_xml_fetched_article_is_reparsed_without_efetch(fetcher, monkeypatch):
+    fetcher.cache.put("PMC1", ARTICLE_XML)
+    monkeypatch.setattr(fetcher.session, "get", no_network)
+    monkeypatch.setattr(fetcher.session, "post", no_network)
+    monkeypatch.setattr(fetcher, "_stream_articleset", no_network)
+    article = make_article()
+    processing_state.mark_failed(article, processing_state.XML_FETCHED, processing_state.PARSE_FAILED)
+
+    processor = FulltextProcessor(max_workers=2, fetch_mode="threads", fetcher=fetcher)
+    outcome = processor.process([article], "DepMap", record_errors=True)["1"]
+
+    assert outcome["status"] == "success"
+    assert article["state"] == processing_state.PARSED
+    assert article["fulltext"]["total_mentions"] > 0
+
+
+def test_batch_article_reaches_xml_fetched_before_parsing(fetcher, monkeypatch):
+    monkeypatch.setattr(
+        fetcher, "_stream_articleset",
+        lambda pmc_ids: fetcher._iter_articleset(io.BytesIO(b"<pmc-articleset>" + ARTICLE_XML + b"</pmc-articleset>"))
+    )
+    article = make_article()
+    seen = []
+
+    processor = FulltextProcessor(max_workers=2, fetch_mode="threads", fetcher=fetcher)
+    futures = processor.submit([article], "DepMap",
+                               on_xml_fetched=lambda a: seen.append((a["state"], a.get("fulltext"))))
+    outcome = futures[0].result(timeout=30)
+
+    assert seen == [(processing_state.XML_FETCHED, None)]
+    assert outcome["status"] == "success"
+    assert article["state"] == processing_state.PARSED
+    assert fetcher.cache.contains("PMC1")
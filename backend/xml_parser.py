@@ -0,0 +1,85 @@
+"""
+XML 解析层
+已安装 lxml 时使用 lxml（更快、iterparse 后及时释放节点），否则回退到标准库 ElementTree。
+所有入口都直接接收响应字节，不做 decode/encode 往返。
+"""
+import os
+import xml.etree.ElementTree as _std_etree
+from typing import IO, Iterator, Union
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:  # lxml 为可选依赖
+    _lxml_etree = None
+
+# FIGURESCOUT_XML_BACKEND=stdlib 可强制使用标准库（用于对比测试）
+BACKEND = "lxml" if _lxml_etree is not None and os.environ.get(
+    "FIGURESCOUT_XML_BACKEND", "").lower() != "stdlib" else "stdlib"
+
+
+def _lxml_parser():
+    # 不解析外部实体、不访问网络；PMC 大文件需要 huge_tree
+    return _lxml_etree.XMLParser(
+        resolve_entities=False, no_network=True, huge_tree=True, remove_comments=True
+    )
+
+
+def fromstring(data: Union[bytes, str]):
+    """
+    解析完整的XML文档
+
+    Args:
+        data: XML字节（推荐，直接来自响应或缓存）；传入 str 时会先编码为 UTF-8
+
+    Returns:
+        根元素
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if BACKEND == "lxml":
+        return _lxml_etree.fromstring(data, _lxml_parser())
+    return _std_etree.fromstring(data)
+
+
+def tostring(elem) -> bytes:
+    """把元素序列化为 UTF-8 字节"""
+    if BACKEND == "lxml":
+        return _lxml_etree.tostring(elem, encoding="utf-8")
+    return _std_etree.tostring(elem, encoding="utf-8")
+
+
+def iter_children(source: IO[bytes], tag: str) -> Iterator:
+    """
+    流式读取根元素下的直接子元素 <tag>
+
+    每个子元素读完后立即交给调用方，调用方处理完（进入下一次迭代）后
+    清空已读取的节点，整个文档不会常驻内存。
+
+    Args:
+        source: 可读取字节的文件对象（如 response.raw）
+        tag: 子元素标签名，如 "article"
+
+    Yields:
+        子元素；仅在本次迭代内有效
+    """
+    if BACKEND == "lxml":
+        events = _lxml_etree.iterparse(
+            source, events=("start", "end"),
+            resolve_entities=False, no_network=True, huge_tree=True, remove_comments=True
+        )
+    else:
+        events = _std_etree.iterparse(source, events=("start", "end"))
+
+    root = None
+    depth = 0
+    for event, elem in events:
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1 and elem.tag == tag:
+            yield elem
+            root.clear()
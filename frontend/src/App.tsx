@@ -2,11 +2,15 @@ import { useState, useEffect, useRef } from 'react'
 import SearchBar from './components/SearchBar'
 import ResultList from './components/ResultList'
 import ProjectManager from './components/ProjectManager'
-import { Article } from './types'
+import { Article, ArticlePage, Job } from './types'
+import { readEventStream } from './stream'
 import { Search, FolderOpen, Home } from 'lucide-react'
 
 type SortOption = 'relevance' | 'date' | 'journal'
 
+// 加载项目时每页的文章数
+const PROJECT_PAGE_SIZE = 500
+
 function App() {
   const [results, setResults] = useState<Article[]>([])
   const [displayResults, setDisplayResults] = useState<Article[]>([])
@@ -41,6 +45,12 @@ function App() {
   // 派生状态：当前项目是否正在处理
   const isProcessingMore = processingProjectId === currentProjectId && processingProjectId !== null
   
+  // 🖥️ 后台任务状态（服务器端处理，关闭页面也会继续）
+  const [backgroundJob, setBackgroundJob] = useState<Job | null>(null)
+  const isJobRunning = backgroundJob !== null
+    && backgroundJob.project_id === currentProjectId
+    && (backgroundJob.status === 'queued' || backgroundJob.status === 'running')
+  
   // 🐛 调试日志：监控状态变化
   useEffect(() => {
     console.log(`🔍 [状态监控] processingProjectId=${processingProjectId}, currentProjectId=${currentProjectId}, isProcessingMore=${isProcessingMore}`)
@@ -69,7 +79,7 @@ function App() {
           setTotalArticles(data.totalArticles || 0)
           setProcessedCount(data.processedCount || 0)
           setCurrentYears(data.years || 3)
-          setFulltextCount(data.results?.filter((a: Article) => a.has_fulltext && a.fulltext).length || 0)
+          setFulltextCount(data.results?.filter((a: Article) => a.has_fulltext).length || 0)
           setShowRestoreHint(true)
           setTimeout(() => setShowRestoreHint(false), 5000)
         }
@@ -79,7 +89,79 @@ function App() {
     }
   }, [])
 
-  // 项目管理：自动保存到项目
+  // 轮询后台任务进度，任务结束后重新加载项目
+  useEffect(() => {
+    if (!backgroundJob || (backgroundJob.status !== 'queued' && backgroundJob.status !== 'running')) {
+      return
+    }
+    
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`/api/jobs/${backgroundJob.job_id}`)
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}`)
+        }
+        const data = await response.json()
+        const job: Job = data.job
+        setBackgroundJob(job)
+        
+        const finished = job.status !== 'queued' && job.status !== 'running'
+        if (finished && job.project_id === currentProjectId) {
+          console.log(`✅ 后台任务 ${job.job_id} 结束: ${job.status}，已处理 ${job.processed}/${job.total} 篇`)
+          await handleLoadProject(job.project_id)
+        }
+      } catch (error) {
+        console.error('获取后台任务状态失败:', error)
+        setBackgroundJob({ ...backgroundJob })  // 稍后重试
+      }
+    }, 2000)
+    
+    return () => clearTimeout(timer)
+  }, [backgroundJob, currentProjectId])
+
+  // 后台处理：由服务器处理项目中全部未处理的文章
+  const handleBackgroundProcess = async () => {
+    if (!currentProjectId) {
+      alert('请先创建或加载一个项目')
+      return
+    }
+    
+    try {
+      const response = await fetch(`/api/projects/${currentProjectId}/jobs`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ keyword: keyword })
+      })
+      
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`)
+      }
+      
+      const data = await response.json()
+      console.log(`📋 后台任务已创建: ${data.job.job_id}，待处理 ${data.job.total} 篇`)
+      setBackgroundJob(data.job)
+    } catch (error) {
+      console.error('创建后台任务失败:', error)
+      alert('创建后台任务失败，请重试')
+    }
+  }
+
+  // 取消后台任务（已处理的文章会保留在项目中）
+  const handleCancelJob = async () => {
+    if (!backgroundJob) return
+    
+    try {
+      const response = await fetch(`/api/jobs/${backgroundJob.job_id}/cancel`, { method: 'POST' })
+      if (response.ok) {
+        const data = await response.json()
+        setBackgroundJob(data.job)
+      }
+    } catch (error) {
+      console.error('取消后台任务失败:', error)
+    }
+  }
+
+  // 项目管理：自动保存到项目（只需传入有变化的文章，后端会跳过内容未变的文章）
   const saveToProject = async (projectId: string, articles: Article[]) => {
     console.log(`🔄 开始保存: projectId=${projectId}, 文章数=${articles.length}`)
     
@@ -102,7 +184,7 @@ function App() {
 
       if (response.ok) {
         const data = await response.json()
-        console.log(`✅ 保存成功: ${data.saved_count} 篇文章已保存到项目 ${projectId}`)
+        console.log(`✅ 保存成功: ${data.saved_count} 篇文章已保存到项目 ${projectId}（${data.skipped_count ?? 0} 篇无变化）`)
         console.log(`📊 项目统计: 总数=${data.stats?.total_articles}, 已处理=${data.stats?.processed_articles}, 全文=${data.stats?.fulltext_articles}`)
       } else {
         const errorText = await response.text()
@@ -138,15 +220,34 @@ function App() {
     setLoadingStatus('正在加载项目...')
     
     try {
-      const response = await fetch(`/api/projects/${projectId}`)
+      const response = await fetch(`/api/projects/${projectId}/stats`)
       
       if (!response.ok) {
         throw new Error('项目加载失败')
       }
 
-      const data = await response.json()
-      const project = data.project
-      const articles = data.articles
+      const project = await response.json()
+      
+      // 分页加载文章摘要（不含全文分析结果，展开文章时再按需加载）
+      const articles: Article[] = []
+      while (true) {
+        const params = new URLSearchParams({
+          view: 'summary',
+          sort: sortBy,
+          offset: String(articles.length),
+          limit: String(PROJECT_PAGE_SIZE)
+        })
+        const pageResponse = await fetch(`/api/projects/${projectId}/articles?${params}`)
+        if (!pageResponse.ok) {
+          throw new Error('项目加载失败')
+        }
+        const page: ArticlePage = await pageResponse.json()
+        articles.push(...page.articles)
+        setLoadingStatus(`正在加载项目... ${articles.length}/${page.total}`)
+        if (page.articles.length < PROJECT_PAGE_SIZE || articles.length >= page.total) {
+          break
+        }
+      }
 
       console.log(`📊 项目数据: 总数=${project.total_articles}, 已处理=${project.processed_articles}, 全文=${project.fulltext_articles}`)
 
@@ -262,101 +363,101 @@ function App() {
     }
     
     try {
-      // 模拟进度更新
-      const progressInterval = setInterval(() => {
-        setProgress(prev => Math.min(prev + 5, 90))
-      }, 500)
-      
-      setProgress(10)
-      const response = await fetch('/api/search', {
+      setProgress(5)
+      // 流式搜索：后端搜索完成后先推送文章列表，再逐篇推送全文处理结果
+      const response = await fetch('/api/search/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
           keyword: searchKeyword,
-          years: years
+          years: years,
+          max_fulltext: 20,  // 渐进式加载：初次只处理20篇
+          project_id: activeProjectId  // 结果由后端直接保存到项目
         })
       })
       
-      setProgress(50)
-      setLoadingStatus('正在处理结果...')
-      
       if (!response.ok) {
         throw new Error('搜索失败')
       }
       
-      const data = await response.json()
-      clearInterval(progressInterval)
-      
-      const total = data.total || 0
-      const processed = data.processed || 0
+      // 🔧 使用本地变量跟踪最新的结果集
+      let latestResults: Article[] = []
+      let total = 0
+      let fulltextAvailable = 0
       
-      // 模拟处理进度，显示 X/总数 格式
-      if (total > 0 && processed > 0) {
-        const steps = Math.min(processed, 10)
-        const progressStep = (90 - 60) / steps
-        
-        for (let i = 0; i < steps; i++) {
-          const currentProcessed = Math.floor((i + 1) * processed / steps)
-          setProgress(60 + progressStep * (i + 1))
-          setLoadingStatus(`📊 处理中: ${currentProcessed}/${total}`)
-          await new Promise(resolve => setTimeout(resolve, 150))
+      await readEventStream(response, (event) => {
+        switch (event.type) {
+          case 'search_progress':
+            setLoadingStatus(`正在检索文献: 已找到 ${event.found} 篇`)
+            break
+          
+          case 'results':
+            total = event.total
+            // 🔧 关键：给每篇文章添加原始序号（从0开始）
+            latestResults = event.results.map((article, index) => ({
+              ...article,
+              originalIndex: index  // 原始序号，用于追踪顺序
+            }))
+            console.log(`📚 收到文章数据: ${latestResults.length} 篇`)
+            if (event.error) {
+              console.warn(`⚠️ 搜索中断，只返回已获取的 ${event.total} 篇: ${event.error}`)
+            } else if (event.is_truncated) {
+              console.warn(`⚠️ 结果被截断: 共命中 ${event.hit_count} 篇，上限 ${event.max_results} 篇`)
+            }
+            if (event.cache?.hit) {
+              console.log(`⚡ 使用缓存的搜索结果（${event.cache.age_seconds} 秒前）`)
+            }
+
+            setResults(latestResults)
+            setDisplayResults(latestResults)
+            setTotalArticles(total)
+            setProgress(30)
+            setLoadingStatus('正在处理结果...')
+            break
+          
+          case 'article': {
+            // 后端按完成顺序推送，index 即文章在结果列表中的位置
+            latestResults = [...latestResults]
+            latestResults[event.index] = { ...event.article, originalIndex: event.index }
+            setResults(latestResults)
+            setDisplayResults(latestResults)
+            setProgress(30 + Math.round(65 * event.processed / Math.max(event.total, 1)))
+            setLoadingStatus(`📊 处理中: ${event.processed}/${event.total}`)
+            break
+          }
+          
+          case 'done':
+            fulltextAvailable = event.fulltext_available
+            break
+          
+          case 'error':
+            throw new Error(event.error)
         }
-      } else {
-        setProgress(90)
-        setLoadingStatus('正在整理结果...')
-      }
-      
-      const articles = data.results || []
-      console.log(`📚 收到文章数据: ${articles.length} 篇`)
-      
-      // 🔧 关键：给每篇文章添加原始序号（从0开始）
-      const articlesWithIndex = articles.map((article, index) => ({
-        ...article,
-        originalIndex: index  // 原始序号，用于追踪顺序
-      }))
-      
-      // 🔍 调试：检查已处理状态
-      const processedInResponse = articlesWithIndex.filter(a => a.fulltext_processed).length
-      console.log(`🔍 [调试] 后端返回的已处理文章数: ${processedInResponse}`)
-      console.log(`🔍 [调试] 前3篇文章状态:`, articlesWithIndex.slice(0, 3).map(a => ({
-        index: a.originalIndex,
-        pmid: a.pmid,
-        fulltext_processed: a.fulltext_processed,
-        has_fulltext: a.has_fulltext
-      })))
-      
-      setResults(articlesWithIndex)
-      setDisplayResults(articlesWithIndex)
-      setFulltextCount(data.fulltext_available || 0)
+      })
       
       // 🔧 修复：精确统计已处理数量（基于PMID）
-      const actualProcessedCount = articlesWithIndex.filter(a => a.fulltext_processed).length
-      console.log(`🔍 [统计] 后端返回processed=${processed}, 实际统计=${actualProcessedCount}`)
+      const actualProcessedCount = latestResults.filter(a => a.fulltext_processed).length
+      console.log(`🔍 [统计] 已处理=${actualProcessedCount}, 成功获取全文=${fulltextAvailable}`)
       
       // 更新渐进式加载状态
+      setFulltextCount(fulltextAvailable)
       setTotalArticles(total)
       setProcessedCount(actualProcessedCount)  // ✅ 使用实际统计值
       setCurrentYears(years)
       
-      // 自动保存到项目（使用局部变量 activeProjectId）
-      console.log(`🔍 准备保存: activeProjectId=${activeProjectId}, articles.length=${articles.length}`)
-      if (activeProjectId && articles.length > 0) {
-        console.log(`💾 【关键】开始保存 ${articles.length} 篇文章到项目 ${activeProjectId}`)
-        await saveToProject(activeProjectId, articles)
-        console.log(`✅ 【关键】saveToProject 调用完成`)
-      } else {
-        console.warn(`⚠️ 【警告】无法保存文章: activeProjectId=${activeProjectId}, articles.length=${articles.length}`)
+      if (!activeProjectId) {
+        console.warn(`⚠️ 【警告】没有活动项目，搜索结果未保存`)
       }
       
       // 保存搜索结果到LocalStorage
       localStorage.setItem('figureScout_lastSearch', JSON.stringify({
         keyword: searchKeyword,
         years: years,
-        results: articles,
+        results: latestResults,
         totalArticles: total,
-        processedCount: processed,
+        processedCount: actualProcessedCount,
         timestamp: new Date().toISOString()
       }))
       
@@ -457,133 +558,112 @@ function App() {
     console.log(`🔍 [Ref状态] processingAbortRef.current=`, processingAbortRef.current)
     console.log(`🔍 [Results] results.length=${results.length}, 前3篇:`, results.slice(0, 3).map(a => ({pmid: a.pmid, fulltext_processed: a.fulltext_processed})))
     
-        try {
-          // 批量处理，每10篇更新一次
-          const batchSize = 10
-          
-          // 🔧 使用本地变量跟踪最新的结果集
-          let latestResults = [...results]
-          
-          // 🔧 关键：筛选未处理的文章，并按原始序号排序
-          const unprocessedArticles = latestResults
-            .filter(a => !a.fulltext_processed)
-            .sort((a, b) => (a.originalIndex || 0) - (b.originalIndex || 0))  // 按序号排序
+    try {
+      // 每收到10篇更新一次界面
+      const batchSize = 10
+      
+      // 🔧 使用本地变量跟踪最新的结果集
+      const latestResults = [...results]
+      const positionByPmid = new Map(latestResults.map((a, i) => [a.pmid, i]))
+      const unprocessedCount = latestResults.filter(a => !a.fulltext_processed).length
+      
+      console.log(`📊 [处理开始] 准备处理 ${unprocessedCount} 篇文章`)
+      if (unprocessedCount === 0) {
+        console.warn(`⚠️ 没有未处理的文章，跳过处理`)
+      }
+      
+      setLoadingStatus(`🔄 处理中: ${currentProcessed}/${totalArticles} (${Math.round((currentProcessed/totalArticles)*100)}%)`)
+      
+      // 后端直接从项目读取未处理的文章，逐篇推送结果并保存到项目（无需回传文章列表）
+      const controller = new AbortController()
+      const response = await fetch(`/api/projects/${activeProjectId}/fulltext/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ keyword: keyword }),
+        signal: controller.signal
+      })
+      
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`)
+      }
+      
+      let pendingUpdates = 0
+      let aborted = false
+      
+      const flushUpdates = () => {
+        pendingUpdates = 0
+        const snapshot = [...latestResults]
+        
+        // 精确统计已处理的文章数
+        const actualProcessed = snapshot.filter(a => a.fulltext_processed).length
+        currentProcessed = actualProcessed
+        const fulltextCount = snapshot.filter(a => a.has_fulltext).length
+        
+        // ✅ 立即更新所有状态（避免异步问题）
+        setResults(snapshot)
+        setDisplayResults(snapshot)
+        setProcessedCount(actualProcessed)
+        setFulltextCount(fulltextCount)
+        setLoadingStatus(`🔄 处理中: ${actualProcessed}/${totalArticles} (${Math.round((actualProcessed/totalArticles)*100)}%)`)
+        
+        // 保存到localStorage
+        localStorage.setItem('figureScout_lastSearch', JSON.stringify({
+          keyword: keyword,
+          years: currentYears,
+          results: snapshot,
+          totalArticles: totalArticles,
+          processedCount: actualProcessed,
+          timestamp: new Date().toISOString()
+        }))
+      }
+      
+      try {
+        await readEventStream(response, (event) => {
+          if (event.type === 'error') {
+            throw new Error(event.error)
+          }
+          if (event.type !== 'article') {
+            return
+          }
           
-          console.log(`📊 [处理循环] 准备处理 ${unprocessedArticles.length} 篇文章`)
-          console.log(`📊 [未处理文章] 序号范围: ${unprocessedArticles[0]?.originalIndex} - ${unprocessedArticles[unprocessedArticles.length-1]?.originalIndex}`)
-          console.log(`📊 [未处理文章] 前3篇:`, unprocessedArticles.slice(0, 3).map(a => ({
-            index: a.originalIndex,
-            pmid: a.pmid,
-            title: a.title?.substring(0, 50)
-          })))
-          console.log(`📊 [循环前检查] shouldAbort=${processingAbortRef.current.shouldAbort}, refProjectId=${processingAbortRef.current.projectId}, activeProjectId=${activeProjectId}`)
+          // 🔒 关键：检查中断标志
+          const shouldAbort = processingAbortRef.current.shouldAbort
+          const projectIdMatch = processingAbortRef.current.projectId === activeProjectId
+          if (shouldAbort || !projectIdMatch) {
+            console.warn(`⚠️ 检测到处理中断，停止处理 (shouldAbort=${shouldAbort}, refProjectId=${processingAbortRef.current.projectId}, activeProjectId=${activeProjectId})`)
+            aborted = true
+            controller.abort()
+            return
+          }
           
-          if (unprocessedArticles.length === 0) {
-            console.warn(`⚠️ 没有未处理的文章，跳过处理`)
+          // 🔧 关键修复：使用PMID精确匹配，保留originalIndex
+          const position = positionByPmid.get(event.article.pmid)
+          if (position === undefined) {
+            console.warn(`⚠️ 返回的文章不在当前结果中: ${event.article.pmid}`)
+            return
           }
+          latestResults[position] = { ...event.article, originalIndex: latestResults[position].originalIndex }
           
-          for (let i = 0; i < unprocessedArticles.length; i += batchSize) {
-            // 🔒 关键：检查中断标志
-            const shouldAbort = processingAbortRef.current.shouldAbort
-            const projectIdMatch = processingAbortRef.current.projectId === activeProjectId
-            
-            console.log(`🔍 [循环检查 批次${Math.floor(i/batchSize) + 1}] shouldAbort=${shouldAbort}, projectIdMatch=${projectIdMatch}`)
-            
-            if (shouldAbort || !projectIdMatch) {
-              console.warn(`⚠️ 检测到处理中断，停止处理 (shouldAbort=${shouldAbort}, refProjectId=${processingAbortRef.current.projectId}, activeProjectId=${activeProjectId})`)
-              break
-            }
-            
-            const batchArticles = unprocessedArticles.slice(i, i + batchSize)
-            const currentBatch = batchArticles.length
-            
-            console.log(`🔄 [批次 ${Math.floor(i/batchSize) + 1}] 处理 ${currentBatch} 篇`)
-            console.log(`📋 [批次详情] 序号+PMID:`, batchArticles.map(a => `[${a.originalIndex}]${a.pmid}`).join(', '))
-            
-            setLoadingStatus(`🔄 处理中: ${currentProcessed}/${totalArticles} (${Math.round((currentProcessed/totalArticles)*100)}%)`)
-            
-            const response = await fetch('/api/continue-fulltext', {
-              method: 'POST',
-              headers: { 'Content-Type': 'application/json' },
-              body: JSON.stringify({
-                articles: batchArticles,  // 直接传递文章列表
-                keyword: keyword
-              })
-            })
-        
-        if (!response.ok) {
-          console.error(`第 ${i+1} 篇处理失败`)
-          continue
-        }
-        
-            const data = await response.json()
-            const processedArticles = data.results || []
-            
-            if (processedArticles.length > 0) {
-              console.log(`🔍 [批处理更新] processedArticles数量=${processedArticles.length}`)
-              console.log(`🔍 [返回结果] 序号+PMID:`, processedArticles.map(a => `[${a.originalIndex || '?'}]${a.pmid}`).join(', '))
-              
-              // 🔧 关键修复：使用PMID精确匹配，保留originalIndex
-              const updatedResultsCache = latestResults.map(article => {
-                const updated = processedArticles.find((a: Article) => a.pmid === article.pmid)
-                if (updated) {
-                  // ✅ 保留原始序号
-                  return { ...updated, originalIndex: article.originalIndex }
-                }
-                return article
-              })
-              
-              // ✅ 验证：检查是否有遗漏
-              const updatedPMIDs = processedArticles.map(a => a.pmid)
-              const missingInUpdate = batchArticles.filter(a => !updatedPMIDs.includes(a.pmid))
-              if (missingInUpdate.length > 0) {
-                console.warn(`⚠️ 有 ${missingInUpdate.length} 篇文章未在返回结果中:`, missingInUpdate.map(a => `[${a.originalIndex}]${a.pmid}`))
-              }
-              
-              // ✅ 更新本地结果集引用
-              latestResults = updatedResultsCache
-              
-              console.log(`🔍 [同步更新] updatedResults长度=${updatedResultsCache.length}`)
-              console.log(`🔍 [同步更新] 已处理数=${updatedResultsCache.filter(a => a.fulltext_processed).length}`)
-              
-              // 精确统计已处理的文章数
-              const actualProcessed = updatedResultsCache.filter(a => a.fulltext_processed).length
-              currentProcessed = actualProcessed
-              
-              console.log(`🔍 [统计] actualProcessed=${actualProcessed}, currentProcessed=${currentProcessed}`)
-              
-              // 更新全文数量
-              const fulltextCount = updatedResultsCache.filter(a => a.has_fulltext && a.fulltext).length
-              
-              // ✅ 立即更新所有状态（避免异步问题）
-              setResults(updatedResultsCache)
-              setDisplayResults(updatedResultsCache)
-              setProcessedCount(actualProcessed)
-              setFulltextCount(fulltextCount)
-              
-              // 保存到localStorage
-              localStorage.setItem('figureScout_lastSearch', JSON.stringify({
-                keyword: keyword,
-                years: currentYears,
-                results: updatedResultsCache,
-                totalArticles: totalArticles,
-                processedCount: actualProcessed,
-                timestamp: new Date().toISOString()
-              }))
-              
-              // 💾 批量保存到项目
-              if (activeProjectId && updatedResultsCache.length > 0) {
-                console.log(`💾 保存 ${updatedResultsCache.length} 篇到项目 ${activeProjectId}`)
-                await saveToProject(activeProjectId, updatedResultsCache)
-              } else {
-                console.warn(`⚠️ 无法保存: activeProjectId=${activeProjectId}, length=${updatedResultsCache.length}`)
-              }
-            }
+          pendingUpdates += 1
+          if (pendingUpdates >= batchSize) {
+            flushUpdates()
           }
+        })
+      } catch (error) {
+        if (!aborted) {
+          throw error
+        }
+      }
+      
+      // 已中断（切换了项目）时不再更新界面，已处理的文章已由后端保存
+      if (aborted) {
+        return
+      }
+      flushUpdates()
       
       // 🔍 最终统计
       const finalProcessed = latestResults.filter(a => a.fulltext_processed).length
-      const finalFulltext = latestResults.filter(a => a.has_fulltext && a.fulltext).length
+      const finalFulltext = latestResults.filter(a => a.has_fulltext).length
       
       console.log(`🎉 [处理完成] 最终统计:`)
       console.log(`   - totalArticles: ${totalArticles}`)
@@ -617,7 +697,7 @@ function App() {
   const retryFailedArticles = async (projectId: string | null, currentResults: Article[]) => {
     // 🔧 找出已处理但失败的文章（按原始序号排序）
     const failedArticles = currentResults
-      .filter(a => a.fulltext_processed && !a.fulltext)
+      .filter(a => a.fulltext_processed && !a.has_fulltext)
       .sort((a, b) => (a.originalIndex || 0) - (b.originalIndex || 0))
     
     if (failedArticles.length === 0) {
@@ -662,8 +742,8 @@ function App() {
       console.log(`${'='*60}`)
       
       // 显示成功和失败的详细信息
-      const successArticles = retriedArticles.filter((a: Article) => a.has_fulltext && a.fulltext)
-      const stillFailedArticles = retriedArticles.filter((a: Article) => !a.fulltext)
+      const successArticles = retriedArticles.filter((a: Article) => a.has_fulltext)
+      const stillFailedArticles = retriedArticles.filter((a: Article) => !a.has_fulltext)
       
       if (successArticles.length > 0) {
         console.log(`✅ 重试成功的文章 (${successArticles.length}篇):`)
@@ -697,7 +777,7 @@ function App() {
         setDisplayResults(updatedResults)
         
         // 更新全文数量
-        const newFulltextCount = updatedResults.filter(a => a.fulltext).length
+        const newFulltextCount = updatedResults.filter(a => a.has_fulltext).length
         setFulltextCount(newFulltextCount)
         
         // 保存到localStorage
@@ -710,10 +790,10 @@ function App() {
           timestamp: new Date().toISOString()
         }))
         
-        // 💾 保存到项目
-        if (projectId && updatedResults.length > 0) {
-          console.log(`💾 重试后保存 ${updatedResults.length} 篇文章到项目 ${projectId}`)
-          await saveToProject(projectId, updatedResults)
+        // 💾 保存到项目（只提交重试过的文章，其余文章未变化）
+        if (projectId) {
+          console.log(`💾 重试后保存 ${retriedArticles.length} 篇文章到项目 ${projectId}`)
+          await saveToProject(projectId, retriedArticles)
         }
         
         if (stillFailed > 0) {
@@ -857,7 +937,7 @@ function App() {
                     {/* 显示失败统计 */}
                     {processedCount === totalArticles && totalArticles > 0 && (
                       (() => {
-                        const failedCount = results.filter(a => (a.fulltext_processed || a.pmc_available) && !a.fulltext).length
+                        const failedCount = results.filter(a => (a.fulltext_processed || a.pmc_available) && !a.has_fulltext).length
                         if (failedCount > 0) {
                           return (
                             <div className="text-sm bg-amber-100 text-amber-800 px-3 py-1 rounded-full font-medium">
@@ -915,18 +995,41 @@ function App() {
                           </p>
                         )}
                       </div>
-                      <button
-                        onClick={handleProcessAll}
-                        disabled={isProcessingMore}
-                        className="px-6 py-2.5 bg-gradient-to-r from-blue-600 to-purple-600 text-white font-medium rounded-lg hover:from-blue-700 hover:to-purple-700 disabled:from-gray-400 disabled:to-gray-500 disabled:cursor-not-allowed transition-all shadow-md hover:shadow-lg whitespace-nowrap"
-                      >
-                        {isProcessingMore ? '处理中...' : `处理全部 (剩余 ${totalArticles - processedCount} 篇)`}
-                      </button>
+                      <div className="flex items-center gap-2">
+                        <button
+                          onClick={handleProcessAll}
+                          disabled={isProcessingMore || isJobRunning}
+                          className="px-6 py-2.5 bg-gradient-to-r from-blue-600 to-purple-600 text-white font-medium rounded-lg hover:from-blue-700 hover:to-purple-700 disabled:from-gray-400 disabled:to-gray-500 disabled:cursor-not-allowed transition-all shadow-md hover:shadow-lg whitespace-nowrap"
+                        >
+                          {isProcessingMore ? '处理中...' : `处理全部 (剩余 ${totalArticles - processedCount} 篇)`}
+                        </button>
+                        {isJobRunning && backgroundJob ? (
+                          <button
+                            onClick={handleCancelJob}
+                            disabled={backgroundJob.cancel_requested}
+                            className="px-4 py-2.5 bg-white border-2 border-blue-300 text-blue-700 font-medium rounded-lg hover:bg-blue-50 disabled:opacity-50 disabled:cursor-not-allowed transition-all whitespace-nowrap"
+                            title="取消后台任务，已处理的文章会保留"
+                          >
+                            {backgroundJob.cancel_requested
+                              ? '正在取消...'
+                              : `后台处理中 ${backgroundJob.processed}/${backgroundJob.total}（取消）`}
+                          </button>
+                        ) : (
+                          <button
+                            onClick={handleBackgroundProcess}
+                            disabled={isProcessingMore || !currentProjectId}
+                            className="px-4 py-2.5 bg-white border-2 border-blue-300 text-blue-700 font-medium rounded-lg hover:bg-blue-50 disabled:opacity-50 disabled:cursor-not-allowed transition-all whitespace-nowrap"
+                            title="由服务器在后台处理，关闭页面也会继续"
+                          >
+                            后台处理
+                          </button>
+                        )}
+                      </div>
                     </div>
                   </div>
                 )}
 
-                <ResultList results={displayResults} keyword={keyword} />
+                <ResultList results={displayResults} keyword={keyword} projectId={currentProjectId} />
               </>
             ) : (
               <div className="text-center py-16 bg-white rounded-lg shadow-sm">
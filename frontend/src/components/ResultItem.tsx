@@ -1,3 +1,4 @@
+import { useState, useEffect } from 'react'
 import { Article } from '../types'
 import { ChevronDown, ChevronUp, ExternalLink, BookOpen, Calendar, Users, FileText, Image, Check } from 'lucide-react'
 
@@ -7,9 +8,28 @@ interface ResultItemProps {
   expanded: boolean
   onToggle: () => void
   keyword: string
+  projectId?: string | null
 }
 
-const ResultItem = ({ article, index, expanded, onToggle, keyword }: ResultItemProps) => {
+const ResultItem = ({ article, index, expanded, onToggle, keyword, projectId }: ResultItemProps) => {
+  // 项目文章以摘要形式加载，展开时再按需获取全文分析结果
+  const [loadedFulltext, setLoadedFulltext] = useState<Article['fulltext']>(undefined)
+  const [loadingFulltext, setLoadingFulltext] = useState(false)
+  const fulltext = article.fulltext ?? loadedFulltext
+  const totalMentions = fulltext?.total_mentions ?? article.total_mentions ?? 0
+
+  useEffect(() => {
+    if (!expanded || !projectId || !article.has_fulltext || fulltext || loadingFulltext) {
+      return
+    }
+    setLoadingFulltext(true)
+    fetch(`/api/projects/${projectId}/articles/${article.pmid}`)
+      .then(response => response.ok ? response.json() : null)
+      .then((detail: Article | null) => setLoadedFulltext(detail?.fulltext))
+      .catch(error => console.error('加载全文详情失败:', error))
+      .finally(() => setLoadingFulltext(false))
+  }, [expanded, projectId, article.pmid, article.has_fulltext])
+
   const getRelevanceBadge = (score: number) => {
     if (score >= 70) {
       return <span className="px-2 py-1 text-xs font-semibold bg-green-100 text-green-800 rounded-full">高度相关</span>
@@ -59,7 +79,7 @@ const ResultItem = ({ article, index, expanded, onToggle, keyword }: ResultItemP
               </span>
               {getRelevanceBadge(article.relevance.score)}
               {/* 显示全文解析状态 */}
-              {article.has_fulltext && article.fulltext ? (
+              {article.has_fulltext ? (
                 <span className="px-2 py-1 text-xs font-semibold bg-green-100 text-green-800 rounded-full flex items-center gap-1">
                   <Check className="w-3 h-3" />
                   已解析全文
@@ -70,9 +90,9 @@ const ResultItem = ({ article, index, expanded, onToggle, keyword }: ResultItemP
                   PMC可用
                 </span>
               ) : null}
-              {article.has_fulltext && article.fulltext && article.fulltext.total_mentions > 0 && (
+              {article.has_fulltext && totalMentions > 0 && (
                 <span className="px-2 py-1 text-xs font-semibold bg-orange-100 text-orange-800 rounded-full">
-                  {article.fulltext.total_mentions} 处提及
+                  {totalMentions} 处提及
                 </span>
               )}
               <span className="text-xs text-gray-500">PMID: {article.pmid}</span>
@@ -154,11 +174,15 @@ const ResultItem = ({ article, index, expanded, onToggle, keyword }: ResultItemP
               </div>
             )}
 
+            {article.has_fulltext && !fulltext && loadingFulltext && (
+              <p className="text-sm text-gray-500">正在加载全文详情...</p>
+            )}
+
             {/* Full text sections */}
-            {article.has_fulltext && article.fulltext && (
+            {article.has_fulltext && fulltext && (
               <>
                 {/* Methods section */}
-                {article.fulltext.methods && (
+                {fulltext.methods && (
                   <div>
                     <h4 className="font-semibold text-gray-900 mb-2 flex items-center gap-2">
                       <FileText className="w-4 h-4 text-purple-600" />
@@ -166,15 +190,15 @@ const ResultItem = ({ article, index, expanded, onToggle, keyword }: ResultItemP
                     </h4>
                     <div className="p-4 bg-purple-50 border border-purple-200 rounded-lg">
                       <p className="text-sm text-gray-700 leading-relaxed">
-                        {highlightKeyword(article.fulltext.methods.substring(0, 800))}
-                        {article.fulltext.methods.length > 800 && '...'}
+                        {highlightKeyword(fulltext.methods.substring(0, 800))}
+                        {fulltext.methods.length > 800 && '...'}
                       </p>
                     </div>
                   </div>
                 )}
 
                 {/* Results section */}
-                {article.fulltext.results && (
+                {fulltext.results && (
                   <div>
                     <h4 className="font-semibold text-gray-900 mb-2 flex items-center gap-2">
                       <FileText className="w-4 h-4 text-blue-600" />
@@ -182,21 +206,21 @@ const ResultItem = ({ article, index, expanded, onToggle, keyword }: ResultItemP
                     </h4>
                     <div className="p-4 bg-blue-50 border border-blue-200 rounded-lg">
                       <p className="text-sm text-gray-700 leading-relaxed">
-                        {highlightKeyword(article.fulltext.results.substring(0, 800))}
-                        {article.fulltext.results.length > 800 && '...'}
+                        {highlightKeyword(fulltext.results.substring(0, 800))}
+                        {fulltext.results.length > 800 && '...'}
                       </p>
                     </div>
                   </div>
                 )}
 
                 {/* Keyword mentions in fulltext */}
-                {article.fulltext.keyword_mentions && article.fulltext.keyword_mentions.length > 0 && (
+                {fulltext.keyword_mentions && fulltext.keyword_mentions.length > 0 && (
                   <div>
                     <h4 className="font-semibold text-gray-900 mb-2">
-                      📍 全文中的 {keyword} 使用案例 (共 {article.fulltext.total_mentions} 处)
+                      📍 全文中的 {keyword} 使用案例 (共 {fulltext.total_mentions} 处)
                     </h4>
                     <div className="space-y-3">
-                      {article.fulltext.keyword_mentions.slice(0, 5).map((mention, idx) => (
+                      {fulltext.keyword_mentions.slice(0, 5).map((mention, idx) => (
                         <div key={idx} className="p-3 bg-yellow-50 border-l-4 border-yellow-400 rounded">
                           <div className="text-xs text-gray-600 mb-1 font-medium">
                             {mention.section || '正文'}
@@ -206,9 +230,9 @@ const ResultItem = ({ article, index, expanded, onToggle, keyword }: ResultItemP
                           </p>
                         </div>
                       ))}
-                      {article.fulltext.keyword_mentions.length > 5 && (
+                      {fulltext.keyword_mentions.length > 5 && (
                         <p className="text-xs text-gray-500 text-center">
-                          还有 {article.fulltext.keyword_mentions.length - 5} 处提及...
+                          还有 {fulltext.keyword_mentions.length - 5} 处提及...
                         </p>
                       )}
                     </div>
@@ -216,14 +240,14 @@ const ResultItem = ({ article, index, expanded, onToggle, keyword }: ResultItemP
                 )}
 
                 {/* Figures from fulltext */}
-                {article.fulltext.figures && article.fulltext.figures.length > 0 && (
+                {fulltext.figures && fulltext.figures.length > 0 && (
                   <div>
                     <h4 className="font-semibold text-gray-900 mb-2 flex items-center gap-2">
                       <Image className="w-4 h-4 text-green-600" />
-                      相关图表 ({article.fulltext.figures.length} 个)
+                      相关图表 ({fulltext.figures.length} 个)
                     </h4>
                     <div className="space-y-3">
-                      {article.fulltext.figures.map((figure, idx) => (
+                      {fulltext.figures.map((figure, idx) => (
                         <div 
                           key={idx} 
                           className={`p-4 rounded-lg border-2 ${
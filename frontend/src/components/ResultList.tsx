@@ -5,9 +5,10 @@ import ResultItem from './ResultItem'
 interface ResultListProps {
   results: Article[]
   keyword: string
+  projectId?: string | null
 }
 
-const ResultList = ({ results, keyword }: ResultListProps) => {
+const ResultList = ({ results, keyword, projectId }: ResultListProps) => {
   const [expandedId, setExpandedId] = useState<string | null>(null)
 
   const toggleExpand = (pmid: string) => {
@@ -24,6 +25,7 @@ const ResultList = ({ results, keyword }: ResultListProps) => {
           expanded={expandedId === article.pmid}
           onToggle={() => toggleExpand(article.pmid)}
           keyword={keyword}
+          projectId={projectId}
         />
       ))}
     </div>
@@ -0,0 +1,37 @@
+import { StreamEvent } from './types'
+
+/**
+ * 逐行读取 NDJSON 流式响应，每解析出一个事件就回调一次
+ * 回调中抛出的异常会中止读取并向上传递
+ */
+export async function readEventStream(
+  response: Response,
+  onEvent: (event: StreamEvent) => void
+): Promise<void> {
+  if (!response.body) {
+    throw new Error('浏览器不支持流式响应')
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop() || ''  // 最后一段可能不完整，留到下次
+    for (const line of lines) {
+      if (line.trim()) {
+        onEvent(JSON.parse(line) as StreamEvent)
+      }
+    }
+  }
+
+  buffer += decoder.decode()
+  if (buffer.trim()) {
+    onEvent(JSON.parse(buffer) as StreamEvent)
+  }
+}
@@ -20,16 +20,34 @@ export interface Article {
   pmc_available?: boolean  // PMC链接是否可用
   has_fulltext?: boolean  // 是否已成功解析全文
   fulltext_processed?: boolean  // 是否已尝试处理
+  total_mentions?: number  // 全文中的关键词提及数（摘要视图中代替 fulltext）
+  // 全文处理状态（由后端维护，保存时原样回传即可）
+  state?: ProcessingState
+  resume_stage?: ProcessingState | null  // 失败时可以继续的阶段
+  failure_reason?: string | null  // NO_PMC_ID / FETCH_FAILED / PARSE_FAILED 或错误信息
+  attempts?: number  // 连续失败次数
+  next_retry_at?: string | null  // 下次可自动重试的时间
   fulltext?: {
     methods?: string
     results?: string
     discussion?: string
     keyword_mentions: KeywordMention[]
     total_mentions: number
+    keywords?: string[]  // 分析时使用的关键词及别名
     figures: Figure[]
   }
 }
 
+export type ProcessingState = 'pending' | 'pmcid_resolved' | 'xml_fetched' | 'parsed' | 'failed'
+
+// GET /api/projects/:id/articles 的分页结果
+export interface ArticlePage {
+  articles: Article[]
+  total: number
+  offset: number
+  limit: number
+}
+
 export interface Figure {
   id: string
   label: string
@@ -45,16 +63,79 @@ export interface KeywordMention {
   context: string
   paragraph: string
   position: number
+  keyword?: string  // 实际命中的关键词别名
+  section_path?: string[]  // 所在章节路径（外层 → 内层）
 }
 
 export interface SearchRequest {
   keyword: string
   years: number
+  bypass_cache?: boolean  // 不使用缓存的搜索结果
+}
+
+// 搜索结果缓存信息（未命中时只有 hit / bypassed）
+export interface SearchCacheInfo {
+  hit: boolean
+  bypassed?: boolean
+  tier?: 'memory' | 'sqlite'
+  fetched_at?: string
+  age_seconds?: number
+  expires_at?: string
+  stale?: boolean
 }
 
 export interface SearchResponse {
   keyword: string
   total: number
+  cache?: SearchCacheInfo | null
+  error?: string | null  // Europe PMC 翻页中途出错时的原因（此时结果不完整）
   results: Article[]
 }
 
+
+// 流式接口事件（/api/search/stream、/api/projects/:id/fulltext/stream，每行一个JSON）
+export type FulltextStatus = 'success' | 'no_pmc_id' | 'unavailable' | 'error'
+
+export type StreamEvent =
+  | { type: 'search_progress'; found: number }
+  | {
+      type: 'results'
+      keyword: string
+      total: number
+      hit_count: number | null
+      is_truncated: boolean
+      max_results: number
+      cache?: SearchCacheInfo | null
+      error?: string | null
+      results: Article[]
+    }
+  | {
+      type: 'article'
+      index: number
+      status: FulltextStatus
+      mentions: number
+      article: Article
+      processed: number
+      total: number
+    }
+  | { type: 'done'; total: number; processed: number; fulltext_available: number }
+  | { type: 'error'; error: string }
+
+// 后台任务（/api/projects/:id/jobs、/api/jobs/:id）
+export type JobStatus = 'queued' | 'running' | 'completed' | 'cancelled' | 'failed'
+
+export interface Job {
+  job_id: string
+  project_id: string
+  keyword: string
+  status: JobStatus
+  total: number
+  processed: number
+  fulltext: number
+  failed: number
+  progress: number  // 0-1
+  cancel_requested: boolean
+  error: string | null
+  created_at: string
+  updated_at: string
+}